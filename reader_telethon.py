@@ -4,189 +4,198 @@ tg-channel-reader — Telegram channel reader skill for OpenClaw
 Reads posts from public/private Telegram channels via MTProto (Telethon)
 """
 
-import argparse
-import asyncio
 import json
-import os
 import sys
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 from pathlib import Path
 
-try:
-    from telethon import TelegramClient
-    from telethon.errors import (
-        FloodWaitError,
-        ChannelInvalidError,
-        ChannelPrivateError,
-        ChannelBannedError,
-        ChatForbiddenError,
-        ChatInvalidError,
-        ChatRestrictedError,
-        PeerIdInvalidError,
-        UsernameNotOccupiedError,
-        UserBannedInChannelError,
-        InviteHashExpiredError,
-        InviteHashInvalidError,
-    )
-    from telethon.tl.types import Channel
-    from telethon.tl.functions.channels import GetFullChannelRequest
-except ImportError:
-    print(json.dumps({"error": "telethon not installed. Run: pip install telethon"}))
-    sys.exit(1)
-
-
-def _channel_error(channel: str, error_type: str, message: str, action: str) -> dict:
-    """Build a structured channel error dict for the agent."""
-    return {
-        "error": message,
-        "error_type": error_type,
-        "channel": channel,
-        "action": action,
-    }
+import tg_archive
+import tg_cache
+import tg_core
+import tg_daemon
+import tg_dedup
+import tg_filter
+import tg_media
+import tg_meta
+import tg_output
+import tg_peers
+import tg_pool
+import tg_ratelimit
+import tg_session
+import tg_stats
+import tg_watch
+from tg_scheduler import AdaptiveScheduler
+
+# Telethon is imported on first use by _require_telethon(), not here: argument
+# errors, --help and daemon-forwarded calls never pay its import time.
+TelegramClient = events = utils = None
+FloodWaitError = ChannelInvalidError = ChannelPrivateError = ChannelBannedError = None
+ChatForbiddenError = ChatInvalidError = ChatRestrictedError = PeerIdInvalidError = None
+UsernameNotOccupiedError = UserBannedInChannelError = None
+InviteHashExpiredError = InviteHashInvalidError = UnauthorizedError = None
+Channel = InputPeerChannel = GetFullChannelRequest = StringSession = None
+Message = InputMessageID = GetMessagesRequest = GetMessagesViewsRequest = None
+
+
+def _require_telethon() -> None:
+    """Import Telethon into this module's globals; exit with a JSON error if missing."""
+    global TelegramClient, events, utils
+    global FloodWaitError, ChannelInvalidError, ChannelPrivateError, ChannelBannedError
+    global ChatForbiddenError, ChatInvalidError, ChatRestrictedError, PeerIdInvalidError
+    global UsernameNotOccupiedError, UserBannedInChannelError
+    global InviteHashExpiredError, InviteHashInvalidError, UnauthorizedError
+    global Channel, InputPeerChannel, GetFullChannelRequest, StringSession
+    global Message, InputMessageID, GetMessagesRequest, GetMessagesViewsRequest
+    if TelegramClient is not None:
+        return
+    try:
+        from telethon import TelegramClient, events, utils
+        from telethon.errors import (
+            FloodWaitError,
+            ChannelInvalidError,
+            ChannelPrivateError,
+            ChannelBannedError,
+            ChatForbiddenError,
+            ChatInvalidError,
+            ChatRestrictedError,
+            PeerIdInvalidError,
+            UsernameNotOccupiedError,
+            UserBannedInChannelError,
+            InviteHashExpiredError,
+            InviteHashInvalidError,
+            UnauthorizedError,
+        )
+        from telethon.sessions import StringSession
+        from telethon.tl.types import Channel, InputPeerChannel, Message, InputMessageID
+        from telethon.tl.functions.channels import GetFullChannelRequest, GetMessagesRequest
+        from telethon.tl.functions.messages import GetMessagesViewsRequest
+    except ImportError:
+        print(json.dumps({"error": "telethon not installed. Run: pip install telethon"}))
+        sys.exit(1)
 
 
 # ── Session helpers ──────────────────────────────────────────────────────────
 
-_SESSION_NAMES = [
-    ".tg-reader-session.session",
-    ".telethon-reader.session",
-    "tg-reader-session.session",
-    "telethon-reader.session",
-]
-
-
-def _find_session_files() -> list:
-    """Find tg-reader session files in home directory and current working directory.
-
-    Only looks for known tg-reader session names — does not scan for
-    arbitrary *.session files to avoid exposing unrelated session paths.
-    """
-    found = []
-    seen: set = set()
-    dirs_checked: set = set()
-    for d in [Path.home(), Path.cwd()]:
-        d = d.resolve()
-        if d in dirs_checked:
-            continue
-        dirs_checked.add(d)
-        for name in _SESSION_NAMES:
-            f = d / name
-            if f.exists():
-                resolved = f.resolve()
-                if resolved in seen:
-                    continue
-                seen.add(resolved)
-                found.append(f)
-    found.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return found
-
-
 def _validate_session(session_name: str) -> None:
-    """Verify the session file exists; exit with a JSON error and hints if not.
-
-    Both Pyrogram and Telethon store sessions as ``{name}.session``.
-    This check prevents a silent re-auth prompt when the file is missing.
-    """
-    session_file = Path(f"{session_name}.session")
-    if session_file.exists():
-        return
-
-    found = _find_session_files()
-    error: dict = {
-        "error": f"Session file not found: {session_file}",
-        "expected_path": str(session_file),
-        "fix": [
-            "Run 'tg-reader-telethon auth' to create a new session",
-            "Or set TG_SESSION=/path/to/existing-session (without .session suffix)",
-            "Or add {\"session\": \"/path/to/session\"} to ~/.tg-reader.json",
-            "Or pass --session-file /path/to/session (without .session suffix)",
-        ],
-    }
-    if found:
-        error["found_sessions"] = [str(f) for f in found[:10]]
-        suggestion = str(found[0]).removesuffix(".session")
-        error["suggestion"] = f"Likely fix: use --session-file {suggestion}"
-
-    print(json.dumps(error, indent=2))
-    sys.exit(1)
+    """Exit with a JSON error and hints if the session file is missing (see tg_core)."""
+    tg_core.validate_session(session_name, "tg-reader-telethon auth")
 
 
 # ── Config ──────────────────────────────────────────────────────────────────
 
 def get_config(config_file=None, session_file=None):
-    """Load credentials from env or config file (env takes priority).
+    """Load credentials from env or config file (env takes priority; see tg_core.get_config).
 
     Args:
         config_file: Explicit path to config JSON (overrides ~/.tg-reader.json)
         session_file: Explicit path to session file (overrides default and config value)
     """
-    api_id = os.environ.get("TG_API_ID")
-    api_hash = os.environ.get("TG_API_HASH")
-    session_name = os.environ.get("TG_SESSION", str(Path.home() / ".telethon-reader"))
-
-    if not api_id or not api_hash:
-        config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
-        if config_path.exists():
-            with open(config_path) as f:
-                cfg = json.load(f)
-                api_id = api_id or cfg.get("api_id")
-                api_hash = api_hash or cfg.get("api_hash")
-                session_name = cfg.get("session", session_name)
-
-    # Explicit --session-file overrides everything
-    if session_file:
-        session_name = session_file
-
-    if not api_id or not api_hash:
-        print(json.dumps({
-            "error": "Missing credentials. Set TG_API_ID and TG_API_HASH env vars, "
-                     "or create ~/.tg-reader.json with {\"api_id\": ..., \"api_hash\": \"...\"}. "
-                     "For isolated agents, pass --config-file /path/to/tg-reader.json"
-        }))
-        sys.exit(1)
+    return tg_core.get_config(config_file, session_file, str(Path.home() / ".telethon-reader"))
 
-    # Normalize: strip .session suffix if user passed full filename
-    if session_name.endswith(".session"):
-        session_name = session_name[: -len(".session")]
 
-    return int(api_id), api_hash, session_name
+# ── Core ─────────────────────────────────────────────────────────────────────
 
+async def _get_channel_entity(client, channel: str, peers, limiter):
+    """Return (entity, from_peer_cache) for a channel username.
 
-# ── Core ─────────────────────────────────────────────────────────────────────
+    With a peer cache (tg_peers), a cached channel is addressed as an
+    InputPeerChannel — no ResolveUsername request. On a miss the username is
+    resolved with get_entity and cached for later runs.
 
-def parse_since(since: str) -> datetime:
-    """Parse --since flag: '24h', '7d', '2026-02-01', etc."""
-    since = since.strip()
-    now = datetime.now(timezone.utc)
-    if since.endswith("h"):
-        return now - timedelta(hours=int(since[:-1]))
-    if since.endswith("d"):
-        return now - timedelta(days=int(since[:-1]))
-    if since.endswith("w"):
-        return now - timedelta(weeks=int(since[:-1]))
-    # Try ISO date
+    Raises:
+        tg_core.ChannelNotFound: the username does not exist
+    """
+    if peers is not None:
+        cached = peers.get(channel)
+        if cached is not None:
+            peer_id, access_hash, _ = cached
+            return InputPeerChannel(peer_id, access_hash), True
+    await limiter.acquire()
     try:
-        dt = datetime.fromisoformat(since)
-        if dt.tzinfo is None:
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt
-    except ValueError:
-        raise ValueError(f"Cannot parse --since value: {since!r}. Use '24h', '7d', or 'YYYY-MM-DD'.")
+        entity = await client.get_entity(channel)
+    except ValueError as e:
+        # get_entity: no such username ("No user has ... as username" and the like)
+        raise tg_core.ChannelNotFound(str(e)) from e
+    if peers is not None and isinstance(entity, Channel) and entity.access_hash is not None:
+        peers.put(channel, entity.id, entity.access_hash, "channel")
+    return entity, False
+
+
+def _channel_error(e: Exception, channel: str, limiter, peers=None, peer_cached: bool = False,
+                   meta=None):
+    """Map an exception of a channel request to a tg_core channel error dict.
+
+    A FloodWaitError is reported to ``limiter``. A missing channel is dropped
+    from ``peers`` and ``meta``; if it was addressed from the peer cache, None
+    is returned instead — the cached peer is stale and the caller retries with
+    the username resolved again.
+    """
+    if isinstance(e, (ChannelInvalidError, ChatInvalidError, PeerIdInvalidError,
+                      UsernameNotOccupiedError, tg_core.ChannelNotFound)):
+        if peers is not None:
+            peers.invalidate(channel)
+        if peer_cached:
+            return None
+        if meta is not None:
+            meta.invalidate(channel)
+        return tg_core.exception_error(channel, "not_found", e)
+    if isinstance(e, FloodWaitError):
+        limiter.report_flood_wait(e.seconds)
+        return tg_core.flood_wait_error(channel, e.seconds)
+    for types, error_type in (
+            ((ChannelPrivateError, ChatForbiddenError, ChatRestrictedError), "access_denied"),
+            ((ChannelBannedError, UserBannedInChannelError), "banned"),
+            ((InviteHashExpiredError, InviteHashInvalidError), "invite_expired"),
+            (UnauthorizedError, "session_revoked")):
+        if isinstance(e, types):
+            return tg_core.exception_error(channel, error_type, e)
+    return tg_core.exception_error(channel, "unexpected", e)
+
+
+_CHANNEL_ID_OFFSET = -1000000000000  # "marked" id: -100… prefix for channels
+
+
+def _chat_info(full) -> dict:
+    """`info` result for a GetFullChannelRequest answer (also what tg_meta caches)."""
+    channel = full.full_chat
+    chat = next((c for c in full.chats if c.id == channel.id), None)
+    username = getattr(chat, "username", None)
+    return {
+        "id": _CHANNEL_ID_OFFSET - channel.id,
+        "title": getattr(chat, "title", None),
+        "username": username,
+        "description": channel.about,
+        "members_count": channel.participants_count,
+        "link": f"https://t.me/{username}" if username else None,
+        "linked_chat_id": (_CHANNEL_ID_OFFSET - channel.linked_chat_id
+                           if channel.linked_chat_id else None),
+    }
+
 
+async def _check_discussion_group(client, channel: str, entity, limiter, meta=None) -> bool:
+    """Check whether the channel has a linked discussion group (comments).
 
-async def _check_discussion_group(client, entity) -> bool:
-    """Check whether the channel has a linked discussion group (comments)."""
+    A fresh tg_meta entry answers without a request; otherwise the full
+    channel is fetched and cached for `info` and later checks.
+    """
+    cached = meta.get(channel) if meta is not None else None
+    if cached is not None:
+        return cached.get("linked_chat_id") is not None
     try:
+        await limiter.acquire()
         full = await client(GetFullChannelRequest(entity))
-        return full.full_chat.linked_chat_id is not None
     except Exception:
         return False
+    info = _chat_info(full)
+    if meta is not None:
+        meta.put(channel, info)
+    return info["linked_chat_id"] is not None
 
 
 async def _fetch_comments(client, entity, message_id: int, comment_limit: int) -> list:
     """Fetch discussion replies (comments) for a single channel post.
 
-    Returns a list of comment dicts. Skips media-only comments (no text).
+    Returns a list of tg_core.CommentRecord. Skips media-only comments (no text).
     Re-raises FloodWaitError so the caller can handle retries.
     """
     comments = []
@@ -198,13 +207,8 @@ async def _fetch_comments(client, entity, message_id: int, comment_limit: int) -
             from_user = None
             if reply.sender:
                 from_user = getattr(reply.sender, "username", None) or str(reply.sender_id)
-            reply_date = reply.date.replace(tzinfo=timezone.utc)
-            comments.append({
-                "id": reply.id,
-                "date": reply_date.isoformat(),
-                "text": text,
-                "from_user": from_user,
-            })
+            comments.append(tg_core.CommentRecord(reply.id, reply.date.replace(tzinfo=timezone.utc),
+                                                  text, from_user))
     except FloodWaitError:
         raise  # let caller handle retry
     except Exception:
@@ -212,116 +216,186 @@ async def _fetch_comments(client, entity, message_id: int, comment_limit: int) -
     return comments
 
 
-async def fetch_messages(client: TelegramClient, channel: str, since: datetime, limit: int, text_only: bool,
+def _message_entry(channel: str, msg) -> tg_core.MessageRecord:
+    """Build the record for a channel post."""
+    return tg_core.MessageRecord(channel, msg.id, msg.date.replace(tzinfo=timezone.utc),
+                                 msg.message or "", msg.views or 0, msg.forwards or 0,
+                                 type(msg.media).__name__ if msg.media else None)
+
+
+# Telethon Message properties, most specific first, and the tg_media kind they map to
+_MEDIA_KINDS = (("sticker", "sticker"), ("video_note", "video_note"), ("gif", "animation"),
+                ("voice", "voice"), ("video", "video"), ("audio", "audio"),
+                ("photo", "photo"), ("document", "document"))
+
+
+def _media_file(msg):
+    """Describe a post's attachment for tg_media; None when there is no file to download."""
+    if msg.file is None:
+        return None
+    kind = next((kind for attr, kind in _MEDIA_KINDS if getattr(msg, attr, None)), None)
+    if kind is None:
+        return None
+    return tg_media.MediaFile(kind, msg.file.size, (msg.photo or msg.document).id,
+                              msg.file.ext or "")
+
+
+async def _download_media(client: "TelegramClient", msg, path: str, limiter) -> str:
+    """Download a post's attachment to ``path`` (one limiter token per file)."""
+    await limiter.acquire()
+    try:
+        return await client.download_media(msg, file=path)
+    except FloodWaitError as e:
+        limiter.report_flood_wait(e.seconds)
+        raise
+
+
+async def _attach_comments(client: "TelegramClient", channel: str, entity, batch: list,
+                           comment_limit: int, scheduler: AdaptiveScheduler, limiter) -> None:
+    """Fill comments for a batch of (record, reply count) pairs (see tg_core.attach_comments).
+
+    One limiter token per comment request; a FloodWait is reported to the
+    limiter and handed to ``scheduler`` as a flood_wait error.
+    """
+    async def fetch_one(msg_id):
+        await limiter.acquire()
+        try:
+            return await _fetch_comments(client, entity, msg_id, comment_limit)
+        except FloodWaitError as e:
+            limiter.report_flood_wait(e.seconds)
+            return tg_core.flood_wait_error(channel, e.seconds)
+
+    await tg_core.attach_comments(batch, scheduler, fetch_one)
+
+
+async def fetch_messages(client: "TelegramClient", channel: str, since: datetime, limit: int, text_only: bool,
                          comments: bool = False, comment_limit: int = 10, comment_delay: float = 3,
-                         min_id: int = 0):
-    """Fetch messages from a single channel."""
+                         min_id: int = 0, limiter=None, cache=None, peers=None, sink=None,
+                         comment_concurrency: int = 3, offset_id: int = 0, until: datetime = None,
+                         query: str = None, filters=None, meta=None, media=None):
+    """Fetch messages from a single channel.
+
+    ``limiter`` is the session's shared rate limiter (tg_ratelimit); one token
+    is taken per API request and every FloodWait is reported back to it.
+    ``cache`` is an optional tg_cache.MessageCache; when given (and comments
+    are off) only the part of the window the cache does not hold is downloaded.
+    ``peers`` is an optional tg_peers.PeerCache used instead of ResolveUsername.
+    ``sink`` is an optional tg_output.NdjsonSink: messages are written to it as
+    they arrive instead of being collected (the caller writes the trailer).
+    With ``comments``, posts are buffered in batches of tg_core.COMMENT_BATCH while
+    up to ``comment_concurrency`` comment requests run at once; ``comment_delay``
+    is the initial spacing between their starts.
+    ``offset_id`` starts the walk below that message id (archive paging) and
+    bypasses the cache.
+    ``until`` ends the window: the history is requested with
+    ``offset_date=until`` so Telegram starts at the last post before it and
+    the posts after the window are never downloaded. Bypasses the cache.
+    ``query`` switches the walk to Telegram's per-chat message search, so only
+    posts matching it are downloaded. Bypasses the cache.
+    ``filters`` is an optional tg_filter.FilterSet; posts its rules reject are
+    dropped in the fetch loop, before comments are requested for them.
+    ``meta`` is an optional tg_meta.MetaCache; with ``comments`` it answers
+    whether the channel has a discussion group without a full-chat request.
+    ``media`` is an optional tg_media.MediaDownloader; kept posts' attachments
+    are downloaded in the background and each post is kept once its file is
+    stored. Bypasses the cache.
+    """
+    limiter = limiter or tg_ratelimit.UNLIMITED
+    use_cache = (cache is not None and not comments and not offset_id and until is None
+                 and not query and media is None)
+    match = filters.for_channel(channel) if filters is not None else None
+    peer_cached = False
     messages = []
+    from_cache = 0
+    with_media = {}  # message id -> raw message, for posts with an attachment
 
+    def emit(entry):
+        if sink is not None:
+            sink.message(channel, entry)
+        else:
+            messages.append(entry)
+
+    def convert(msg):
+        if media is not None and msg.media:
+            with_media[msg.id] = msg
+        return _message_entry(channel, msg)
+
+    def keep(entry):
+        if media is None:
+            emit(entry)
+            return
+        msg = with_media.pop(entry.id, None)
+        media.keep(entry, _media_file(msg) if msg is not None else None,
+                   lambda path: _download_media(client, msg, path, limiter), emit)
+
+    if sink is not None:
+        sink.begin(channel, since, until)
     try:
         # Get the channel entity
-        entity = await client.get_entity(channel)
+        entity, peer_cached = await _get_channel_entity(client, channel, peers, limiter)
 
-        # Ensure it's a channel
-        if not isinstance(entity, Channel):
+        # Ensure it's a channel (cached peers are always channels)
+        if not peer_cached and not isinstance(entity, Channel):
             return {"error": f"'{channel}' is not a channel", "channel": channel}
 
         # Check discussion group availability once (only when comments requested)
         has_discussion = False
         if comments:
-            has_discussion = await _check_discussion_group(client, entity)
-
-        # Fetch messages
-        msg_index = 0
-        async for msg in client.iter_messages(entity, limit=limit, min_id=min_id):
-            # Check if message is older than 'since'
-            msg_date = msg.date.replace(tzinfo=timezone.utc)
-            if msg_date < since:
-                break
-
-            # Extract message data
-            text = msg.message or ""
-
-            # --text-only: skip posts that have no text at all
-            if text_only and not text:
-                continue
-
-            entry = {
-                "id": msg.id,
-                "date": msg_date.isoformat(),
-                "text": text,
-                "views": msg.views or 0,
-                "forwards": msg.forwards or 0,
-                "link": f"https://t.me/{channel.lstrip('@')}/{msg.id}",
-                "has_media": msg.media is not None,
-            }
-
-            if msg.media:
-                entry["media_type"] = type(msg.media).__name__
-
-            # Fetch comments for this post
-            if comments and has_discussion:
-                if msg_index > 0:
-                    await asyncio.sleep(comment_delay)
-                try:
-                    post_comments = await _fetch_comments(client, entity, msg.id, comment_limit)
-                    entry["comment_count"] = len(post_comments)
-                    entry["comments"] = post_comments
-                except FloodWaitError as e:
-                    if e.seconds <= _FLOOD_WAIT_MAX:
-                        await asyncio.sleep(e.seconds)
-                        try:
-                            post_comments = await _fetch_comments(client, entity, msg.id, comment_limit)
-                            entry["comment_count"] = len(post_comments)
-                            entry["comments"] = post_comments
-                        except Exception:
-                            entry["comment_count"] = 0
-                            entry["comments"] = []
-                    else:
-                        entry["comment_count"] = 0
-                        entry["comments"] = []
-                        entry["comments_error"] = f"Rate limited: retry after {e.seconds}s"
-
-            messages.append(entry)
-            msg_index += 1
+            has_discussion = await _check_discussion_group(client, channel, entity, limiter,
+                                                           meta)
+
+        if use_cache:
+            # min_id is applied client-side here so the cache knows why a walk stopped
+            def history(offset_id, budget):
+                return tg_ratelimit.paced(
+                    limiter, client.iter_messages(entity, limit=budget, offset_id=offset_id),
+                    tg_core.HISTORY_PAGE)
+
+            entries, from_cache = await tg_cache.fetch_through_cache(
+                cache, channel, since, limit, min_id, history,
+                lambda msg: _message_entry(channel, msg))
+            for entry in entries:
+                # --text-only: skip posts that have no text at all
+                if (entry.text or not text_only) and (match is None or match(entry.text)):
+                    keep(entry)
+        else:
+            comment_scheduler = AdaptiveScheduler(concurrency=comment_concurrency,
+                                                  interval=comment_delay,
+                                                  flood_wait_max=tg_core.FLOOD_WAIT_MAX)
+
+            async def attach(batch):
+                await _attach_comments(client, channel, entity, batch, comment_limit,
+                                       comment_scheduler, limiter)
+
+            # The reply counter tells which posts need a comment request
+            # search= makes this a server-side message search (matching posts only)
+            history = client.iter_messages(entity, limit=limit, min_id=min_id, offset_id=offset_id,
+                                           offset_date=until, search=query or None)
+            await tg_core.read_history(
+                tg_ratelimit.paced(limiter, history, tg_core.HISTORY_PAGE),
+                convert, keep, since, min_id=min_id,
+                text_only=text_only,
+                replies=lambda msg: msg.replies.replies if msg.replies else 0,
+                attach=attach if comments and has_discussion else None, until=until,
+                match=match)
+        if media is not None:
+            await media.wait(channel)
 
-    except (ChannelPrivateError, ChatForbiddenError, ChatRestrictedError) as e:
-        return _channel_error(
-            channel, "access_denied",
-            f"Channel is private or access denied: {e}",
-            "remove_from_list_or_rejoin",
-        )
-    except (ChannelBannedError, UserBannedInChannelError) as e:
-        return _channel_error(
-            channel, "banned",
-            f"Banned from channel: {e}",
-            "remove_from_list",
-        )
-    except (ChannelInvalidError, ChatInvalidError, PeerIdInvalidError,
-            UsernameNotOccupiedError, ValueError) as e:
-        return _channel_error(
-            channel, "not_found",
-            f"Channel not found or username is incorrect: {e}",
-            "check_username",
-        )
-    except (InviteHashExpiredError, InviteHashInvalidError) as e:
-        return _channel_error(
-            channel, "invite_expired",
-            f"Invite link expired or invalid: {e}",
-            "request_new_invite",
-        )
-    except FloodWaitError as e:
-        return _channel_error(
-            channel, "flood_wait",
-            f"Rate limited: retry after {e.seconds}s",
-            f"wait_{e.seconds}s",
-        )
     except Exception as e:
-        return _channel_error(
-            channel, "unexpected",
-            f"Unexpected error: {e}",
-            "report_to_user",
-        )
+        error = _channel_error(e, channel, limiter, peers, peer_cached)
+        if error is not None:
+            return error
+        # Stale cached peer — resolve the username again
+        return await fetch_messages(client, channel, since, limit, text_only,
+                                    comments=comments, comment_limit=comment_limit,
+                                    comment_delay=comment_delay, min_id=min_id,
+                                    limiter=limiter, cache=cache, peers=peers, sink=sink,
+                                    comment_concurrency=comment_concurrency,
+                                    offset_id=offset_id, until=until, query=query,
+                                    filters=filters, meta=meta, media=media)
+    finally:
+        if media is not None:
+            media.discard(channel)  # downloads of a channel that failed half-way
 
     result = {
         "channel": channel,
@@ -330,86 +404,561 @@ async def fetch_messages(client: TelegramClient, channel: str, since: datetime,
         "count": len(messages),
         "messages": messages,
     }
+    if until is not None:
+        result["until"] = until.isoformat()
+    if query:
+        result["query"] = query
+    if use_cache:
+        result["from_cache"] = from_cache
     if comments:
         result["comments_enabled"] = True
         result["comments_available"] = has_discussion
     return result
 
 
-_FLOOD_WAIT_MAX = 60  # auto-retry only if wait is <= this many seconds
+_memory_sessions: dict = {}  # client -> (session_name, loaded) for in-memory sessions
 
 
-async def fetch_multiple(channels: list, since: datetime, limit: int, text_only: bool,
-                         config_file=None, session_file=None, delay: float = 10,
-                         min_ids: dict = None):
-    """Fetch messages from multiple channels sequentially with delays.
+def _new_client(session_name: str, api_id: int, api_hash: str, config_file=None):
+    """TelegramClient for a session; on an in-memory copy of it when configured (tg_session).
 
-    Channels are fetched one at a time to avoid Telegram FloodWait.
-    If a FloodWait <= 60s is hit, the request is retried once automatically.
+    In memory, the session file is only read here and written by _disconnect
+    when the auth key or DC changed, so concurrent runs do not lock it.
     """
-    api_id, api_hash, session_name = get_config(config_file, session_file)
-    _validate_session(session_name)
+    _require_telethon()
+    if tg_session.in_memory_enabled(config_file):
+        try:
+            session_string, loaded = tg_session.load_telethon(session_name)
+        except ValueError:
+            pass  # unreadable — use the session file as before
+        else:
+            client = TelegramClient(StringSession(session_string), api_id, api_hash)
+            _memory_sessions[client] = (session_name, loaded)
+            return client
+    return TelegramClient(session_name, api_id, api_hash)
 
-    client = TelegramClient(session_name, api_id, api_hash)
+
+async def _disconnect(client: "TelegramClient") -> None:
+    """Disconnect; for an in-memory session, write a changed auth key back to its file."""
+    await client.disconnect()
+    memory = _memory_sessions.pop(client, None)
+    if memory is not None:
+        session = client.session
+        tg_session.save_telethon(memory[0], memory[1], session.dc_id, session.server_address,
+                                 session.port, session.auth_key.key if session.auth_key else None)
+
+
+async def _connect(session_name: str, api_id: int, api_hash: str,
+                   config_file=None) -> "TelegramClient":
+    """Connect a client for an existing session; exit with a JSON error if not authorized."""
+    client = _new_client(session_name, api_id, api_hash, config_file)
     await client.connect()
 
     if not await client.is_user_authorized():
         print(json.dumps({"error": "Not authorized. Please run: tg-reader-telethon auth"}))
-        await client.disconnect()
+        await _disconnect(client)
         sys.exit(1)
+    return client
 
-    results = []
+
+async def fetch_multiple(channels: list, since: datetime, limit: int, text_only: bool,
+                         config_file=None, session_file=None, delay: float = 10,
+                         min_ids: dict = None, concurrency: int = 3, use_cache=None,
+                         sink=None, comments: bool = False, comment_limit: int = 10,
+                         comment_delay: float = 3, comment_concurrency: int = 3,
+                         until: datetime = None, query: str = None,
+                         filter_rules: dict = None, dedup: bool = False,
+                         download_media: dict = None):
+    """Fetch messages from multiple channels concurrently with an adaptive rate.
+
+    Up to `concurrency` channels are fetched at once. `delay` is the initial
+    spacing between channel starts; it shrinks while Telegram answers normally
+    and grows when a FloodWait comes back. If a FloodWait <= 60s is hit, the
+    channel is retried once automatically. Results keep the input order.
+    With a ``sink`` (tg_output.NdjsonSink) messages are streamed and the
+    returned list holds each channel's trailer. ``comments`` works as for a
+    single channel, per channel. ``dedup`` folds near-duplicate posts across
+    the channels into one entry with ``also_in`` links (tg_dedup; not with a sink).
+    ``download_media`` (tg_media.for_options) saves the posts' attachments
+    into a directory and adds each file's ``media_path``; the downloads of
+    all channels share one bounded worker pool.
+    With several "sessions" in the config (and no ``session_file``) the
+    channels are sharded across them (tg_pool) instead of going through the
+    daemon or the default session.
+    """
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    pool = [] if session_file else tg_pool.load_sessions(config_file, api_id, api_hash)
+    if pool:
+        return await _fetch_pooled(pool, channels, since, limit, text_only,
+                                   config_file=config_file, min_ids=min_ids,
+                                   use_cache=use_cache, sink=sink, filter_rules=filter_rules,
+                                   dedup=dedup, delay=delay, concurrency=concurrency,
+                                   comments=comments, comment_limit=comment_limit,
+                                   comment_delay=comment_delay,
+                                   comment_concurrency=comment_concurrency,
+                                   until=until, query=query, download_media=download_media)
+    _validate_session(session_name)
+
+    forwarded = await tg_daemon.call(session_name, "telethon", {
+        "cmd": "fetch_multiple", "channels": channels, "since": since.isoformat(),
+        "limit": limit, "text_only": text_only, "delay": delay, "min_ids": min_ids or {},
+        "concurrency": concurrency, "use_cache": use_cache, "stream": sink is not None,
+        "comments": comments, "comment_limit": comment_limit, "comment_delay": comment_delay,
+        "comment_concurrency": comment_concurrency,
+        "until": until.isoformat() if until is not None else None, "query": query,
+        "filters": filter_rules, "dedup": dedup, "download_media": download_media,
+    }, on_event=sink.relay if sink is not None else None)
+    if forwarded is not None:
+        return forwarded
+
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    cache = tg_cache.for_config(config_file, use_cache)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    client = await _connect(session_name, api_id, api_hash, config_file)
     try:
-        for i, channel in enumerate(channels):
-            channel_min_id = (min_ids or {}).get(channel, 0)
-            result = await fetch_messages(client, channel, since, limit, text_only,
-                                          min_id=channel_min_id)
-
-            # Auto-retry on FloodWait if wait is reasonable
-            if (isinstance(result, dict) and result.get("error_type") == "flood_wait"):
-                wait_action = result.get("action", "")
-                try:
-                    wait_seconds = int(wait_action.replace("wait_", "").replace("s", ""))
-                except (ValueError, AttributeError):
-                    wait_seconds = 0
-                if 0 < wait_seconds <= _FLOOD_WAIT_MAX:
-                    await asyncio.sleep(wait_seconds)
-                    result = await fetch_messages(client, channel, since, limit, text_only,
-                                                  min_id=channel_min_id)
-
-            results.append(result)
-
-            # Delay between channels (skip after the last one)
-            if i < len(channels) - 1:
-                await asyncio.sleep(delay)
+        return await _fetch_multiple(client, channels, since, limit, text_only,
+                                     delay=delay, min_ids=min_ids, concurrency=concurrency,
+                                     limiter=limiter, cache=cache, peers=peers, sink=sink,
+                                     comments=comments, comment_limit=comment_limit,
+                                     comment_delay=comment_delay,
+                                     comment_concurrency=comment_concurrency, until=until,
+                                     query=query,
+                                     filters=tg_filter.compile_rules(filter_rules), dedup=dedup,
+                                     meta=tg_meta.for_config(config_file),
+                                     media=tg_media.for_options(download_media))
     finally:
-        await client.disconnect()
+        await _disconnect(client)
+
 
+async def _fetch_multiple(client: "TelegramClient", channels: list, since: datetime, limit: int,
+                          text_only: bool, delay: float = 10, min_ids: dict = None,
+                          concurrency: int = 3, limiter=None, cache=None, peers=None,
+                          sink=None, comments: bool = False, comment_limit: int = 10,
+                          comment_delay: float = 3, comment_concurrency: int = 3,
+                          until: datetime = None, query: str = None, filters=None,
+                          dedup: bool = False, on_result=None, meta=None, media=None):
+    """Fetch several channels over an existing session (see fetch_multiple).
+
+    ``on_result`` replaces ``sink.end`` as the per-channel completion hook
+    (a session pool decides there whether the channel is final).
+    """
+    async def fetch_one(channel):
+        return await fetch_messages(client, channel, since, limit, text_only,
+                                    comments=comments, comment_limit=comment_limit,
+                                    comment_delay=comment_delay,
+                                    min_id=(min_ids or {}).get(channel, 0),
+                                    limiter=limiter, cache=cache, peers=peers, sink=sink,
+                                    comment_concurrency=comment_concurrency, until=until,
+                                    query=query, filters=filters, meta=meta, media=media)
+
+    scheduler = AdaptiveScheduler(concurrency=concurrency, interval=delay,
+                                  flood_wait_max=tg_core.FLOOD_WAIT_MAX)
+    if on_result is None and sink is not None:
+        on_result = sink.end
+    results = await scheduler.run(channels, fetch_one, on_result=on_result)
+    if dedup and sink is None:
+        tg_dedup.fold(results)
+    return results
+
+
+async def _fetch_pooled(sessions: list, channels: list, since: datetime, limit: int,
+                        text_only: bool, config_file=None, min_ids: dict = None,
+                        use_cache=None, sink=None, filter_rules: dict = None,
+                        dedup: bool = False, download_media: dict = None, **options):
+    """Fetch channels over a session pool (tg_pool); results keep the input order.
+
+    Each session fetches its share of the channels over its own client, rate
+    limiter and peer cache; ``options`` are passed on to _fetch_multiple.
+    A channel's trailer is written to ``sink`` once no other session will
+    fetch it again.
+    """
+    _require_telethon()
+    cache = tg_cache.for_config(config_file, use_cache)
+    filters = tg_filter.compile_rules(filter_rules)
+    meta = tg_meta.for_config(config_file)
+    media = tg_media.for_options(download_media)
+
+    async def fetch_batch(session, batch, settle):
+        api_id, api_hash, session_name = session
+        if not tg_pool.session_exists(session_name):
+            raise FileNotFoundError(f"Session file not found: {session_name}.session")
+        limiter = tg_ratelimit.for_session(session_name, config_file)
+        peers = tg_peers.for_config(config_file, account=session_name)
+        client = _new_client(session_name, api_id, api_hash, config_file)
+        await client.connect()
+        try:
+            if not await client.is_user_authorized():
+                raise PermissionError("not authorized")
+            await _fetch_multiple(client, batch, since, limit, text_only, min_ids=min_ids,
+                                  limiter=limiter, cache=cache, peers=peers, sink=sink,
+                                  filters=filters, meta=meta, media=media, on_result=settle,
+                                  **options)
+        finally:
+            await _disconnect(client)
+
+    results = await tg_pool.SessionPool(sessions).run(
+        channels, fetch_batch, on_result=sink.end if sink is not None else None)
+    if dedup and sink is None:
+        tg_dedup.fold(results)
     return results
 
 
 async def fetch_single(channel: str, since: datetime, limit: int, text_only: bool,
                        config_file=None, session_file=None,
                        comments: bool = False, comment_limit: int = 10, comment_delay: float = 3,
-                       min_id: int = 0):
+                       min_id: int = 0, use_cache=None, sink=None, comment_concurrency: int = 3,
+                       until: datetime = None, query: str = None,
+                       filter_rules: dict = None, download_media: dict = None):
     """Fetch messages from a single channel."""
     api_id, api_hash, session_name = get_config(config_file, session_file)
+    pool = [] if session_file else tg_pool.load_sessions(config_file, api_id, api_hash)
+    if pool:
+        results = await _fetch_pooled(pool, [channel], since, limit, text_only,
+                                      config_file=config_file, min_ids={channel: min_id},
+                                      use_cache=use_cache, sink=sink,
+                                      filter_rules=filter_rules, concurrency=1,
+                                      comments=comments, comment_limit=comment_limit,
+                                      comment_delay=comment_delay,
+                                      comment_concurrency=comment_concurrency,
+                                      until=until, query=query, download_media=download_media)
+        return results[0]
     _validate_session(session_name)
 
-    client = TelegramClient(session_name, api_id, api_hash)
-    await client.connect()
+    forwarded = await tg_daemon.call(session_name, "telethon", {
+        "cmd": "fetch", "channel": channel, "since": since.isoformat(), "limit": limit,
+        "text_only": text_only, "comments": comments, "comment_limit": comment_limit,
+        "comment_delay": comment_delay, "comment_concurrency": comment_concurrency,
+        "min_id": min_id, "use_cache": use_cache, "stream": sink is not None,
+        "until": until.isoformat() if until is not None else None, "query": query,
+        "filters": filter_rules, "download_media": download_media,
+    }, on_event=sink.relay if sink is not None else None)
+    if forwarded is not None:
+        return forwarded
+
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    cache = tg_cache.for_config(config_file, use_cache)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        result = await fetch_messages(client, channel, since, limit, text_only,
+                                      comments=comments, comment_limit=comment_limit,
+                                      comment_delay=comment_delay, min_id=min_id,
+                                      limiter=limiter, cache=cache, peers=peers, sink=sink,
+                                      comment_concurrency=comment_concurrency, until=until,
+                                      query=query,
+                                      filters=tg_filter.compile_rules(filter_rules),
+                                      meta=tg_meta.for_config(config_file),
+                                      media=tg_media.for_options(download_media))
+    finally:
+        await _disconnect(client)
+    return sink.end(result) if sink is not None else result
 
-    if not await client.is_user_authorized():
-        print(json.dumps({"error": "Not authorized. Please run: tg-reader-telethon auth"}))
-        await client.disconnect()
-        sys.exit(1)
 
+# ── Channel info ─────────────────────────────────────────────────────────────
+
+async def fetch_info(channels: list, config_file=None, session_file=None,
+                     concurrency: int = 3, delay: float = 1, refresh: bool = False):
+    """Fetch title, description, subscriber count and discussion group of channels.
+
+    Results keep the input order. Channels with a fresh tg_meta entry are
+    answered from it (``"from_cache": true``) unless ``refresh``; the rest
+    share one connection (or the daemon's), up to ``concurrency`` at a time
+    with an adaptive ``delay`` between starts, and are cached.
+    """
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    meta = tg_meta.for_config(config_file)
+    cached = {} if refresh or meta is None else {c: meta.get(c) for c in channels}
+    missing = [c for c in dict.fromkeys(channels) if cached.get(c) is None]
+    fetched = {}
+    if missing:
+        _validate_session(session_name)
+        results = await tg_daemon.call(session_name, "telethon", {
+            "cmd": "info", "channels": missing, "concurrency": concurrency, "delay": delay,
+        })
+        if results is None:
+            limiter = tg_ratelimit.for_session(session_name, config_file)
+            peers = tg_peers.for_config(config_file, account=session_name)
+            client = await _connect(session_name, api_id, api_hash, config_file)
+            try:
+                results = await _fetch_info_multiple(client, missing, limiter=limiter,
+                                                     peers=peers, meta=meta,
+                                                     concurrency=concurrency, delay=delay)
+            finally:
+                await _disconnect(client)
+        fetched = dict(zip(missing, results))
+    return [{**cached[c], "from_cache": True} if cached.get(c) is not None else fetched[c]
+            for c in channels]
+
+
+async def _fetch_info_multiple(client: "TelegramClient", channels: list, limiter=None,
+                               peers=None, meta=None, concurrency: int = 3,
+                               delay: float = 1) -> list:
+    """Fetch info for several channels over an existing session (see fetch_info)."""
+    async def fetch_one(channel):
+        return await _fetch_info(client, channel, limiter=limiter, peers=peers, meta=meta)
+
+    scheduler = AdaptiveScheduler(concurrency=concurrency, interval=delay,
+                                  flood_wait_max=tg_core.FLOOD_WAIT_MAX)
+    return await scheduler.run(channels, fetch_one)
+
+
+async def _fetch_info(client: "TelegramClient", channel: str, limiter=None, peers=None,
+                      meta=None):
+    """Fetch channel info over an existing session; cache it in ``meta`` (tg_meta)."""
+    limiter = limiter or tg_ratelimit.UNLIMITED
+    peer_cached = False
     try:
-        return await fetch_messages(client, channel, since, limit, text_only,
-                                    comments=comments, comment_limit=comment_limit,
-                                    comment_delay=comment_delay, min_id=min_id)
+        entity, peer_cached = await _get_channel_entity(client, channel, peers, limiter)
+        if not peer_cached and not isinstance(entity, Channel):
+            return {"error": f"'{channel}' is not a channel", "channel": channel}
+        await limiter.acquire()
+        info = _chat_info(await client(GetFullChannelRequest(entity)))
+        if meta is not None:
+            meta.put(channel, info)
+        return info
+    except Exception as e:
+        error = _channel_error(e, channel, limiter, peers, peer_cached, meta=meta)
+        if error is not None:
+            return error
+        # Stale cached peer — resolve the username again
+        return await _fetch_info(client, channel, limiter=limiter, peers=peers, meta=meta)
+
+
+# ── Get by id ────────────────────────────────────────────────────────────────
+
+async def get_posts(channel: str, ids: list, config_file=None, session_file=None) -> dict:
+    """Fetch specific posts of a channel by id (tg_core.parse_message_ids).
+
+    Ids are requested in batches of tg_core.GET_BATCH, one
+    channels.GetMessagesRequest each; ids Telegram has no post for
+    (deleted, never existed) are listed under ``missing``.
+    """
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    _validate_session(session_name)
+
+    forwarded = await tg_daemon.call(session_name, "telethon", {
+        "cmd": "get", "channel": channel, "ids": ids,
+    })
+    if forwarded is not None:
+        return forwarded
+
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        return await _get_posts(client, channel, ids, limiter=limiter, peers=peers)
+    finally:
+        await _disconnect(client)
+
+
+async def _get_posts(client: "TelegramClient", channel: str, ids: list, limiter=None,
+                     peers=None) -> dict:
+    """Fetch posts by id over an existing session (see get_posts)."""
+    limiter = limiter or tg_ratelimit.UNLIMITED
+    peer_cached = False
+    try:
+        entity, peer_cached = await _get_channel_entity(client, channel, peers, limiter)
+        if not peer_cached and not isinstance(entity, Channel):
+            return {"error": f"'{channel}' is not a channel", "channel": channel}
+        found = {}
+        for start in range(0, len(ids), tg_core.GET_BATCH):
+            await limiter.acquire()
+            batch = [InputMessageID(i) for i in ids[start:start + tg_core.GET_BATCH]]
+            # Deleted or never-sent ids come back as MessageEmpty
+            result = await client(GetMessagesRequest(entity, batch))
+            for msg in result.messages:
+                if isinstance(msg, Message):
+                    found[msg.id] = _message_entry(channel, msg)
+        return tg_core.get_result(channel, ids, found)
+    except Exception as e:
+        error = _channel_error(e, channel, limiter, peers, peer_cached)
+        if error is not None:
+            return error
+        # Stale cached peer — resolve the username again
+        return await _get_posts(client, channel, ids, limiter=limiter, peers=peers)
+
+
+# ── Engagement stats ─────────────────────────────────────────────────────────
+
+async def refresh_stats(channels: list, since: datetime, config_file=None, session_file=None,
+                        concurrency: int = 3, delay: float = 1) -> list:
+    """Snapshot views/forwards of the channels' posts published since ``since`` (tg_stats).
+
+    New posts are found by a history walk that stops at the newest tracked
+    one or at ``since``; tracked posts are re-read with
+    GetMessagesViewsRequest in batches. Channels share one connection (or the
+    daemon's), up to ``concurrency`` at a time. Results keep the input order.
+    """
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    _validate_session(session_name)
+
+    forwarded = await tg_daemon.call(session_name, "telethon", {
+        "cmd": "refresh_stats", "channels": channels, "since": since.isoformat(),
+        "concurrency": concurrency, "delay": delay,
+    })
+    if forwarded is not None:
+        return forwarded
+
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        return await _refresh_stats_multiple(client, channels, since,
+                                             tg_stats.for_config(config_file), limiter=limiter,
+                                             peers=peers, concurrency=concurrency, delay=delay)
+    finally:
+        await _disconnect(client)
+
+
+async def _refresh_stats_multiple(client: "TelegramClient", channels: list, since: datetime,
+                                  store, limiter=None, peers=None,
+                                  concurrency: int = 3, delay: float = 1) -> list:
+    """Refresh stats of several channels over an existing session (see refresh_stats)."""
+    async def fetch_one(channel):
+        return await _refresh_stats(client, channel, since, store, limiter=limiter,
+                                    peers=peers)
+
+    scheduler = AdaptiveScheduler(concurrency=concurrency, interval=delay,
+                                  flood_wait_max=tg_core.FLOOD_WAIT_MAX)
+    return await scheduler.run(channels, fetch_one)
+
+
+async def _refresh_stats(client: "TelegramClient", channel: str, since: datetime, store,
+                         limiter=None, peers=None) -> dict:
+    """Take one stats snapshot of a channel over an existing session."""
+    limiter = limiter or tg_ratelimit.UNLIMITED
+    peer_cached = False
+    try:
+        entity, peer_cached = await _get_channel_entity(client, channel, peers, limiter)
+        if not peer_cached and not isinstance(entity, Channel):
+            return {"error": f"'{channel}' is not a channel", "channel": channel}
+
+        async def read_new(min_id):
+            records = []
+            history = client.iter_messages(entity, min_id=min_id)
+            await tg_core.read_history(
+                tg_ratelimit.paced(limiter, history, tg_core.HISTORY_PAGE),
+                lambda msg: _message_entry(channel, msg), records.append, since, min_id=min_id)
+            return records
+
+        async def read_views(ids):
+            await limiter.acquire()
+            result = await client(GetMessagesViewsRequest(entity, ids, increment=False))
+            return [(v.views, v.forwards) if v.views is not None else None
+                    for v in result.views]
+
+        return await tg_stats.refresh(store, channel, since, read_new, read_views)
+    except Exception as e:
+        error = _channel_error(e, channel, limiter, peers, peer_cached)
+        if error is not None:
+            return error
+        # Stale cached peer — resolve the username again
+        return await _refresh_stats(client, channel, since, store, limiter=limiter,
+                                    peers=peers)
+
+
+# ── Watch ────────────────────────────────────────────────────────────────────
+
+async def watch(channels: list, text_only: bool = False, config_file=None, session_file=None,
+                state_file=None, limit: int = 500, catch_up_interval: float = 60, write=None):
+    """Follow channels live, writing new posts as NDJSON lines (see tg_watch).
+
+    New posts arrive through an events.NewMessage handler; history newer than
+    the last known id is fetched at start, after reconnects and every
+    ``catch_up_interval`` seconds so nothing missed by updates is dropped.
+    ``state_file`` defaults to the read_unread state file from the config.
+    """
+    from tg_state import load_tracking_config
+
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    _validate_session(session_name)
+    if state_file is None:
+        state_file = load_tracking_config(config_file)[1]
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    watcher = tg_watch.Watcher(channels, write or tg_output.line_writer(), state_file,
+                               text_only=text_only, limit=limit,
+                               catch_up_interval=catch_up_interval)
+
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        async def fetch(channel, min_id, fetch_limit):
+            return await fetch_messages(client, channel, tg_core.EPOCH, fetch_limit, False,
+                                        min_id=min_id, limiter=limiter, peers=peers)
+
+        await watcher.start(fetch)
+
+        # Map marked chat ids back to the names given on the command line
+        chat_channels = {}
+        for channel in list(watcher.channels):
+            try:
+                if peers is not None:
+                    entity, _ = await _get_channel_entity(client, channel, peers, limiter)
+                else:
+                    entity = await client.get_input_entity(channel)  # cached by the catch-up
+            except Exception as e:
+                watcher.write({"type": "error", **_channel_error(e, channel, limiter, peers)})
+                continue
+            chat_channels[utils.get_peer_id(entity)] = channel
+        if not chat_channels:
+            return
+
+        async def on_message(event):
+            channel = chat_channels.get(event.chat_id)
+            if channel is not None:
+                await watcher.on_message(channel, _message_entry(channel, event.message))
+
+        client.add_event_handler(on_message, events.NewMessage(chats=list(chat_channels)))
+        await watcher.run(fetch, is_connected=client.is_connected)
+    finally:
+        await _disconnect(client)
+
+
+# ── Archive ──────────────────────────────────────────────────────────────────
+
+async def archive(channels: list, config_file=None, session_file=None,
+                  output_dir: str = tg_archive.DEFAULT_ROOT,
+                  chunk_size: int = tg_archive.DEFAULT_CHUNK_SIZE) -> list:
+    """Archive the full history of channels into chunked NDJSON files (see tg_archive).
+
+    Channels are archived one after another, each resuming from its own
+    checkpoint under ``output_dir``. Returns one status dict per channel.
+    """
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    _validate_session(session_name)
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    results = []
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        for channel in channels:
+            async def fetch(offset_id, fetch_limit, channel=channel):
+                return await fetch_messages(client, channel, tg_core.EPOCH, fetch_limit, False,
+                                            offset_id=offset_id, limiter=limiter, peers=peers)
+
+            store = tg_archive.Archive(output_dir, channel, chunk_size)
+            results.append(await store.run(fetch))
+    finally:
+        await _disconnect(client)
+    return results
+
+
+# ── Daemon ───────────────────────────────────────────────────────────────────
+
+async def serve(config_file=None, session_file=None):
+    """Run the daemon: hold one connected client and answer fetch/info/get calls over a Unix socket."""
+    api_id, api_hash, session_name = get_config(config_file, session_file)
+    _validate_session(session_name)
+    limiter = tg_ratelimit.for_session(session_name, config_file)
+    peers = tg_peers.for_config(config_file, account=session_name)
+    client = await _connect(session_name, api_id, api_hash, config_file)
+    try:
+        await tg_daemon.serve(session_name, "telethon",
+                              lambda request, emit: tg_core.serve_request(
+                                  sys.modules[__name__], fetch_messages, client, limiter, request,
+                                  emit, config_file, peers=peers))
     finally:
-        await client.disconnect()
+        await _disconnect(client)
 
 
 # ── Auth setup ───────────────────────────────────────────────────────────────
@@ -417,6 +966,7 @@ async def fetch_single(channel: str, since: datetime, limit: int, text_only: boo
 async def setup_auth(config_file=None, session_file=None):
     """Interactive first-time auth — creates session file."""
     api_id, api_hash, session_name = get_config(config_file, session_file)
+    _require_telethon()
     print(f"Starting auth for session: {session_name}.session")
     print("You will receive a code in Telegram. Enter it when prompted.\n")
     
@@ -441,225 +991,11 @@ async def setup_auth(config_file=None, session_file=None):
     await client.disconnect()
 
 
-# ── Output helpers ────────────────────────────────────────────────────────────
-
-def _print_text(result, since_label):
-    """Print human-readable text output to stdout."""
-    items = result if isinstance(result, list) else [result]
-    for ch_result in items:
-        if "error" in ch_result:
-            print(f"[ERROR] {ch_result['channel']}: {ch_result['error']}")
-            continue
-        print(f"\n=== {ch_result['channel']} ({ch_result['count']} posts since {since_label}) ===")
-        for msg in ch_result["messages"]:
-            print(f"\n[{msg['date']}] {msg['link']}")
-            print(msg["text"][:500] + ("..." if len(msg["text"]) > 500 else ""))
-            if "comments" in msg and msg["comments"]:
-                print(f"  [{msg['comment_count']} comments]")
-                for c in msg["comments"]:
-                    user = c.get("from_user") or "anonymous"
-                    print(f"    @{user}: {c['text'][:200]}")
-
-
-def _write_output(result, output_path, fmt, since_label):
-    """Write output to a file and print a short confirmation to stdout."""
-    output_path = os.path.abspath(output_path)
-    with open(output_path, "w", encoding="utf-8") as f:
-        if fmt == "json":
-            json.dump(result, f, ensure_ascii=False, indent=2)
-            f.write("\n")
-        else:
-            import io, contextlib
-            buf = io.StringIO()
-            with contextlib.redirect_stdout(buf):
-                _print_text(result, since_label)
-            f.write(buf.getvalue())
-
-    if isinstance(result, list):
-        count = sum(r.get("count", 0) for r in result if "error" not in r)
-    else:
-        count = result.get("count", 0) if "error" not in result else 0
-    print(json.dumps({"status": "ok", "output_file": output_path, "count": count}, ensure_ascii=False))
-
-
-# ── CLI helpers ──────────────────────────────────────────────────────────────
-
-# Common flags hallucinated by LLM agents instead of --since
-_FLAG_TYPOS = {
-    "--hours": "--since (e.g. --since 24h)",
-    "--days": "--since (e.g. --since 7d)",
-    "--weeks": "--since (e.g. --since 2w)",
-    "--time": "--since (e.g. --since 24h)",
-    "--period": "--since (e.g. --since 24h)",
-    "--after": "--since (e.g. --since 24h)",
-    "--from": "--since (e.g. --since 24h or --since 2026-01-01)",
-    "--media": "--text-only (inverted: use --text-only to exclude media-only posts)",
-}
-
-
-def _check_flag_typos():
-    """Catch common parameter hallucinations from LLM agents and exit with a helpful JSON error."""
-    for arg in sys.argv[1:]:
-        if arg in _FLAG_TYPOS:
-            print(json.dumps({
-                "error": f"Unknown flag: {arg}. Did you mean {_FLAG_TYPOS[arg]}?",
-                "action": "fix_command",
-            }))
-            sys.exit(1)
-
-
-class _JsonArgumentParser(argparse.ArgumentParser):
-    """ArgumentParser that outputs errors as JSON instead of plain text."""
-
-    def error(self, message):
-        # Check for flag typos in the error message
-        for typo, fix in _FLAG_TYPOS.items():
-            if typo in message:
-                print(json.dumps({
-                    "error": f"Unknown flag: {typo}. Did you mean {fix}?",
-                    "action": "fix_command",
-                }))
-                sys.exit(1)
-        print(json.dumps({"error": f"Invalid command: {message}", "action": "fix_command"}))
-        sys.exit(1)
-
-
 # ── CLI ───────────────────────────────────────────────────────────────────────
 
 def main():
-    _check_flag_typos()
-
-    parser = _JsonArgumentParser(
-        prog="tg-reader-telethon",
-        description="Read Telegram channel posts for OpenClaw agent (Telethon version)"
-    )
-    # Global options (available to all subcommands)
-    parser.add_argument("--config-file", default=None,
-                        help="Path to config JSON (overrides ~/.tg-reader.json)")
-    parser.add_argument("--session-file", default=None,
-                        help="Path to session file (overrides default session path)")
-
-    sub = parser.add_subparsers(dest="cmd", required=True)
-
-    # fetch
-    fetch_p = sub.add_parser("fetch", help="Fetch posts from one or more channels")
-    fetch_p.add_argument("channels", nargs="+", help="Channel usernames e.g. @durov")
-    fetch_p.add_argument("--since", default="24h", help="Time window: 24h, 7d, 2w, or YYYY-MM-DD")
-    fetch_p.add_argument("--limit", type=int, default=100, help="Max posts per channel (default 100)")
-    fetch_p.add_argument("--text-only", action="store_true",
-                        help="Skip posts that have no text (media-only without caption)")
-    fetch_p.add_argument("--delay", type=float, default=10,
-                        help="Seconds to wait between channels (default 10)")
-    fetch_p.add_argument("--comments", action="store_true",
-                        help="Fetch comments for each post (single channel only)")
-    fetch_p.add_argument("--comment-limit", type=int, default=10,
-                        help="Max comments per post (default 10)")
-    fetch_p.add_argument("--comment-delay", type=float, default=3,
-                        help="Seconds between comment fetches per post (default 3)")
-    fetch_p.add_argument("--format", choices=["json", "text"], default="json")
-    fetch_p.add_argument("--output", nargs="?", const="tg-output.json", default=None,
-                        help="Write output to file instead of stdout (default: tg-output.json)")
-    fetch_p.add_argument("--all", action="store_true", dest="fetch_all",
-                        help="Ignore read tracking and fetch all matching posts")
-    fetch_p.add_argument("--state-file", default=None,
-                        help="Path to state file for read tracking (overrides config)")
-
-    # auth
-    sub.add_parser("auth", help="Authenticate with Telegram (first-time setup)")
-
-    args = parser.parse_args()
-    cf = args.config_file
-    sf = args.session_file
-
-    if args.cmd == "auth":
-        asyncio.run(setup_auth(cf, sf))
-        return
-
-    if args.cmd == "fetch":
-        try:
-            since_dt = parse_since(args.since)
-        except ValueError as e:
-            print(json.dumps({"error": str(e)}))
-            sys.exit(1)
-
-        # Validate --comments constraints
-        if args.comments:
-            if len(args.channels) > 1:
-                print(json.dumps({
-                    "error": "--comments can only be used with a single channel",
-                    "action": "remove_extra_channels_or_drop_comments",
-                }))
-                sys.exit(1)
-
-        # Lower default limit when fetching comments (token economy)
-        limit = args.limit
-        if args.comments and limit == 100:
-            limit = 30
-
-        # Read tracking (read_unread mode)
-        from tg_state import load_tracking_config, load_state, get_last_read_id, update_state, save_state
-
-        read_unread, state_file_path = load_tracking_config(cf)
-        if args.state_file:
-            state_file_path = args.state_file
-
-        use_tracking = read_unread and not args.fetch_all
-        state = None
-        min_id = 0
-        min_ids = {}
-
-        if use_tracking:
-            state = load_state(state_file_path)
-            if len(args.channels) == 1:
-                min_id = get_last_read_id(state, args.channels[0])
-            else:
-                min_ids = {ch: get_last_read_id(state, ch) for ch in args.channels}
-
-            # When tracking has state, --since is not needed — fetch all unread.
-            # On first run (no state, min_id=0), --since still applies (default 24h).
-            has_state = min_id > 0 or any(v > 0 for v in min_ids.values())
-            if has_state:
-                since_dt = datetime(2000, 1, 1, tzinfo=timezone.utc)
-
-        if len(args.channels) == 1:
-            result = asyncio.run(fetch_single(
-                args.channels[0], since_dt, limit, args.text_only, cf, sf,
-                comments=args.comments, comment_limit=args.comment_limit,
-                comment_delay=args.comment_delay, min_id=min_id))
-        else:
-            result = asyncio.run(fetch_multiple(args.channels, since_dt, limit, args.text_only, cf, sf,
-                                                delay=args.delay, min_ids=min_ids))
-
-        # Update tracking state after successful fetch
-        if use_tracking and state is not None:
-            if isinstance(result, list):
-                for ch_result in result:
-                    if "error" not in ch_result and ch_result.get("messages"):
-                        newest_id = max(m["id"] for m in ch_result["messages"])
-                        update_state(state, ch_result["channel"], newest_id)
-            elif "error" not in result and result.get("messages"):
-                newest_id = max(m["id"] for m in result["messages"])
-                update_state(state, result["channel"], newest_id)
-            save_state(state, state_file_path)
-
-        # Add tracking metadata to output
-        if read_unread:
-            tracking_meta = {"enabled": True}
-            if args.fetch_all:
-                tracking_meta["overridden"] = True
-            if isinstance(result, list):
-                for ch_result in result:
-                    if "error" not in ch_result:
-                        ch_result["read_unread"] = tracking_meta.copy()
-            elif "error" not in result:
-                result["read_unread"] = tracking_meta
-
-        if args.output:
-            _write_output(result, args.output, args.format, args.since)
-        elif args.format == "json":
-            print(json.dumps(result, ensure_ascii=False, indent=2))
-        else:
-            _print_text(result, args.since)
+    tg_core.main(sys.modules[__name__], "tg-reader-telethon",
+                 "Read Telegram channel posts for OpenClaw agent (Telethon version)", fetch_single)
 
 
 if __name__ == "__main__":
@@ -7,12 +7,24 @@ setup(
     author="Sergey Mikhailov",
     url="https://github.com/bzSega/sergei-mikhailov-tg-channel-reader",
     license="MIT",
-    py_modules=["reader", "reader_telethon", "tg_reader_unified", "tg_check", "tg_state"],
+    py_modules=[
+        "reader", "reader_telethon", "tg_reader_unified", "tg_check", "tg_state",
+        "tg_daemon", "tg_scheduler", "tg_ratelimit", "tg_cache", "tg_peers",
+        "tg_output", "tg_watch", "tg_core", "tg_export", "tg_archive",
+        "tg_filter", "tg_dedup", "tg_rank", "tg_pool",
+        "tg_session", "tg_meta", "tg_media", "tg_stats",
+    ],
     install_requires=[
         "pyrogram>=2.0.0",
         "tgcrypto>=1.2.0",
         "telethon>=1.24.0",
     ],
+    extras_require={
+        # fetch --format parquet / arrow / msgpack
+        "export": ["pyarrow>=10.0", "msgpack>=1.0"],
+        "parquet": ["pyarrow>=10.0"],
+        "msgpack": ["msgpack>=1.0"],
+    },
     entry_points={
         "console_scripts": [
             "tg-reader=tg_reader_unified:main",
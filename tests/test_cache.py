@@ -0,0 +1,96 @@
+"""tg_cache: repeated windows read the cache and only download what it does not cover."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import tg_core
+from tg_cache import MessageCache, fetch_through_cache
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _date(msg_id):
+    return T0 + timedelta(minutes=msg_id)
+
+
+class _Channel:
+    """Posts 1..newest, one a minute; records every post the history walk yields."""
+
+    def __init__(self, newest):
+        self.newest = newest
+        self.downloaded = []
+
+    def history(self, offset_id, budget):
+        async def walk():
+            top = offset_id - 1 if offset_id else self.newest
+            for msg_id in range(top, 0, -1):
+                self.downloaded.append(msg_id)
+                yield tg_core.MessageRecord("@a", msg_id, _date(msg_id), f"post {msg_id}")
+        return walk()
+
+
+def _fetch(cache, channel, since_id, limit=1000, min_id=0):
+    return asyncio.run(fetch_through_cache(cache, "@a", _date(since_id), limit, min_id,
+                                           channel.history, lambda msg: msg))
+
+
+def test_repeated_window_downloads_only_new_posts(tmp_path):
+    cache = MessageCache(str(tmp_path / "cache.db"))
+    channel = _Channel(100)
+    records, from_cache = _fetch(cache, channel, since_id=51)
+    assert [r.id for r in records] == list(range(100, 50, -1))
+    assert from_cache == 0
+    assert cache.coverage("@a") == (100, _date(51).timestamp())
+
+    channel.newest = 105
+    channel.downloaded.clear()
+    records, from_cache = _fetch(cache, channel, since_id=51)
+    assert [r.id for r in records] == list(range(105, 50, -1))
+    assert from_cache == 50
+    assert channel.downloaded == [105, 104, 103, 102, 101, 100]  # 100 joins the cached range
+    assert cache.coverage("@a")[0] == 105
+
+
+def test_wider_window_fetches_the_older_part(tmp_path):
+    cache = MessageCache(str(tmp_path / "cache.db"))
+    channel = _Channel(100)
+    _fetch(cache, channel, since_id=51)
+    channel.downloaded.clear()
+    records, from_cache = _fetch(cache, channel, since_id=31)
+    assert [r.id for r in records] == list(range(100, 30, -1))
+    assert from_cache == 50
+    assert channel.downloaded[1:] == list(range(50, 29, -1))  # 30 is older than the window
+    assert cache.coverage("@a") == (100, _date(31).timestamp())
+
+
+def test_eviction_narrows_the_coverage(tmp_path):
+    cache = MessageCache(str(tmp_path / "cache.db"), max_per_channel=10)
+    channel = _Channel(100)
+    _fetch(cache, channel, since_id=51)
+    # Only the newest 10 posts are kept, so the cache vouches for nothing older
+    assert cache.coverage("@a") == (100, _date(91).timestamp())
+    channel.downloaded.clear()
+    records, from_cache = _fetch(cache, channel, since_id=51)
+    assert len(records) == 50 and from_cache == 10
+
+
+def test_cached_posts_are_marked(tmp_path):
+    cache = MessageCache(str(tmp_path / "cache.db"))
+    channel = _Channel(100)
+    _fetch(cache, channel, since_id=91)
+    channel.newest = 102
+    records, _ = _fetch(cache, channel, since_id=91)
+    assert [r.id for r in records if not r.cached] == [102, 101]
+    assert all(r.to_dict()["cached"] for r in records[2:])
+    assert "cached" not in records[0].to_dict()
+
+
+def test_read_unread_walk_keeps_the_coverage(tmp_path):
+    cache = MessageCache(str(tmp_path / "cache.db"))
+    channel = _Channel(100)
+    _fetch(cache, channel, since_id=51)
+    # --unread with the last read post above the cached range: the walk stops there
+    channel.newest = 130
+    records, from_cache = _fetch(cache, channel, since_id=51, min_id=120)
+    assert [r.id for r in records] == list(range(130, 120, -1)) and from_cache == 0
+    assert cache.coverage("@a") == (100, _date(51).timestamp())
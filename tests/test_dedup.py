@@ -0,0 +1,52 @@
+"""tg_dedup: near-duplicate posts across channels fold into the earliest one."""
+
+from datetime import datetime, timedelta, timezone
+
+import tg_core
+from tg_dedup import fold
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+STORY = "central bank raises the key rate by half a point to fight inflation this week"
+
+
+def _result(channel, *posts):
+    return {"channel": channel,
+            "messages": [tg_core.MessageRecord(channel, msg_id, T0 + timedelta(minutes=minutes), text)
+                         for msg_id, minutes, text in posts]}
+
+
+def test_fold_keeps_earliest_and_links_the_rest():
+    a = _result("@a", (10, 5, STORY + " (via @b)"), (9, 0, "weather is sunny and warm across the region today"))
+    b = _result("@b", (70, 1, STORY))
+    c = _result("@c", (3, 9, "Central bank raises the KEY RATE by half a point to fight inflation this week!"))
+    fold([a, b, c])
+
+    assert [m.id for m in b["messages"]] == [70]
+    assert b["messages"][0].also_in == ["https://t.me/a/10", "https://t.me/c/3"]
+    assert [m.id for m in a["messages"]] == [9]
+    assert c["messages"] == []
+    assert (a["duplicates"], b["duplicates"], c["duplicates"]) == (1, 0, 1)
+    assert (a["count"], c["count"]) == (1, 0)
+
+
+def test_fold_keeps_newest_fetched_id_for_read_tracking():
+    a = _result("@a", (5, 0, STORY))
+    b = _result("@b", (9, 1, STORY), (8, 0, "a different post about something else entirely here"))
+    fold([a, b])
+    assert [m.id for m in b["messages"]] == [8]
+    assert tg_core.newest_id(b) == 9
+
+
+def test_short_texts_fold_only_when_identical():
+    a = _result("@a", (1, 0, "Breaking: rates up"))
+    b = _result("@b", (2, 1, "breaking — rates up!"), (3, 2, "breaking: rates down"))
+    fold([a, b])
+    assert [m.id for m in b["messages"]] == [3]
+
+
+def test_error_results_are_left_alone():
+    error = {"channel": "@x", "error": "Channel not found"}
+    a = _result("@a", (1, 0, STORY))
+    fold([error, a])
+    assert error == {"channel": "@x", "error": "Channel not found"}
+    assert a["duplicates"] == 0
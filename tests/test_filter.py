@@ -0,0 +1,45 @@
+"""tg_filter: keyword automaton and per-channel include/exclude rules."""
+
+import pytest
+
+from tg_filter import FilterSet, KeywordAutomaton, load_rules
+
+
+def test_automaton_finds_overlapping_keywords():
+    automaton = KeywordAutomaton(["he", "she", "hers"])
+    assert automaton.search("USHERS")
+    assert automaton.search("a shell")
+    assert not automaton.search("hrs")
+
+
+def test_exclude_wins_over_include():
+    match = FilterSet({"include": ["openai"], "exclude": ["giveaway"]}).for_channel("@a")
+    assert match("OpenAI released a model")
+    assert not match("OpenAI giveaway")
+    assert not match("nothing relevant")
+    assert not match(None)
+
+
+def test_regex_and_channel_rules():
+    rules = {"include": ["re:\\bgpt-?\\d"], "channels": {"@News": {"include": ["llm"]}}}
+    filters = FilterSet(rules)
+    assert filters.for_channel("@other")("GPT-5 is out")
+    assert not filters.for_channel("@other")("an llm paper")
+    # Channel rules add to the global ones; channel names are normalized
+    assert filters.for_channel("news")("an llm paper")
+    assert filters.for_channel("news")("gpt4 notes")
+
+
+def test_load_rules_merges_config_file_and_flags(tmp_path):
+    config = tmp_path / "config.json"
+    config.write_text('{"filters": {"exclude": ["#ad"]}}')
+    filter_file = tmp_path / "filters.json"
+    filter_file.write_text('{"include": ["llm"], "channels": {"@a": {"exclude": ["spam"]}}}')
+    rules = load_rules(config, filter_file, include=["gpt"])
+    assert rules == {"exclude": ["#ad"], "include": ["llm", "gpt"],
+                     "channels": {"@a": {"exclude": ["spam"]}}}
+
+
+def test_load_rules_rejects_bad_regex(tmp_path):
+    with pytest.raises(ValueError, match="Invalid filter regex"):
+        load_rules(tmp_path / "missing.json", include=["re:("])
@@ -0,0 +1,53 @@
+"""tg_output: NDJSON lines are written once per message, also across retries and relays."""
+
+from datetime import datetime, timezone
+
+import tg_core
+from tg_output import NdjsonSink
+
+T0 = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def _sink():
+    lines = []
+    return NdjsonSink(lines.append, extra={"read_unread": {"enabled": True}}), lines
+
+
+def _record(msg_id):
+    return tg_core.MessageRecord("@a", msg_id, T0, f"post {msg_id}")
+
+
+def test_retried_channel_does_not_repeat_lines():
+    sink, lines = _sink()
+    sink.begin("@a", T0)
+    assert [sink.message("@a", _record(i)) for i in (5, 4)] == [True, True]
+    # FloodWait retry: the walk starts again from the newest post
+    sink.begin("@a", T0)
+    assert [sink.message("@a", _record(i)) for i in (6, 5, 4, 3)] == [True, False, False, True]
+    trailer = sink.end({"channel": "@a", "count": 4, "messages": []})
+
+    assert [line["type"] for line in lines] == ["channel", "message", "message", "message",
+                                                "message", "end"]
+    assert [line["id"] for line in lines if line["type"] == "message"] == [5, 4, 6, 3]
+    assert trailer["count"] == 4 and sink.total == 4
+    assert trailer["newest_id"] == 6
+    assert trailer["read_unread"] == {"enabled": True}
+    assert "messages" not in trailer
+
+
+def test_relayed_lines_count_as_written():
+    sink, lines = _sink()
+    sink.relay({"type": "channel", "channel": "@a", "since": T0.isoformat()})
+    sink.relay({"type": "message", "channel": "@a", **_record(7).to_dict()})
+    # Direct fallback after the daemon dropped: neither line is written again
+    sink.begin("@a", T0)
+    assert not sink.message("@a", _record(7))
+    assert sink.message("@a", _record(6))
+    assert len(lines) == 3
+
+
+def test_error_trailer():
+    sink, lines = _sink()
+    trailer = sink.end({"channel": "@a", "error": "Channel not found"})
+    assert trailer == {"type": "error", "channel": "@a", "error": "Channel not found"}
+    assert lines == [trailer]
@@ -0,0 +1,55 @@
+"""tg_ratelimit: the per-session token bucket shared through a file, and paced history pages."""
+
+import asyncio
+import json
+
+import pytest
+
+from tg_ratelimit import SharedRateLimiter, paced
+
+
+def test_burst_then_borrowing(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "session"), rate=10, burst=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    # The bucket goes negative: the third request waits for one token at 10/s
+    assert limiter.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_flood_wait_is_shared_and_halves_the_rate(tmp_path):
+    session = str(tmp_path / "session")
+    SharedRateLimiter(session, rate=4, burst=5).report_flood_wait(30)
+    # Another process on the same session sees the block and the learned rate
+    other = SharedRateLimiter(session, rate=4, burst=5)
+    assert other.reserve() == pytest.approx(30 + 1 / 2, abs=0.1)
+    with open(f"{session}.ratelimit") as f:
+        state = json.load(f)
+    assert state["rate"] == 2
+    assert state["last_flood_seconds"] == 30
+
+
+def test_unwritable_bucket_does_not_block(tmp_path):
+    limiter = SharedRateLimiter(str(tmp_path / "missing" / "session"))
+    assert limiter.reserve() == 0.0
+
+
+class _CountingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        self.acquired += 1
+
+
+def test_paced_takes_one_token_per_page():
+    async def history(n):
+        for i in range(n):
+            yield i
+
+    async def drain(limiter, n):
+        return [m async for m in paced(limiter, history(n), page_size=100)]
+
+    for n, pages in ((0, 1), (100, 1), (101, 2), (250, 3)):
+        limiter = _CountingLimiter()
+        assert asyncio.run(drain(limiter, n)) == list(range(n))
+        assert limiter.acquired == pages
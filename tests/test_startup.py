@@ -0,0 +1,23 @@
+"""Startup budget: the CLI modules import quickly and without the backends."""
+
+import subprocess
+import sys
+
+import tg_check
+
+
+def test_cli_imports_within_startup_budget():
+    startup, problems = tg_check._check_startup()
+    assert startup["checked"]
+    assert startup["eager_backends"] == []
+    assert problems == []
+
+
+def test_check_imports_no_reader_modules():
+    # tg-reader-check must run even when the reader modules are broken
+    probe = ("import sys, tg_check; "
+             "print([m for m in ('tg_core', 'tg_daemon', 'tg_session', 'tg_state') "
+             "if m in sys.modules])")
+    out = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                         check=True, cwd=tg_check.os.path.dirname(tg_check.__file__))
+    assert out.stdout.strip() == "[]"
@@ -0,0 +1,53 @@
+"""tg_state: the SQLite read-tracking state and its one-time import of the JSON state file."""
+
+import json
+import sqlite3
+
+from tg_state import get_last_read_id, load_state, save_state, update_state
+
+
+def _legacy(path, channels):
+    path.write_text(json.dumps({"version": 1, "channels": channels}))
+
+
+def test_json_state_is_migrated_once(tmp_path):
+    state_file = tmp_path / "state.json"
+    _legacy(state_file, {"news": {"last_read_id": 120, "updated_at": "2026-01-01T00:00:00+00:00"},
+                         "broken": "not a dict"})
+
+    state = load_state(str(state_file))
+    assert get_last_read_id(state, "@News") == 120
+    assert get_last_read_id(state, "broken") == 0
+    state.close()
+    assert (tmp_path / "state.db").exists()
+
+    # Edits to the JSON file after the migration are not imported again
+    _legacy(state_file, {"news": {"last_read_id": 999}})
+    state = load_state(str(state_file))
+    assert get_last_read_id(state, "news") == 120
+    state.close()
+
+
+def test_saved_ids_never_move_backwards(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    first, second = load_state(state_file), load_state(state_file)
+    update_state(first, "@a", 50)
+    save_state(first, state_file)
+    # Another process that read the channel earlier saves an older id
+    update_state(second, "@a", 40)
+    update_state(second, "@b", 7)
+    save_state(second, state_file)
+    first.close()
+    second.close()
+
+    with sqlite3.connect(tmp_path / "state.db") as db:
+        rows = dict(db.execute("SELECT channel, last_read_id FROM channels"))
+    assert rows == {"a": 50, "b": 7}
+
+
+def test_plain_dict_state_is_written(tmp_path):
+    state_file = str(tmp_path / "state.db")
+    save_state(update_state({}, "@a", 3), state_file)
+    state = load_state(state_file)
+    assert state.all_channels()["a"]["last_read_id"] == 3
+    state.close()
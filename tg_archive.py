@@ -0,0 +1,130 @@
+"""
+tg-reader archive — page backwards through a channel's whole history into chunked NDJSON files.
+
+`tg-reader archive @channel` walks from the newest post to the first one in
+chunks of ``chunk_size`` posts. Each chunk becomes its own file and only
+then is the checkpoint advanced, so a run that is killed, loses its
+connection or hits a long FloodWait resumes at exactly the next chunk:
+
+    tg-archive/channel/
+        checkpoint.json          {"offset_id": 81234, "chunks": 12, "count": 12000, ...}
+        chunk-000001.ndjson      newest posts, one `fetch --format ndjson` message line each
+        chunk-000002.ndjson
+        ...
+
+``offset_id`` is the lowest id archived so far; the next chunk is the posts
+below it. Memory is bounded by one chunk however long the history is. No
+heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+import tg_core
+from tg_scheduler import flood_wait_seconds
+from tg_state import _normalize_channel
+
+DEFAULT_ROOT = "tg-archive"
+DEFAULT_CHUNK_SIZE = 1000
+FLOOD_WAIT_RETRIES = 3  # consecutive short FloodWaits slept through per chunk
+_CHECKPOINT = "checkpoint.json"
+
+
+def _write_atomic(path: Path, data: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Archive:
+    """One channel's archive directory and its checkpoint.
+
+    Args:
+        root: Directory holding one subdirectory per channel
+        channel: Channel username as given on the command line
+        chunk_size: Posts per chunk file (and per history request batch)
+    """
+
+    def __init__(self, root: str, channel: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.channel = channel
+        self.chunk_size = max(1, chunk_size)
+        self.dir = Path(root) / _normalize_channel(channel)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.checkpoint_path = self.dir / _CHECKPOINT
+        self.checkpoint = {"channel": channel, "offset_id": 0, "chunks": 0, "count": 0,
+                           "newest_id": 0, "done": False}
+        if self.checkpoint_path.exists():
+            try:
+                with open(self.checkpoint_path) as f:
+                    self.checkpoint.update(json.load(f))
+            except (json.JSONDecodeError, OSError):
+                pass  # unreadable checkpoint — start over; chunk files are rewritten in order
+
+    def _save(self) -> None:
+        self.checkpoint["updated_at"] = datetime.now(timezone.utc).isoformat()
+        _write_atomic(self.checkpoint_path, json.dumps(self.checkpoint, indent=2) + "\n")
+
+    def write_chunk(self, records: list) -> None:
+        """Write one chunk file (newest first), then advance the checkpoint past it."""
+        number = self.checkpoint["chunks"] + 1
+        lines = (tg_core.dumps({"type": "message", "channel": self.channel, **r.to_dict()})
+                 for r in records)
+        _write_atomic(self.dir / f"chunk-{number:06d}.ndjson", "".join(line + "\n" for line in lines))
+        self.checkpoint["chunks"] = number
+        self.checkpoint["count"] += len(records)
+        self.checkpoint["offset_id"] = records[-1].id
+        self.checkpoint["newest_id"] = max(self.checkpoint["newest_id"], records[0].id)
+        self._save()
+
+    def status(self, **extra) -> dict:
+        return {
+            "status": "complete" if self.checkpoint["done"] else "partial",
+            "channel": self.channel,
+            "output_dir": str(self.dir.resolve()),
+            "chunks": self.checkpoint["chunks"],
+            "count": self.checkpoint["count"],
+            "offset_id": self.checkpoint["offset_id"],
+            "newest_id": self.checkpoint["newest_id"],
+            **extra,
+        }
+
+    async def run(self, fetch, flood_wait_max: int = tg_core.FLOOD_WAIT_MAX) -> dict:
+        """Fetch and write chunks until the history is exhausted or an error stops the run.
+
+        Args:
+            fetch: async ``fetch(offset_id, limit)`` -> the backend's channel
+                result dict (posts older than ``offset_id``, newest first;
+                0 = from the newest post) or channel error dict
+            flood_wait_max: FloodWaits up to this many seconds are slept
+                through, `FLOOD_WAIT_RETRIES` times in a row at most; longer
+                ones, or one more, end the run (resume later)
+
+        Returns:
+            status dict: "complete", or "partial" with the error that stopped it
+        """
+        if self.checkpoint["done"]:
+            return self.status(already_complete=True)
+        retries = 0
+        while True:
+            result = await fetch(self.checkpoint["offset_id"], self.chunk_size)
+            wait = flood_wait_seconds(result)
+            if wait and wait <= flood_wait_max and retries < FLOOD_WAIT_RETRIES:
+                retries += 1
+                await asyncio.sleep(wait)
+                continue
+            retries = 0
+            if "error" in result:
+                return self.status(**{k: v for k, v in result.items() if k != "channel"})
+            records = result["messages"]
+            if records:
+                self.write_chunk(records)
+            if len(records) < self.chunk_size:
+                self.checkpoint["done"] = True
+                self._save()
+                return self.status()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+"""
+tg-reader benchmark — measure fetch throughput offline against a fake Telegram client.
+
+Drives the real fetch path of both backends (`_fetch_multiple` →
+`_fetch_channel` / `fetch_messages`, `_fetch_comments`, `tg_core.write_output`, the
+NDJSON sink and the tg_state read-tracking functions) with an in-process
+client that serves synthetic channel histories. No account, session or
+network is needed; Pyrogram/Telethon only have to be installed, because the
+fakes answer with the libraries' own types (and raise the real FloodWait), so
+a backend reading an attribute the real objects lack fails here as well.
+
+Each (backend, scenario) pair runs in a fresh interpreter, so peak RSS is
+per run. Results are printed as JSON:
+
+    python tg_bench.py --channels 5 --messages 2000 --comment-density 0.2
+    python tg_bench.py --backend telethon --scenario ndjson --flood-every 50
+
+Scenarios:
+    fetch     collected JSON result, `tg_core.write_output` to a file, state updated
+    ndjson    streamed through tg_output.NdjsonSink to a file, state updated
+    comments  like fetch, with --comments (one comment request per post with replies)
+    parquet, arrow, msgpack
+              written in column batches by tg_export (skipped without pyarrow/msgpack)
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+
+import tg_core
+import tg_export
+import tg_output
+from tg_state import load_state, update_state, save_state
+
+_BACKENDS = {"pyrogram": "reader", "telethon": "reader_telethon"}
+_SCENARIOS = ("fetch", "ndjson", "comments", *tg_export.FORMATS)
+_EXPORT_DEPENDENCY = {"parquet": "pyarrow", "arrow": "pyarrow", "msgpack": "msgpack"}
+_PAGE = 100  # messages per fake history request, as in the backends' _HISTORY_PAGE
+_WORDS = ("channel post update news release market price report today week model data "
+          "server client bot open source telegram python fetch read agent").split()
+
+
+# ── Synthetic data ───────────────────────────────────────────────────────────
+
+class _Post:
+    """Backend-neutral synthetic post; the fake clients adapt it to each library's shape."""
+
+    __slots__ = ("id", "date", "text", "media", "replies", "views", "forwards")
+
+    def __init__(self, msg_id, date, text, media, replies, views, forwards):
+        self.id = msg_id
+        self.date = date
+        self.text = text
+        self.media = media
+        self.replies = replies
+        self.views = views
+        self.forwards = forwards
+
+
+class History:
+    """Deterministic synthetic history for one channel (newest post first).
+
+    Args:
+        channel: Channel username (seeds the generator)
+        size: Number of posts; ids run from ``size`` down to 1
+        media: Share of posts with media (a third of those have no caption)
+        comment_density: Share of posts with replies
+        comments_per_post: Replies served per post that has any
+        text_size: Average text length in characters
+        seed: Base seed; the same arguments always produce the same history
+    """
+
+    def __init__(self, channel: str, size: int, media: float = 0.3,
+                 comment_density: float = 0.2, comments_per_post: int = 5,
+                 text_size: int = 400, seed: int = 1):
+        self.channel = channel
+        self.size = size
+        self.media = media
+        self.comment_density = comment_density
+        self.comments_per_post = comments_per_post
+        self.text_size = text_size
+        self.seed = seed
+        self.newest = datetime.now(timezone.utc).replace(microsecond=0)
+
+    def _text(self, rng: random.Random, size: int) -> str:
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(_WORDS)
+            words.append(word)
+            length += len(word) + 1
+        return " ".join(words)
+
+    def posts(self, offset_id: int = 0):
+        """Yield posts newest first, starting below ``offset_id`` when it is non-zero."""
+        rng = random.Random(f"{self.seed}:{self.channel}")
+        for msg_id in range(self.size, 0, -1):
+            has_media = rng.random() < self.media
+            captioned = not has_media or rng.random() >= 1 / 3
+            text = self._text(rng, rng.randint(self.text_size // 2, self.text_size * 3 // 2)) if captioned else ""
+            media = rng.choice(("photo", "video", "document")) if has_media else None
+            replies = self.comments_per_post if rng.random() < self.comment_density else 0
+            views, forwards = rng.randint(100, 100000), rng.randint(0, 500)
+            # Every draw is made before skipping, so a page below offset_id holds the same posts
+            if offset_id and msg_id >= offset_id:
+                continue
+            yield _Post(msg_id, self.newest - timedelta(minutes=self.size - msg_id), text,
+                        media, replies, views, forwards)
+
+    def comments(self, msg_id: int, limit: int):
+        """Yield up to ``limit`` (id, date, text, user) comment tuples for a post."""
+        rng = random.Random(f"{self.seed}:{self.channel}:{msg_id}")
+        date = self.newest - timedelta(minutes=self.size - msg_id)
+        for n in range(min(limit, self.comments_per_post)):
+            # Every fifth comment is media-only (no text) and is skipped by the backends
+            text = "" if n % 5 == 4 else self._text(rng, rng.randint(20, 200))
+            yield (msg_id * 1000 + n, date + timedelta(seconds=n + 1), text, f"user{rng.randint(1, 999)}")
+
+
+# ── Fake clients ─────────────────────────────────────────────────────────────
+
+class _FakeClient:
+    """Request accounting shared by both fakes: latency and FloodWait injection.
+
+    Every API request (a history page, a comment list, a channel lookup)
+    counts; with ``flood_every`` = N the Nth, 2Nth, ... request raises the
+    backend's FloodWait for ``flood_wait`` seconds instead of answering.
+    """
+
+    def __init__(self, histories: dict, latency: float = 0.0, flood_every: int = 0,
+                 flood_wait: int = 1):
+        self.histories = histories
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_wait = flood_wait
+        self.requests = 0
+        self.flood_waits = 0
+
+    def _flood(self, seconds: int) -> Exception:
+        raise NotImplementedError
+
+    async def _request(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_every and self.requests % self.flood_every == 0:
+            self.flood_waits += 1
+            raise self._flood(self.flood_wait)
+
+    def _channel_name(self, channel_id: int) -> str:
+        return next(name for name in self.histories if _channel_id(name) == channel_id)
+
+    async def _history(self, channel: str, limit: int, offset_id: int = 0, min_id: int = 0):
+        sent = 0
+        for post in self.histories[channel].posts(offset_id):
+            if (limit and sent >= limit) or post.id <= min_id:
+                return
+            if sent % _PAGE == 0:
+                await self._request()
+            sent += 1
+            yield post
+
+    async def _comments(self, channel: str, msg_id: int, limit: int):
+        await self._request()
+        for comment in self.histories[channel].comments(msg_id, limit):
+            yield comment
+
+
+def _channel_id(channel: str) -> int:
+    """Bare channel id a fake hands out for a username (its discussion group is id + 1)."""
+    return abs(hash(channel)) % 10 ** 9
+
+
+class _FakeStorage:
+    """The subset of pyrogram's session storage that reader._resolve_chat_id uses."""
+
+    async def update_peers(self, peers: list) -> None:
+        pass
+
+
+class FakePyrogramClient(_FakeClient):
+    """The subset of pyrogram.Client that reader._fetch_channel uses."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.storage = _FakeStorage()
+        self.message_cache = {}  # filled by Pyrogram's message parser
+        self._peers = {}
+
+    def _flood(self, seconds):
+        from pyrogram.errors import FloodWait
+        return FloodWait(value=seconds)
+
+    async def resolve_peer(self, peer_id):
+        # A username costs one ResolveUsername request; Pyrogram keeps the peer afterwards
+        from pyrogram.raw.types import InputPeerChannel
+        if peer_id not in self._peers:
+            await self._request()
+            self._peers[peer_id] = InputPeerChannel(channel_id=_channel_id(peer_id), access_hash=0)
+        return self._peers[peer_id]
+
+    async def get_chat(self, chat_id):
+        from pyrogram import enums, types, utils
+        await self._request()
+        channel_id = _channel_id(chat_id)
+        linked_chat = None
+        if self.histories[chat_id].comment_density > 0:
+            linked_chat = types.Chat(id=utils.get_channel_id(channel_id + 1),
+                                     type=enums.ChatType.SUPERGROUP, client=self)
+        return types.Chat(id=utils.get_channel_id(channel_id), type=enums.ChatType.CHANNEL,
+                          title=chat_id, username=chat_id.lstrip("@"), members_count=0,
+                          linked_chat=linked_chat, client=self)
+
+    async def invoke(self, query, retries=None, timeout=None, sleep_threshold=None):
+        # Only messages.GetHistory is invoked directly (offset_date/min_id stay 0: the
+        # benchmark sets neither --until nor read tracking). The answer is a real
+        # raw response, round-tripped through TL so it has exactly the wire fields.
+        from pyrogram import raw
+        from pyrogram.raw.core import TLObject
+        await self._request()
+        channel_id = query.peer.channel_id
+        channel = self._channel_name(channel_id)
+        history = self.histories[channel]
+        posts = itertools.islice(history.posts(query.offset_id), query.limit)
+        result = raw.types.messages.ChannelMessages(
+            pts=0, count=history.size, topics=[], users=[],
+            messages=[self._raw_message(channel_id, post, history.comment_density > 0)
+                      for post in posts],
+            chats=[raw.types.Channel(id=channel_id, title=channel, photo=raw.types.ChatPhotoEmpty(),
+                                     date=0, broadcast=True, access_hash=0,
+                                     username=channel.lstrip("@"))])
+        return TLObject.read(io.BytesIO(result.write()))
+
+    @staticmethod
+    def _raw_message(channel_id: int, post: _Post, discussion: bool):
+        from pyrogram import raw
+        media = None
+        if post.media == "photo":
+            media = raw.types.MessageMediaPhoto(photo=raw.types.Photo(
+                id=post.id, access_hash=0, file_reference=b"", date=0, dc_id=2,
+                sizes=[raw.types.PhotoSize(type="y", w=1280, h=720, size=len(post.text) * 100)]))
+        elif post.media:
+            attributes = ([raw.types.DocumentAttributeVideo(duration=30, w=1280, h=720)]
+                          if post.media == "video" else
+                          [raw.types.DocumentAttributeFilename(file_name=f"{post.id}.pdf")])
+            media = raw.types.MessageMediaDocument(document=raw.types.Document(
+                id=post.id, access_hash=0, file_reference=b"", date=0, dc_id=2,
+                mime_type="video/mp4" if post.media == "video" else "application/pdf",
+                size=len(post.text) * 1000, attributes=attributes))
+        # Posts of a channel with a discussion group always carry a reply counter
+        replies = (raw.types.MessageReplies(replies=post.replies, replies_pts=0, comments=True,
+                                            channel_id=channel_id + 1) if discussion else None)
+        return raw.types.Message(id=post.id, peer_id=raw.types.PeerChannel(channel_id=channel_id),
+                                 date=int(post.date.timestamp()), message=post.text, post=True,
+                                 media=media, replies=replies, views=post.views,
+                                 forwards=post.forwards)
+
+    async def get_discussion_replies(self, chat_id, message_id: int, limit: int = 0):
+        # A media-only comment has neither text nor caption
+        from pyrogram import types, utils
+        from pyrogram.types.messages_and_media.message import Str
+        async for msg_id, date, text, user in self._comments(chat_id, message_id, limit):
+            yield types.Message(id=msg_id, date=utils.timestamp_to_datetime(int(date.timestamp())),
+                                text=Str(text) if text else None,
+                                from_user=types.User(id=msg_id, username=user, client=self),
+                                client=self)
+
+
+class FakeTelethonClient(_FakeClient):
+    """The subset of telethon.TelegramClient that reader_telethon.fetch_messages uses."""
+
+    def _flood(self, seconds):
+        from telethon.errors import FloodWaitError
+        return FloodWaitError(request=None, capture=seconds)
+
+    def __init__(self, *args, **kwargs):
+        from telethon._updates import EntityCache
+        super().__init__(*args, **kwargs)
+        # What Message._finish_init reads from the client to resolve the sender
+        self._self_id = None
+        self._mb_entity_cache = EntityCache()
+
+    async def get_entity(self, channel: str):
+        await self._request()
+        return self._channel(channel)
+
+    @staticmethod
+    def _channel(channel: str):
+        # A min channel (no access_hash), so the backend does not cache the peer
+        from telethon.tl.types import Channel, ChatPhotoEmpty
+        return Channel(id=_channel_id(channel), title=channel, photo=ChatPhotoEmpty(), date=None,
+                       broadcast=True, username=channel.lstrip("@"))
+
+    async def __call__(self, request):
+        # Only GetFullChannelRequest is sent directly
+        from telethon import utils
+        from telethon.tl.types import ChannelFull, PeerNotifySettings, PhotoEmpty
+        from telethon.tl.types.messages import ChatFull
+        await self._request()
+        channel_id = utils.get_input_channel(request.channel).channel_id  # as the client resolves it
+        channel = self._channel_name(channel_id)
+        has_comments = self.histories[channel].comment_density > 0
+        return ChatFull(full_chat=ChannelFull(
+                            id=channel_id, about="", read_inbox_max_id=0, read_outbox_max_id=0,
+                            unread_count=0, chat_photo=PhotoEmpty(id=0),
+                            notify_settings=PeerNotifySettings(), bot_info=[], pts=0,
+                            participants_count=0,
+                            linked_chat_id=channel_id + 1 if has_comments else None),
+                        chats=[self._channel(channel)], users=[])
+
+    async def iter_messages(self, entity, limit=None, offset_id: int = 0, min_id: int = 0,
+                            reply_to=None, offset_date=None, search=None):
+        # offset_date/search stay None: the benchmark sets neither --until nor --query
+        from telethon.tl import types
+        channel = self._channel_name(entity.id)
+        peer = types.PeerChannel(channel_id=entity.id)
+        if reply_to is not None:
+            async for msg_id, date, text, user in self._comments(channel, reply_to, limit or 0):
+                sender = types.User(id=msg_id, username=user)
+                msg = types.Message(id=msg_id, peer_id=peer, date=date, message=text,
+                                    from_id=types.PeerUser(user_id=msg_id),
+                                    media=None if text else self._media("photo", msg_id, 0))
+                msg._finish_init(self, {msg_id: sender}, None)  # as the real iter_messages
+                yield msg
+            return
+        discussion = self.histories[channel].comment_density > 0
+        async for post in self._history(channel, limit or 0, offset_id, min_id):
+            # Posts of a channel with a discussion group always carry a reply counter
+            replies = (types.MessageReplies(replies=post.replies, replies_pts=0, comments=True,
+                                            channel_id=entity.id + 1) if discussion else None)
+            msg = types.Message(id=post.id, peer_id=peer, date=post.date, message=post.text,
+                                post=True, media=self._media(post.media, post.id, len(post.text)),
+                                replies=replies, views=post.views, forwards=post.forwards)
+            msg._finish_init(self, {}, None)
+            yield msg
+
+    @staticmethod
+    def _media(kind, media_id: int, text_size: int):
+        from telethon.tl import types
+        if kind == "photo":
+            return types.MessageMediaPhoto(photo=types.Photo(
+                id=media_id, access_hash=0, file_reference=b"", date=None, dc_id=2,
+                sizes=[types.PhotoSize(type="y", w=1280, h=720, size=text_size * 100)]))
+        if kind:
+            attributes = ([types.DocumentAttributeVideo(duration=30, w=1280, h=720)]
+                          if kind == "video" else
+                          [types.DocumentAttributeFilename(file_name=f"{media_id}.pdf")])
+            return types.MessageMediaDocument(document=types.Document(
+                id=media_id, access_hash=0, file_reference=b"", date=None, dc_id=2,
+                mime_type="video/mp4" if kind == "video" else "application/pdf",
+                size=text_size * 1000, attributes=attributes))
+        return None
+
+
+# ── Runs ─────────────────────────────────────────────────────────────────────
+
+def _peak_rss_kb() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # bytes on macOS, KiB elsewhere
+
+
+async def _fetch(backend: str, module, client, channels: list, params: dict, sink=None):
+    comments = params["scenario"] == "comments"
+    kwargs = dict(delay=0, concurrency=params["concurrency"], sink=sink, comments=comments,
+                  comment_limit=params["comments_per_post"], comment_delay=0,
+                  comment_concurrency=params["concurrency"])
+    return await module._fetch_multiple(client, channels, tg_core.EPOCH, params["messages"], False, **kwargs)
+
+
+def run_one(backend: str, scenario: str, params: dict) -> dict:
+    """Run one scenario in this process and return its measurements."""
+    module = __import__(_BACKENDS[backend])
+    getattr(module, "_require_pyrogram" if backend == "pyrogram" else "_require_telethon")()
+    params = {**params, "scenario": scenario}
+    channels = [f"@bench{n}" for n in range(params["channels"])]
+    histories = {ch: History(ch, params["messages"], params["media"], params["comment_density"],
+                             params["comments_per_post"], params["text_size"], params["seed"])
+                 for ch in channels}
+    fake = FakePyrogramClient if backend == "pyrogram" else FakeTelethonClient
+    client = fake(histories, params["latency"] / 1000, params["flood_every"], params["flood_wait"])
+
+    with tempfile.TemporaryDirectory(prefix="tg-bench-") as tmp:
+        output_path = os.path.join(tmp, "output")
+        state_path = os.path.join(tmp, "state.json")
+        started = time.perf_counter()
+        if scenario == "ndjson":
+            with open(output_path, "w", encoding="utf-8") as stream:
+                sink = tg_output.NdjsonSink(tg_output.line_writer(stream))
+                result = asyncio.run(_fetch(backend, module, client, channels, params, sink))
+            messages = sink.total
+            fetched = time.perf_counter()
+        elif scenario in tg_export.FORMATS:
+            sink = tg_export.open_sink(scenario, output_path)
+            result = asyncio.run(_fetch(backend, module, client, channels, params, sink))
+            sink.close()
+            messages = sink.total
+            fetched = time.perf_counter()
+        else:
+            result = asyncio.run(_fetch(backend, module, client, channels, params))
+            messages = sum(r.get("count", 0) for r in result if "error" not in r)
+            fetched = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):  # swallow the status line
+                tg_core.write_output(result, output_path, "json", "bench")
+        written = time.perf_counter()
+        # A failed channel measures nothing: fail the run instead of reporting its throughput
+        errors = [r for r in result if "error" in r]
+        if errors:
+            raise RuntimeError(f"{len(errors)} of {len(result)} channels failed: "
+                               f"{errors[0]['error']}")
+
+        # Read tracking as `fetch` does it in read_unread mode
+        state = load_state(state_path)
+        for ch_result in result:
+            newest_id = tg_core.newest_id(ch_result)
+            if newest_id:
+                update_state(state, ch_result["channel"], newest_id)
+        save_state(state, state_path)
+        finished = time.perf_counter()
+        output_bytes = os.path.getsize(output_path)
+
+    elapsed = finished - started
+    return {
+        "backend": backend,
+        "scenario": scenario,
+        "messages": messages,
+        "comments": sum(len(m.comments or ()) for r in result for m in r.get("messages", ())),
+        "requests": client.requests,
+        "flood_waits": client.flood_waits,
+        "seconds": round(elapsed, 3),
+        "fetch_seconds": round(fetched - started, 3),
+        "write_seconds": round(written - fetched, 3),
+        "state_seconds": round(finished - written, 3),
+        "msgs_per_sec": round(messages / elapsed, 1) if elapsed else None,
+        "peak_rss_kb": _peak_rss_kb(),
+        "output_bytes": output_bytes,
+    }
+
+
+def _run_isolated(backend: str, scenario: str, params: dict) -> dict:
+    """Run one scenario in a fresh interpreter so peak RSS is not shared between runs."""
+    for module in (backend, _EXPORT_DEPENDENCY.get(scenario)):
+        if module and importlib.util.find_spec(module) is None:
+            return {"backend": backend, "scenario": scenario, "skipped": f"{module} not installed"}
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--run-one", backend, scenario,
+         json.dumps(params)],
+        capture_output=True, text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {"backend": backend, "scenario": scenario, "error": (proc.stderr or proc.stdout).strip()[-500:]}
+    return json.loads(lines[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="tg_bench",
+        description="Benchmark tg-reader fetch paths offline against a fake Telegram client")
+    parser.add_argument("--backend", choices=["pyrogram", "telethon", "both"], default="both")
+    parser.add_argument("--scenario", choices=list(_SCENARIOS) + ["all"], default="all")
+    parser.add_argument("--channels", type=int, default=5, help="Channels fetched at once (default 5)")
+    parser.add_argument("--messages", type=int, default=2000,
+                        help="Posts per channel, all inside the window (default 2000)")
+    parser.add_argument("--media", type=float, default=0.3,
+                        help="Share of posts with media, a third of them without caption (default 0.3)")
+    parser.add_argument("--comment-density", type=float, default=0.2,
+                        help="Share of posts with replies (default 0.2)")
+    parser.add_argument("--comments-per-post", type=int, default=5,
+                        help="Replies per post that has any; also the comment limit (default 5)")
+    parser.add_argument("--text-size", type=int, default=400, help="Average post length in characters")
+    parser.add_argument("--flood-every", type=int, default=0,
+                        help="Answer every Nth API request with a FloodWait (default 0: never); "
+                             "the schedulers really sleep through it, so keep N large")
+    parser.add_argument("--flood-wait", type=int, default=1, help="Injected FloodWait length in seconds")
+    parser.add_argument("--latency", type=float, default=0, help="Milliseconds per fake API request")
+    parser.add_argument("--concurrency", type=int, default=3,
+                        help="Channel and comment concurrency (default 3)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--run-one", nargs=3, metavar=("BACKEND", "SCENARIO", "PARAMS"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        backend, scenario, params = args.run_one
+        print(json.dumps(run_one(backend, scenario, json.loads(params))))
+        return
+
+    params = {key: getattr(args, key) for key in (
+        "channels", "messages", "media", "comment_density", "comments_per_post", "text_size",
+        "flood_every", "flood_wait", "latency", "concurrency", "seed")}
+    backends = list(_BACKENDS) if args.backend == "both" else [args.backend]
+    scenarios = list(_SCENARIOS) if args.scenario == "all" else [args.scenario]
+    results = [_run_isolated(b, s, params) for b in backends for s in scenarios]
+    print(json.dumps({"params": params, "results": results}, ensure_ascii=False, indent=2))
+    if any("error" in r for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""
+tg-reader message cache — persistent SQLite store so repeated `--since` windows only download the delta.
+
+Messages are stored per (channel, message id) as the same entry dicts that
+`fetch` outputs (without comments) and read back as tg_core.MessageRecord. A per-channel *coverage* row records
+what the cache is known to hold completely:
+
+    every message with id <= hi_id and date >= lo_ts is in the cache
+
+`fetch_through_cache` reads that first, asks Telegram only for messages
+newer than hi_id and, if the window reaches further back, for messages
+older than the cached range, then merges everything in newest-first order.
+Cached posts are not refreshed (that would cost the requests the cache
+saves): they come back with ``cached`` set, so their views and forwards are
+known to be as of when they were first fetched.
+Size is bounded per channel and in total; the oldest messages go first.
+No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+from tg_core import MessageRecord
+from tg_state import _normalize_channel
+
+_DEFAULT_CACHE_FILE = str(Path.home() / ".tg-reader-cache.db")
+_DEFAULT_MAX_PER_CHANNEL = 5000
+_DEFAULT_MAX_TOTAL = 200000
+
+
+def load_cache_config(config_file=None) -> dict:
+    """Load message cache settings from config file and env vars.
+
+    Config: ``"message_cache": true`` or ``"message_cache": {"path": ...,
+    "max_per_channel": ..., "max_total": ...}`` in ~/.tg-reader.json.
+    Env vars: TG_MESSAGE_CACHE ("true"/"1"/"false"/"0"), TG_CACHE_FILE.
+
+    Returns:
+        dict with keys enabled, path, max_per_channel, max_total
+    """
+    settings = {
+        "enabled": False,
+        "path": _DEFAULT_CACHE_FILE,
+        "max_per_channel": _DEFAULT_MAX_PER_CHANNEL,
+        "max_total": _DEFAULT_MAX_TOTAL,
+    }
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("message_cache", False)
+            if isinstance(cfg, dict):
+                settings["enabled"] = cfg.get("enabled", True)
+                for key in ("path", "max_per_channel", "max_total"):
+                    if key in cfg:
+                        settings[key] = cfg[key]
+            else:
+                settings["enabled"] = bool(cfg)
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+
+    env_enabled = os.environ.get("TG_MESSAGE_CACHE", "").strip().lower()
+    if env_enabled in ("true", "1"):
+        settings["enabled"] = True
+    elif env_enabled in ("false", "0"):
+        settings["enabled"] = False
+
+    env_path = os.environ.get("TG_CACHE_FILE", "").strip()
+    if env_path:
+        settings["path"] = env_path
+    return settings
+
+
+_open_caches: dict = {}
+
+
+def for_config(config_file=None, use_cache=None):
+    """Return the MessageCache to use for a fetch, or None when caching is off.
+
+    Args:
+        config_file: Config path (see load_cache_config)
+        use_cache: True/False from --cache/--no-cache; None follows the config
+    """
+    settings = load_cache_config(config_file)
+    enabled = settings["enabled"] if use_cache is None else use_cache
+    if not enabled:
+        return None
+    path = str(settings["path"])
+    if path not in _open_caches:
+        _open_caches[path] = MessageCache(path, settings["max_per_channel"], settings["max_total"])
+    return _open_caches[path]
+
+
+class MessageCache:
+    """SQLite-backed message store with per-channel coverage and bounded size."""
+
+    def __init__(self, path: str, max_per_channel: int = _DEFAULT_MAX_PER_CHANNEL,
+                 max_total: int = _DEFAULT_MAX_TOTAL):
+        self.path = path
+        self.max_per_channel = max_per_channel
+        self.max_total = max_total
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                channel TEXT NOT NULL,
+                id INTEGER NOT NULL,
+                ts REAL NOT NULL,
+                entry TEXT NOT NULL,
+                PRIMARY KEY (channel, id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS messages_ts ON messages (ts);
+            CREATE TABLE IF NOT EXISTS coverage (
+                channel TEXT PRIMARY KEY,
+                hi_id INTEGER NOT NULL,
+                lo_ts REAL NOT NULL
+            );
+        """)
+        try:
+            os.chmod(path, 0o600)  # cached posts may come from private channels
+        except OSError:
+            pass
+
+    def coverage(self, channel: str):
+        """Return (hi_id, lo_ts) for a channel, or None if nothing is cached."""
+        row = self._db.execute(
+            "SELECT hi_id, lo_ts FROM coverage WHERE channel = ?", (_normalize_channel(channel),)
+        ).fetchone()
+        return tuple(row) if row else None
+
+    def read(self, channel: str, max_id: int, min_ts: float, min_id: int, limit: int) -> list:
+        """Cached records with min_id < id <= max_id and date >= min_ts, newest first, marked ``cached``."""
+        rows = self._db.execute(
+            "SELECT entry FROM messages WHERE channel = ? AND id <= ? AND id > ? AND ts >= ? "
+            "ORDER BY id DESC LIMIT ?",
+            (_normalize_channel(channel), max_id, min_id, min_ts, limit),
+        ).fetchall()
+        records = [MessageRecord.from_dict(channel, json.loads(r[0])) for r in rows]
+        for record in records:
+            record.cached = True
+        return records
+
+    def store(self, channel: str, entries: list, hi_id: int, lo_ts: float) -> None:
+        """Upsert records, set the channel's coverage, then enforce the size bounds."""
+        key = _normalize_channel(channel)
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO messages (channel, id, ts, entry) VALUES (?, ?, ?, ?)",
+                [(key, e.id, e.ts, json.dumps(e.to_dict(), ensure_ascii=False)) for e in entries],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO coverage (channel, hi_id, lo_ts) VALUES (?, ?, ?)",
+                (key, hi_id, lo_ts),
+            )
+            self._evict(key)
+
+    def _evict(self, key: str) -> None:
+        """Drop the oldest messages beyond the per-channel and total bounds."""
+        cur = self._db.execute(
+            "DELETE FROM messages WHERE channel = ? AND id < ("
+            "  SELECT id FROM messages WHERE channel = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+            (key, key, self.max_per_channel - 1),
+        )
+        affected = {key} if cur.rowcount > 0 else set()
+
+        total = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        if total > self.max_total:
+            victims = self._db.execute(
+                "SELECT channel, id FROM messages ORDER BY ts LIMIT ?", (total - self.max_total,)
+            ).fetchall()
+            self._db.executemany("DELETE FROM messages WHERE channel = ? AND id = ?", victims)
+            affected.update(channel for channel, _ in victims)
+
+        # Coverage can only claim what is still stored. Eviction always removes
+        # the oldest messages, so the oldest survivor is the new lower bound.
+        for channel in affected:
+            oldest = self._db.execute(
+                "SELECT MIN(ts) FROM messages WHERE channel = ?", (channel,)
+            ).fetchone()[0]
+            if oldest is None:
+                self._db.execute("DELETE FROM coverage WHERE channel = ?", (channel,))
+            else:
+                self._db.execute(
+                    "UPDATE coverage SET lo_ts = MAX(lo_ts, ?) WHERE channel = ?", (oldest, channel)
+                )
+
+
+async def fetch_through_cache(cache: MessageCache, channel: str, since: datetime, limit: int,
+                              min_id: int, history, convert) -> tuple:
+    """Fetch up to ``limit`` records newer than ``since``/``min_id``, reading the cache first.
+
+    Args:
+        cache: MessageCache for this run
+        channel: Channel username as given on the command line
+        since: Oldest post date to include
+        limit: Max posts (same meaning as --limit: counted before --text-only)
+        min_id: Stop at this message id (read_unread); 0 for none
+        history: ``history(offset_id, limit)`` -> async iterator of raw messages,
+            newest first, older than ``offset_id`` when it is non-zero
+        convert: ``convert(msg)`` -> tg_core.MessageRecord
+
+    Returns:
+        (records newest first, number of records served from the cache)
+
+    Backend errors (FloodWait, access denied, ...) propagate to the caller.
+    """
+    since_ts = since.timestamp()
+    cov = cache.coverage(channel)
+
+    async def walk(offset_id: int, stop_id: int, budget: int):
+        """Read live history; return (entries, first_seen_id, stop_reason)."""
+        entries: list = []
+        first_seen = 0
+        async for msg in history(offset_id, budget):
+            entry = convert(msg)
+            first_seen = first_seen or entry.id
+            if stop_id and entry.id <= stop_id:
+                return entries, first_seen, "joined"
+            if entry.ts < since_ts:
+                return entries, first_seen, "since"
+            if min_id and entry.id <= min_id:
+                return entries, first_seen, "min_id"
+            entries.append(entry)
+            if len(entries) >= budget:
+                return entries, first_seen, "limit"
+        return entries, first_seen, "exhausted"
+
+    def floor_ts(entries: list, reason: str) -> float:
+        """Coverage lower bound implied by why a walk stopped."""
+        if reason == "since":
+            return since_ts
+        if reason == "exhausted":
+            return 0.0
+        # Stopped early: only vouch for the messages actually seen
+        return entries[-1].ts + 1 if entries else float("inf")
+
+    newer, first_seen, reason = await walk(0, cov[0] if cov else 0, limit)
+    collected = list(newer)
+    from_cache = 0
+
+    if reason == "joined":
+        hi_id, lo_ts = cov
+        if newer:
+            hi_id = first_seen
+        if len(collected) < limit:
+            cached = cache.read(channel, cov[0], max(since_ts, cov[1]), min_id, limit - len(collected))
+            from_cache = len(cached)
+            collected.extend(cached)
+        # Window reaches past what the cache holds — fetch the older part live
+        offset_id = collected[-1].id if collected else cov[0] + 1
+        if len(collected) < limit and since_ts < cov[1] and min_id < offset_id - 1:
+            older, _, older_reason = await walk(offset_id, 0, limit - len(collected))
+            collected.extend(older)
+            lo_ts = min(lo_ts, floor_ts(older, older_reason))
+            newer = newer + older
+        cache.store(channel, newer, hi_id, lo_ts)
+    elif reason == "min_id" and cov:
+        # read_unread: the walk stopped at the last read post, above the cached
+        # range, so it says nothing about what the cache holds; keep the coverage
+        pass
+    elif first_seen:
+        # No overlap with what was cached before: the new run replaces the coverage
+        cache.store(channel, newer, first_seen, floor_ts(newer, reason))
+
+    return collected, from_cache
@@ -8,15 +8,16 @@ Outputs JSON; exits 0 if healthy, 1 if problems found.
 import argparse
 import json
 import os
+import sqlite3
+import subprocess
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
 
 
 # ── Session discovery ────────────────────────────────────────────────────────
-# Copied from reader.py — we cannot import reader because it pulls in pyrogram
-# at module level, and the whole point of this script is to work even when
-# backends are not installed.
+# Copied from tg_core.py — this script must keep working even when the reader
+# modules or the backends are broken or not installed, so it imports none of them.
 
 _SESSION_NAMES = [
     ".tg-reader-session.session",
@@ -252,6 +253,121 @@ def _check_backends() -> tuple:
     return result, problems
 
 
+# ── Daemon check ─────────────────────────────────────────────────────────────
+
+def _check_daemon(session_name: str) -> dict:
+    """Report whether a `tg-reader serve` daemon is running for this session."""
+    import tg_daemon
+    return {
+        "socket": tg_daemon.socket_path(session_name),
+        "running": tg_daemon.is_running(session_name),
+        "disabled": tg_daemon.daemon_disabled(),
+    }
+
+
+# ── Session pool ─────────────────────────────────────────────────────────────
+
+def _check_pool(config_file=None) -> tuple:
+    """Check the "sessions" pool in the config (see tg_pool), if any.
+
+    Returns:
+        (pool_dict, problems_list)
+    """
+    problems: list = []
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    entries = None
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                entries = json.load(f).get("sessions")
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+    if not entries:
+        return {"enabled": False}, problems
+    if not isinstance(entries, list):
+        problems.append('"sessions" in config must be a list')
+        return {"enabled": False}, problems
+
+    sessions = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"session": entry}
+        if not isinstance(entry, dict) or not entry.get("session"):
+            problems.append(f'Invalid "sessions" entry in config: {entry!r}')
+            continue
+        name = str(Path(entry["session"]).expanduser()).removesuffix(".session")
+        exists = Path(f"{name}.session").exists()
+        sessions.append({"session": name, "exists": exists,
+                         "own_credentials": bool(entry.get("api_id"))})
+        if not exists:
+            problems.append(f"Pool session file not found: {name}.session")
+    return {"enabled": len(sessions) > 1, "sessions": sessions}, problems
+
+
+# ── Startup budget ───────────────────────────────────────────────────────────
+
+# Importing the CLI modules must stay cheap: Pyrogram/Telethon are only
+# imported once a command needs the network (_require_pyrogram/_require_telethon),
+# so typo errors, --help and bad --since values answer within this budget.
+_STARTUP_BUDGET_MS = 150
+# A cold disk cache can slow the first probe down; only a probe that is still
+# over budget * tolerance when repeated counts as a problem
+_STARTUP_TOLERANCE = 1.25
+
+_STARTUP_PROBE = (
+    "import json, sys, time\n"
+    "t = time.perf_counter()\n"
+    "import tg_reader_unified, reader, reader_telethon\n"
+    "ms = (time.perf_counter() - t) * 1000\n"
+    "eager = [m for m in ('pyrogram', 'telethon') if m in sys.modules]\n"
+    "print(json.dumps({'import_ms': ms, 'eager_backends': eager}))\n"
+)
+
+
+def _run_startup_probe() -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-c", _STARTUP_PROBE],
+        capture_output=True, text=True, timeout=30,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _check_startup() -> tuple:
+    """Time the CLI module imports in a fresh interpreter against _STARTUP_BUDGET_MS.
+
+    Returns:
+        (startup_dict, problems_list)
+    """
+    problems: list = []
+    try:
+        probe = _run_startup_probe()
+        if probe["import_ms"] > _STARTUP_BUDGET_MS:
+            probe = min(probe, _run_startup_probe(), key=lambda p: p["import_ms"])
+    except (OSError, subprocess.SubprocessError, ValueError, IndexError):
+        return {"checked": False}, problems
+
+    import_ms = round(probe["import_ms"], 1)
+    result = {
+        "checked": True,
+        "import_ms": import_ms,
+        "budget_ms": _STARTUP_BUDGET_MS,
+        "within_budget": import_ms <= _STARTUP_BUDGET_MS,
+        "eager_backends": probe["eager_backends"],
+    }
+    if probe["eager_backends"]:
+        problems.append(
+            f"Importing tg-reader loads {', '.join(probe['eager_backends'])} at startup; "
+            "backend imports must stay lazy"
+        )
+    if import_ms > _STARTUP_BUDGET_MS * _STARTUP_TOLERANCE:
+        problems.append(
+            f"Importing tg-reader takes {import_ms} ms, over the {_STARTUP_BUDGET_MS} ms "
+            "startup budget; see TESTING_GUIDE.md"
+        )
+    return result, problems
+
+
 # ── Orchestration ────────────────────────────────────────────────────────────
 
 def _check_tracking(config_file=None) -> tuple:
@@ -292,20 +408,40 @@ def _check_tracking(config_file=None) -> tuple:
     if env_state_file:
         state_file = env_state_file
 
+    from tg_state import state_db_path
+    state_db = state_db_path(state_file)
     result: dict = {
         "read_unread": read_unread,
         "state_file": state_file,
         "state_file_exists": Path(state_file).exists(),
+        "state_db": state_db,
+        "state_db_exists": Path(state_db).exists(),
     }
     if source:
         result["source"] = source
 
-    if read_unread and Path(state_file).exists():
+    if read_unread and Path(state_db).exists():
+        # Read-only: the check must not create tables or run the JSON migration
+        try:
+            db = sqlite3.connect(f"file:{state_db}?mode=ro", uri=True, timeout=5)
+            try:
+                rows = db.execute("SELECT channel, updated_at FROM channels").fetchall()
+            finally:
+                db.close()
+            result["tracked_channels"] = len(rows)
+            if rows:
+                result["channels"] = dict(rows)
+        except sqlite3.Error as e:
+            result["state_db_valid"] = False
+            problems.append(f"State database {state_db} is unreadable: {e}")
+    elif read_unread and Path(state_file).exists():
+        # Not migrated yet — the next fetch imports this JSON file
         try:
             with open(state_file) as f:
                 state_data = json.load(f)
             channels = state_data.get("channels", {})
             result["tracked_channels"] = len(channels)
+            result["migration_pending"] = True
             if channels:
                 result["channels"] = {
                     k: v.get("updated_at", "unknown") for k, v in channels.items()
@@ -326,7 +462,9 @@ def run_check(config_file=None, session_file=None) -> dict:
     )
     all_problems.extend(cred_problems)
 
+    from tg_session import in_memory_enabled
     session, sess_problems = _check_session(session_name, default_session)
+    session["in_memory"] = in_memory_enabled(config_file)
     all_problems.extend(sess_problems)
 
     backends, backend_problems = _check_backends()
@@ -335,6 +473,14 @@ def run_check(config_file=None, session_file=None) -> dict:
     tracking, tracking_problems = _check_tracking(config_file)
     all_problems.extend(tracking_problems)
 
+    pool, pool_problems = _check_pool(config_file)
+    all_problems.extend(pool_problems)
+
+    daemon = _check_daemon(session_name)
+
+    startup, startup_problems = _check_startup()
+    all_problems.extend(startup_problems)
+
     status = "ok" if not all_problems else "error"
 
     return {
@@ -343,6 +489,9 @@ def run_check(config_file=None, session_file=None) -> dict:
         "session": session,
         "backends": backends,
         "tracking": tracking,
+        "pool": pool,
+        "daemon": daemon,
+        "startup": startup,
         "problems": all_problems,
     }
 
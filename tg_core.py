@@ -0,0 +1,1071 @@
+"""
+tg-reader core — backend-neutral code shared by reader.py (Pyrogram) and reader_telethon.py (Telethon).
+
+Config and session lookup, ``--since`` and `get` id parsing and channel error dicts; the
+slotted `MessageRecord`/`CommentRecord` every fetch produces; the history
+pipeline both backends feed with their own message converter; and the
+output edge (`dumps`, `print_text`, `write_output`), the only place where
+records become JSON dicts. Also the command line (`main`) and the daemon's
+request dispatch (`serve_request`), both run against a backend module that
+keeps only client construction and the fetch primitives. No heavy
+dependencies (no Pyrogram/Telethon); the tg_* modules the CLI needs are
+imported when it runs.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+FLOOD_WAIT_MAX = 60  # auto-retry only if wait is <= this many seconds
+HISTORY_PAGE = 100  # messages per GetHistory request (rate limiter cost unit)
+COMMENT_BATCH = 20  # posts buffered while their comments are fetched concurrently
+GET_BATCH = 200  # message ids per GetMessages request (Telegram's maximum)
+MAX_GET_IDS = 10000  # ids one `get` may ask for
+EPOCH = datetime(2000, 1, 1, tzinfo=timezone.utc)  # "since" that never stops a walk
+
+
+class ChannelNotFound(Exception):
+    """A backend could not resolve a channel username (raised by the resolve step only)."""
+
+
+def channel_error(channel: str, error_type: str, message: str, action: str) -> dict:
+    """Build a structured channel error dict for the agent."""
+    return {
+        "error": message,
+        "error_type": error_type,
+        "channel": channel,
+        "action": action,
+    }
+
+
+# error_type -> (message prefix, action) for errors raised by a channel request
+_CHANNEL_ERRORS = {
+    "access_denied": ("Channel is private or access denied", "remove_from_list_or_rejoin"),
+    "banned": ("Banned from channel", "remove_from_list"),
+    "not_found": ("Channel not found or username is incorrect", "check_username"),
+    "invite_expired": ("Invite link expired or invalid", "request_new_invite"),
+    "session_revoked": ("Session is no longer authorized", "reauthorize_session"),
+    "unexpected": ("Unexpected error", "report_to_user"),
+}
+
+
+def exception_error(channel: str, error_type: str, e: Exception) -> dict:
+    """Channel error dict for an exception a backend classified as ``error_type``."""
+    message, action = _CHANNEL_ERRORS[error_type]
+    return channel_error(channel, error_type, f"{message}: {e}", action)
+
+
+def flood_wait_error(channel: str, seconds: int) -> dict:
+    """Channel error dict for a FloodWait (tg_scheduler reads the wait from ``action``)."""
+    return channel_error(channel, "flood_wait", f"Rate limited: retry after {seconds}s",
+                         f"wait_{seconds}s")
+
+
+# ── Session helpers ──────────────────────────────────────────────────────────
+
+SESSION_NAMES = [
+    ".tg-reader-session.session",
+    ".telethon-reader.session",
+    "tg-reader-session.session",
+    "telethon-reader.session",
+]
+
+
+def find_session_files() -> list:
+    """Find tg-reader session files in home directory and current working directory.
+
+    Only looks for known tg-reader session names — does not scan for
+    arbitrary *.session files to avoid exposing unrelated session paths.
+    """
+    found = []
+    seen: set = set()
+    dirs_checked: set = set()
+    for d in [Path.home(), Path.cwd()]:
+        d = d.resolve()
+        if d in dirs_checked:
+            continue
+        dirs_checked.add(d)
+        for name in SESSION_NAMES:
+            f = d / name
+            if f.exists():
+                resolved = f.resolve()
+                if resolved in seen:
+                    continue
+                seen.add(resolved)
+                found.append(f)
+    found.sort(key=lambda p: p.stat().st_mtime, reverse=True)
+    return found
+
+
+def validate_session(session_name: str, auth_command: str) -> None:
+    """Verify the session file exists; exit with a JSON error and hints if not.
+
+    Both Pyrogram and Telethon store sessions as ``{name}.session``.
+    This check prevents a silent re-auth prompt when the file is missing.
+    ``auth_command`` is the backend's command for creating a session.
+    """
+    session_file = Path(f"{session_name}.session")
+    if session_file.exists():
+        return
+
+    found = find_session_files()
+    error: dict = {
+        "error": f"Session file not found: {session_file}",
+        "expected_path": str(session_file),
+        "fix": [
+            f"Run '{auth_command}' to create a new session",
+            "Or set TG_SESSION=/path/to/existing-session (without .session suffix)",
+            "Or add {\"session\": \"/path/to/session\"} to ~/.tg-reader.json",
+            "Or pass --session-file /path/to/session (without .session suffix)",
+        ],
+    }
+    if found:
+        error["found_sessions"] = [str(f) for f in found[:10]]
+        suggestion = str(found[0]).removesuffix(".session")
+        error["suggestion"] = f"Likely fix: use --session-file {suggestion}"
+
+    print(json.dumps(error, indent=2))
+    sys.exit(1)
+
+
+# ── Config ──────────────────────────────────────────────────────────────────
+
+def get_config(config_file=None, session_file=None, default_session=None):
+    """Load credentials from env or config file (env takes priority).
+
+    Args:
+        config_file: Explicit path to config JSON (overrides ~/.tg-reader.json)
+        session_file: Explicit path to session file (overrides default and config value)
+        default_session: Backend's session path when neither TG_SESSION nor config set one
+    """
+    api_id = os.environ.get("TG_API_ID")
+    api_hash = os.environ.get("TG_API_HASH")
+    session_name = os.environ.get("TG_SESSION", default_session or str(Path.home() / ".tg-reader-session"))
+
+    if not api_id or not api_hash:
+        config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+        if config_path.exists():
+            with open(config_path) as f:
+                cfg = json.load(f)
+                api_id = api_id or cfg.get("api_id")
+                api_hash = api_hash or cfg.get("api_hash")
+                session_name = cfg.get("session", session_name)
+
+    # Explicit --session-file overrides everything
+    if session_file:
+        session_name = session_file
+
+    if not api_id or not api_hash:
+        print(json.dumps({
+            "error": "Missing credentials. Set TG_API_ID and TG_API_HASH env vars, "
+                     "or create ~/.tg-reader.json with {\"api_id\": ..., \"api_hash\": \"...\"}. "
+                     "For isolated agents, pass --config-file /path/to/tg-reader.json"
+        }))
+        sys.exit(1)
+
+    # Normalize: strip .session suffix if user passed full filename
+    if session_name.endswith(".session"):
+        session_name = session_name[: -len(".session")]
+
+    return int(api_id), api_hash, session_name
+
+
+def parse_since(since: str, flag: str = "--since") -> datetime:
+    """Parse --since flag: '24h', '7d', '2026-02-01', etc."""
+    since = since.strip()
+    now = datetime.now(timezone.utc)
+    if since.endswith("h"):
+        return now - timedelta(hours=int(since[:-1]))
+    if since.endswith("d"):
+        return now - timedelta(days=int(since[:-1]))
+    if since.endswith("w"):
+        return now - timedelta(weeks=int(since[:-1]))
+    # Try ISO date
+    try:
+        dt = datetime.fromisoformat(since)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        return dt
+    except ValueError:
+        raise ValueError(f"Cannot parse {flag} value: {since!r}. Use '24h', '7d', or 'YYYY-MM-DD'.")
+
+
+def parse_until(until: str) -> datetime:
+    """Parse --until flag (same forms as --since; the window ends just before it)."""
+    return parse_since(until, "--until")
+
+
+def read_channels_file(path: str) -> list:
+    """Read a --channels-file: one channel per line; blank lines and ``#`` comments skipped.
+
+    Raises:
+        ValueError: the file cannot be read
+    """
+    try:
+        with open(Path(path).expanduser(), encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+    except OSError as e:
+        raise ValueError(f"Cannot read --channels-file {path}: {e}")
+    return [line for line in lines if line]
+
+
+_POST_LINK = re.compile(r"^(?:https?://)?t\.me/(?:s/)?([A-Za-z0-9_]+)/(\d+)/?$")
+_ID_RANGE = re.compile(r"^(\d+)(?:-(\d+))?$")
+
+
+def parse_message_ids(channel: str, specs: list) -> list:
+    """Parse `get` arguments: ids (1200), ranges (1305-1400) and t.me links to ``channel`` posts.
+
+    Returns:
+        The distinct ids, newest first
+
+    Raises:
+        ValueError: malformed argument, link to another channel or more than MAX_GET_IDS ids
+    """
+    ranges = []
+    for spec in specs:
+        link = _POST_LINK.match(spec.strip())
+        if link:
+            if link.group(1).lower() != channel.lstrip("@").lower():
+                raise ValueError(f"{spec} is a post of @{link.group(1)}, not {channel}")
+            ranges.append((int(link.group(2)), int(link.group(2))))
+            continue
+        m = _ID_RANGE.match(spec.strip())
+        if not m:
+            raise ValueError(f"Invalid message id: {spec!r}. Use 1200, 1305-1400 or a t.me link")
+        first, last = int(m.group(1)), int(m.group(2) or m.group(1))
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid message id range: {spec!r}")
+        ranges.append((first, last))
+    if sum(last - first + 1 for first, last in ranges) > MAX_GET_IDS:
+        raise ValueError(f"Too many message ids (max {MAX_GET_IDS} per call)")
+    ids = set()
+    for first, last in ranges:
+        ids.update(range(first, last + 1))
+    return sorted(ids, reverse=True)
+
+
+def get_result(channel: str, ids: list, found: dict) -> dict:
+    """The `get` result: posts found (in ``ids`` order) and the ids Telegram had no post for.
+
+    Args:
+        ids: Requested ids, newest first (parse_message_ids)
+        found: message id -> MessageRecord
+    """
+    return {
+        "channel": channel,
+        "fetched_at": datetime.now(timezone.utc).isoformat(),
+        "requested": len(ids),
+        "count": len(found),
+        "messages": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found],
+    }
+
+
+# ── Records ──────────────────────────────────────────────────────────────────
+
+def _utc(date: datetime) -> datetime:
+    return date if date.tzinfo else date.replace(tzinfo=timezone.utc)
+
+
+class CommentRecord:
+    """One discussion reply, as produced by the backends' comment fetchers."""
+
+    __slots__ = ("id", "date", "text", "from_user")
+
+    def __init__(self, msg_id: int, date: datetime, text: str, from_user=None):
+        self.id = msg_id
+        self.date = _utc(date)
+        self.text = text
+        self.from_user = from_user
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "date": self.date.isoformat(), "text": self.text,
+                "from_user": self.from_user}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CommentRecord":
+        return cls(data["id"], datetime.fromisoformat(data["date"]), data["text"],
+                   data.get("from_user"))
+
+
+class MessageRecord:
+    """One channel post between the backend and the output edge.
+
+    ``date`` is kept as an aware datetime and the link is derived from the
+    channel, so nothing is formatted until `to_dict`. ``comments`` stays None
+    unless comments were requested for the post; ``also_in`` stays None unless
+    near-duplicates were folded into it (tg_dedup); ``media_path`` and
+    ``media_skipped`` stay None unless its attachment was downloaded (tg_media);
+    ``cached`` is True for a post served from the message cache (tg_cache),
+    whose views and forwards are as of when it was first fetched.
+    """
+
+    __slots__ = ("channel", "id", "date", "text", "views", "forwards", "media_type",
+                 "comments", "comments_error", "also_in", "media_path", "media_skipped",
+                 "cached")
+
+    def __init__(self, channel: str, msg_id: int, date: datetime, text: str, views=None,
+                 forwards=None, media_type=None):
+        self.channel = channel
+        self.id = msg_id
+        self.date = _utc(date)
+        self.text = text
+        self.views = views
+        self.forwards = forwards
+        self.media_type = media_type
+        self.comments = None
+        self.comments_error = None
+        self.also_in = None
+        self.media_path = None
+        self.media_skipped = None
+        self.cached = None
+
+    @property
+    def ts(self) -> float:
+        return self.date.timestamp()
+
+    @property
+    def link(self) -> str:
+        return f"https://t.me/{self.channel.lstrip('@')}/{self.id}"
+
+    def to_dict(self) -> dict:
+        """The message's output dict (the `fetch` JSON entry)."""
+        entry = {
+            "id": self.id,
+            "date": self.date.isoformat(),
+            "text": self.text,
+            "views": self.views,
+            "forwards": self.forwards,
+            "link": self.link,
+            "has_media": self.media_type is not None,
+        }
+        if self.media_type is not None:
+            entry["media_type"] = self.media_type
+        if self.media_path is not None:
+            entry["media_path"] = self.media_path
+        if self.media_skipped is not None:
+            entry["media_skipped"] = self.media_skipped
+        if self.also_in is not None:
+            entry["also_in"] = self.also_in
+        if self.cached:
+            entry["cached"] = True
+        if self.comments is not None:
+            entry["comment_count"] = len(self.comments)
+            entry["comments"] = [c.to_dict() for c in self.comments]
+            if self.comments_error is not None:
+                entry["comments_error"] = self.comments_error
+        return entry
+
+    @classmethod
+    def from_dict(cls, channel: str, data: dict) -> "MessageRecord":
+        """Rebuild a record from its output dict (message cache rows)."""
+        record = cls(channel, data["id"], datetime.fromisoformat(data["date"]), data["text"],
+                     data.get("views"), data.get("forwards"), data.get("media_type"))
+        if "comments" in data:
+            record.comments = [CommentRecord.from_dict(c) for c in data["comments"]]
+            record.comments_error = data.get("comments_error")
+        record.also_in = data.get("also_in")
+        record.media_path = data.get("media_path")
+        record.media_skipped = data.get("media_skipped")
+        record.cached = data.get("cached")
+        return record
+
+
+# ── History pipeline ─────────────────────────────────────────────────────────
+
+async def attach_comments(batch: list, scheduler, fetch_one) -> None:
+    """Fill ``comments`` for a batch of (record, reply count) pairs.
+
+    Posts whose reply counter is zero get an empty list without a request;
+    the rest, and posts whose count is unknown (None), are fetched by
+    ``scheduler`` (bounded concurrency, FloodWait-adaptive pacing, one retry).
+    ``fetch_one(msg_id)`` is the backend's request: a list of CommentRecord,
+    or a channel error dict.
+    """
+    wanted = [record for record, replies in batch if replies is None or replies]
+    results = await scheduler.run([record.id for record in wanted], fetch_one)
+    for record, _ in batch:
+        record.comments = []
+    for record, result in zip(wanted, results):
+        if isinstance(result, dict):
+            record.comments_error = result["error"]
+        else:
+            record.comments = result
+
+
+async def read_history(history, convert, keep, since: datetime, min_id: int = 0,
+                       text_only: bool = False, replies=None, attach=None,
+                       until: datetime = None, match=None) -> None:
+    """Run a backend's history iterator through the shared fetch pipeline.
+
+    Args:
+        history: Async iterator of raw backend messages, newest first
+        convert: ``convert(msg)`` -> MessageRecord
+        keep: Called with each record that makes it into the result, in order
+        since: Stop at the first post older than this
+        until: Skip posts at or after this (the backends also seek the
+            history to it, so normally none arrive)
+        min_id: Stop at this message id (read_unread); 0 for none
+        text_only: Skip posts without text
+        match: Optional ``match(text)`` -> bool (a tg_filter.PostFilter);
+            rejected posts are skipped before their comments are requested
+        replies: ``replies(msg)`` -> reply count, None if unknown; required
+            with ``attach``
+        attach: Optional ``await attach(batch)`` that fills comments for a list
+            of (record, reply count) pairs; posts are buffered in batches of
+            COMMENT_BATCH so their comment requests can run concurrently
+    """
+    pending = []
+
+    async def flush():
+        await attach(pending)
+        for record, _ in pending:
+            keep(record)
+        pending.clear()
+
+    async for msg in history:
+        record = convert(msg)
+        if record.date < since:
+            break
+        if until is not None and record.date >= until:
+            continue
+        # Break if we've reached already-read messages
+        if min_id and record.id <= min_id:
+            break
+        # --text-only: skip posts that have no text at all
+        if text_only and not record.text:
+            continue
+        if match is not None and not match(record.text):
+            continue
+        if attach is not None:
+            pending.append((record, replies(msg)))
+            if len(pending) >= COMMENT_BATCH:
+                await flush()
+            continue
+        keep(record)
+    if pending:
+        await flush()
+
+
+# ── Output edge ──────────────────────────────────────────────────────────────
+
+def _json_default(obj):
+    if isinstance(obj, (MessageRecord, CommentRecord)):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj, indent=None) -> str:
+    """JSON-encode a result (dicts and lists holding records) for output."""
+    return json.dumps(obj, ensure_ascii=False, indent=indent, default=_json_default)
+
+
+def _as_dict(msg) -> dict:
+    """Output dict for a record; daemon-forwarded results already hold dicts."""
+    return msg.to_dict() if isinstance(msg, MessageRecord) else msg
+
+
+def print_text(result, since_label):
+    """Print human-readable text output to stdout."""
+    items = result if isinstance(result, list) else [result]
+    for ch_result in items:
+        if "error" in ch_result:
+            print(f"[ERROR] {ch_result['channel']}: {ch_result['error']}")
+            continue
+        print(f"\n=== {ch_result['channel']} ({ch_result['count']} posts since {since_label}) ===")
+        for msg in map(_as_dict, ch_result["messages"]):
+            print(f"\n[{msg['date']}] {msg['link']}")
+            print(msg["text"][:500] + ("..." if len(msg["text"]) > 500 else ""))
+            if msg.get("also_in"):
+                print(f"  [also in: {', '.join(msg['also_in'])}]")
+            if "comments" in msg and msg["comments"]:
+                print(f"  [{msg['comment_count']} comments]")
+                for c in msg["comments"]:
+                    user = c.get("from_user") or "anonymous"
+                    print(f"    @{user}: {c['text'][:200]}")
+
+
+def write_output(result, output_path, fmt, since_label):
+    """Write output to a file and print a short confirmation to stdout."""
+    output_path = os.path.abspath(output_path)
+    with open(output_path, "w", encoding="utf-8") as f:
+        if fmt == "json":
+            json.dump(result, f, ensure_ascii=False, indent=2, default=_json_default)
+            f.write("\n")
+        else:
+            buf = io.StringIO()
+            with contextlib.redirect_stdout(buf):
+                print_text(result, since_label)
+            f.write(buf.getvalue())
+
+    if isinstance(result, list):
+        count = sum(r.get("count", 0) for r in result if "error" not in r)
+    else:
+        count = result.get("count", 0) if "error" not in result else 0
+    print(json.dumps({"status": "ok", "output_file": output_path, "count": count}, ensure_ascii=False))
+
+
+def newest_id(ch_result: dict) -> int:
+    """Newest message id in a channel result (full or streamed trailer); 0 if none."""
+    if "error" in ch_result:
+        return 0
+    if ch_result.get("newest_id"):
+        return ch_result["newest_id"]
+    return max((m.id if isinstance(m, MessageRecord) else m["id"]
+                for m in ch_result.get("messages", [])), default=0)
+
+
+# ── Daemon ───────────────────────────────────────────────────────────────────
+
+async def serve_request(backend, fetch_channel, client, limiter, request: dict, emit,
+                        config_file=None, peers=None):
+    """Answer one daemon request with a backend's connected client (see tg_daemon.serve).
+
+    ``fetch_channel`` is the backend's single-channel fetch over ``client``;
+    the other commands call the backend's ``_fetch_multiple``,
+    ``_fetch_info_multiple``, ``_get_posts`` and ``_refresh_stats_multiple``.
+    """
+    import tg_cache
+    import tg_daemon
+    import tg_filter
+    import tg_media
+    import tg_meta
+    import tg_output
+    import tg_stats
+
+    cmd = request.get("cmd")
+    cache = tg_cache.for_config(config_file, request.get("use_cache"))
+    meta = tg_meta.for_config(config_file)
+    if cmd == "info":
+        return await backend._fetch_info_multiple(client, request["channels"], limiter=limiter,
+                                                  peers=peers, meta=meta,
+                                                  concurrency=request.get("concurrency", 3),
+                                                  delay=request.get("delay", 1))
+    if cmd == "get":
+        return await backend._get_posts(client, request["channel"], request["ids"],
+                                        limiter=limiter, peers=peers)
+
+    since = datetime.fromisoformat(request["since"])
+    if cmd == "refresh_stats":
+        return await backend._refresh_stats_multiple(client, request["channels"], since,
+                                                     tg_stats.for_config(config_file),
+                                                     limiter=limiter, peers=peers,
+                                                     concurrency=request["concurrency"],
+                                                     delay=request["delay"])
+    until = datetime.fromisoformat(request["until"]) if request.get("until") else None
+    query = request.get("query")
+    filters = tg_filter.compile_rules(request.get("filters"))
+    media = tg_media.for_options(request.get("download_media"))
+    # Streamed fetches send their lines back as daemon events, each Telegram
+    # request waiting until the client has read the lines before it
+    sink = None
+    if request.get("stream"):
+        sink = tg_output.NdjsonSink(emit)
+        limiter = tg_daemon.paced_by_client(limiter, emit)
+    if cmd == "fetch":
+        result = await fetch_channel(client, request["channel"], since, request["limit"],
+                                     request["text_only"], comments=request["comments"],
+                                     comment_limit=request["comment_limit"],
+                                     comment_delay=request["comment_delay"],
+                                     min_id=request["min_id"], limiter=limiter, cache=cache,
+                                     peers=peers, sink=sink,
+                                     comment_concurrency=request["comment_concurrency"],
+                                     until=until, query=query, filters=filters,
+                                     meta=meta, media=media)
+        return sink.end(result) if sink is not None else result
+    if cmd == "fetch_multiple":
+        return await backend._fetch_multiple(client, request["channels"], since,
+                                             request["limit"], request["text_only"],
+                                             delay=request["delay"], min_ids=request["min_ids"],
+                                             concurrency=request["concurrency"],
+                                             limiter=limiter, cache=cache, peers=peers,
+                                             sink=sink, comments=request["comments"],
+                                             comment_limit=request["comment_limit"],
+                                             comment_delay=request["comment_delay"],
+                                             comment_concurrency=request["comment_concurrency"],
+                                             until=until, query=query, filters=filters,
+                                             meta=meta, media=media,
+                                             dedup=request.get("dedup", False))
+    raise ValueError(f"Unknown daemon command: {cmd!r}")
+
+
+# ── CLI helpers ──────────────────────────────────────────────────────────────
+
+# Common flags hallucinated by LLM agents instead of --since
+_FLAG_TYPOS = {
+    "--hours": "--since (e.g. --since 24h)",
+    "--days": "--since (e.g. --since 7d)",
+    "--weeks": "--since (e.g. --since 2w)",
+    "--time": "--since (e.g. --since 24h)",
+    "--period": "--since (e.g. --since 24h)",
+    "--after": "--since (e.g. --since 24h)",
+    "--from": "--since (e.g. --since 24h or --since 2026-01-01)",
+    "--before": "--until (e.g. --until 2026-04-01)",
+    "--to": "--until (e.g. --until 2026-04-01)",
+    "--media": "--text-only (inverted: use --text-only to exclude media-only posts) "
+               "or --download-media DIR (save attachments)",
+    "--media-dir": "--download-media DIR",
+    "--download": "--download-media DIR",
+}
+
+
+def _check_flag_typos():
+    """Catch common parameter hallucinations from LLM agents and exit with a helpful JSON error."""
+    for arg in sys.argv[1:]:
+        if arg in _FLAG_TYPOS:
+            print(json.dumps({
+                "error": f"Unknown flag: {arg}. Did you mean {_FLAG_TYPOS[arg]}?",
+                "action": "fix_command",
+            }))
+            sys.exit(1)
+
+
+class _JsonArgumentParser(argparse.ArgumentParser):
+    """ArgumentParser that outputs errors as JSON instead of plain text."""
+
+    def error(self, message):
+        # Check for flag typos in the error message
+        for typo, fix in _FLAG_TYPOS.items():
+            if typo in message:
+                print(json.dumps({
+                    "error": f"Unknown flag: {typo}. Did you mean {fix}?",
+                    "action": "fix_command",
+                }))
+                sys.exit(1)
+        print(json.dumps({"error": f"Invalid command: {message}", "action": "fix_command"}))
+        sys.exit(1)
+
+
+def _run_serve(backend, args, cf, sf):
+    """Start (or with --stop, stop) the daemon for the configured session."""
+    import tg_daemon
+
+    _, _, session_name = backend.get_config(cf, sf)
+    if args.stop:
+        stopped = asyncio.run(tg_daemon.stop(session_name))
+        print(json.dumps({"status": "stopped" if stopped else "not_running",
+                          "socket": tg_daemon.socket_path(session_name)}))
+        return
+    if tg_daemon.is_running(session_name):
+        print(json.dumps({
+            "error": f"Daemon already running on {tg_daemon.socket_path(session_name)}",
+            "action": "use_running_daemon_or_stop_it",
+        }))
+        sys.exit(1)
+    tg_daemon.remove_stale_socket(session_name)
+    asyncio.run(backend.serve(cf, sf))
+
+
+def _run_watch(backend, args, cf, sf):
+    """Run `watch` until interrupted, writing to stdout or appending to --output."""
+    import tg_output
+
+    stream = open(os.path.abspath(args.output), "a", encoding="utf-8") if args.output else None
+    try:
+        asyncio.run(backend.watch(args.channels, args.text_only, cf, sf,
+                                  state_file=args.state_file, limit=args.limit,
+                                  catch_up_interval=args.catch_up_interval,
+                                  write=tg_output.line_writer(stream)))
+    finally:
+        if stream is not None:
+            stream.close()
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main(backend, prog: str, description: str, fetch_one):
+    """Parse the command line and run the command with ``backend`` (reader or reader_telethon).
+
+    ``fetch_one`` is the backend's single-channel fetch; every other command
+    calls the function of the same name on ``backend``.
+    """
+    import tg_archive
+    import tg_daemon
+    import tg_export
+    import tg_filter
+    import tg_media
+    import tg_output
+    import tg_rank
+    import tg_stats
+
+    _check_flag_typos()
+
+    parser = _JsonArgumentParser(prog=prog, description=description)
+    # Global options (available to all subcommands)
+    parser.add_argument("--config-file", default=None,
+                        help="Path to config JSON (overrides ~/.tg-reader.json)")
+    parser.add_argument("--session-file", default=None,
+                        help="Path to session file (overrides default session path)")
+
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    # fetch
+    fetch_p = sub.add_parser("fetch", help="Fetch posts from one or more channels")
+    fetch_p.add_argument("channels", nargs="+", help="Channel usernames e.g. @durov")
+    fetch_p.add_argument("--since", default="24h", help="Time window: 24h, 7d, 2w, or YYYY-MM-DD")
+    fetch_p.add_argument("--until", default=None,
+                        help="End of the window (exclusive), same forms as --since; "
+                             "fetches an older window without reading newer posts")
+    fetch_p.add_argument("--limit", type=int, default=100, help="Max posts per channel (default 100)")
+    fetch_p.add_argument("--query", default=None,
+                        help="Only posts matching this text, found by Telegram's in-channel search")
+    fetch_p.add_argument("--include", action="append", default=[], metavar="KEYWORD",
+                        help="Keep only posts containing a keyword (repeatable; 're:' prefix = regex)")
+    fetch_p.add_argument("--exclude", action="append", default=[], metavar="KEYWORD",
+                        help="Drop posts containing a keyword (repeatable; 're:' prefix = regex)")
+    fetch_p.add_argument("--filter-file", default=None,
+                        help="JSON file with include/exclude rules (adds to 'filters' in config)")
+    fetch_p.add_argument("--dedup", action="store_true",
+                        help="Fold near-duplicate posts across channels into one entry with "
+                             "'also_in' links (json/text output)")
+    fetch_p.add_argument("--top", type=int, default=None,
+                        help="Keep only the N highest-scoring posts across all channels "
+                             "(views/forwards relative to each channel; json/text output)")
+    fetch_p.add_argument("--max-output-bytes", type=int, default=None,
+                        help="Keep the best-scoring posts whose JSON fits in this many bytes "
+                             "(json/text output)")
+    fetch_p.add_argument("--text-only", action="store_true",
+                        help="Skip posts that have no text (media-only without caption)")
+    fetch_p.add_argument("--download-media", default=None, metavar="DIR",
+                        help="Save attachments into DIR, named by content hash, and add each "
+                             "post's media_path")
+    fetch_p.add_argument("--media-workers", type=int, default=tg_media.DEFAULT_WORKERS,
+                        help="Max attachments downloaded at once (default 4)")
+    fetch_p.add_argument("--max-media-size", default="20MB",
+                        help="Skip attachments larger than this, e.g. 500k, 5MB; 0 = no cap "
+                             "(default 20MB)")
+    fetch_p.add_argument("--media-types", default=None,
+                        help="Only download these kinds, comma-separated: "
+                             f"{','.join(tg_media.MEDIA_TYPES)} (default all)")
+    fetch_p.add_argument("--delay", type=float, default=10,
+                        help="Initial seconds between channel starts; adapts to FloodWait (default 10)")
+    fetch_p.add_argument("--concurrency", type=int, default=3,
+                        help="Max channels fetched at once (default 3)")
+    fetch_p.add_argument("--comments", action="store_true",
+                        help="Fetch comments for each post (posts without replies are skipped)")
+    fetch_p.add_argument("--comment-limit", type=int, default=10,
+                        help="Max comments per post (default 10)")
+    fetch_p.add_argument("--comment-delay", type=float, default=3,
+                        help="Initial seconds between comment requests; adapts to FloodWait (default 3)")
+    fetch_p.add_argument("--comment-concurrency", type=int, default=3,
+                        help="Max comment requests in flight per channel (default 3)")
+    fetch_p.add_argument("--format", choices=["json", "text", "ndjson", *tg_export.FORMATS],
+                        default="json",
+                        help="json (default), text, ndjson: one line per message, written as it "
+                             "arrives, or parquet/arrow/msgpack: typed columns written in batches "
+                             "to --output (default tg-output.<format>)")
+    fetch_p.add_argument("--output", nargs="?", const="tg-output.json", default=None,
+                        help="Write output to file instead of stdout (default: tg-output.json)")
+    fetch_p.add_argument("--all", action="store_true", dest="fetch_all",
+                        help="Ignore read tracking and fetch all matching posts")
+    fetch_p.add_argument("--state-file", default=None,
+                        help="Path to state file for read tracking (overrides config)")
+    fetch_p.add_argument("--cache", action=argparse.BooleanOptionalAction, default=None,
+                        help="Use the local message cache (default: 'message_cache' in config)")
+
+    # info
+    info_p = sub.add_parser("info", help="Get channel title, description and subscriber count")
+    info_p.add_argument("channels", nargs="*", help="Channel usernames e.g. @durov")
+    info_p.add_argument("--channels-file", default=None,
+                        help="File with one channel per line (# comments allowed)")
+    info_p.add_argument("--concurrency", type=int, default=3,
+                        help="Max channels requested at once (default 3)")
+    info_p.add_argument("--delay", type=float, default=1,
+                        help="Initial seconds between requests; adapts to FloodWait (default 1)")
+    info_p.add_argument("--refresh", action="store_true",
+                        help="Ignore cached channel info and request it again")
+
+    # get
+    get_p = sub.add_parser("get", help="Fetch specific posts by id, id range or t.me link")
+    get_p.add_argument("channel", help="Channel username e.g. @durov")
+    get_p.add_argument("ids", nargs="+",
+                       help="Message ids: 1200, ranges 1305-1400, or https://t.me/<channel>/<id> links")
+
+    # refresh-stats
+    refresh_p = sub.add_parser("refresh-stats",
+                               help="Snapshot views/forwards of recent posts into the stats store")
+    refresh_p.add_argument("channels", nargs="*", help="Channel usernames e.g. @durov")
+    refresh_p.add_argument("--channels-file", default=None,
+                           help="File with one channel per line (# comments allowed)")
+    refresh_p.add_argument("--since", default="7d",
+                           help="Track and refresh posts published in this window (default 7d)")
+    refresh_p.add_argument("--concurrency", type=int, default=3,
+                           help="Max channels refreshed at once (default 3)")
+    refresh_p.add_argument("--delay", type=float, default=1,
+                           help="Initial seconds between channels; adapts to FloodWait (default 1)")
+
+    # stats
+    stats_p = sub.add_parser("stats", help="Show stored views/forwards growth curves (offline)")
+    stats_p.add_argument("channel", help="Channel username e.g. @durov")
+    stats_p.add_argument("ids", nargs="*",
+                         help="Only these posts: ids, ranges or t.me links (default all tracked)")
+    stats_p.add_argument("--since", default=None,
+                         help="Only posts published in this window e.g. 24h, 7d")
+
+    # auth
+    sub.add_parser("auth", help="Authenticate with Telegram (first-time setup)")
+
+    # serve
+    serve_p = sub.add_parser("serve", help="Keep a connected client running for fast fetch/info/get calls")
+    serve_p.add_argument("--stop", action="store_true", help="Stop the running daemon for this session")
+
+    # watch
+    watch_p = sub.add_parser("watch", help="Follow channels live, one NDJSON line per new post")
+    watch_p.add_argument("channels", nargs="+", help="Channel usernames e.g. @durov")
+    watch_p.add_argument("--text-only", action="store_true",
+                        help="Skip posts that have no text (media-only without caption)")
+    watch_p.add_argument("--limit", type=int, default=500,
+                        help="Max posts fetched per channel when catching up (default 500)")
+    watch_p.add_argument("--catch-up-interval", type=float, default=60,
+                        help="Seconds between history checks for missed posts (default 60)")
+    watch_p.add_argument("--output", default=None,
+                        help="Append lines to this file instead of stdout")
+    watch_p.add_argument("--state-file", default=None,
+                        help="Path to state file for read tracking (overrides config)")
+
+    # archive
+    archive_p = sub.add_parser("archive",
+                               help="Save a channel's whole history to chunked NDJSON files (resumable)")
+    archive_p.add_argument("channels", nargs="+", help="Channel usernames e.g. @durov")
+    archive_p.add_argument("--output-dir", default=tg_archive.DEFAULT_ROOT,
+                           help="Directory with one subdirectory per channel (default tg-archive)")
+    archive_p.add_argument("--chunk-size", type=int, default=tg_archive.DEFAULT_CHUNK_SIZE,
+                           help="Posts per chunk file and checkpoint (default 1000)")
+
+    args = parser.parse_args()
+    cf = args.config_file
+    sf = args.session_file
+
+    if args.cmd == "serve":
+        _run_serve(backend, args, cf, sf)
+        return
+
+    if args.cmd == "watch":
+        _run_watch(backend, args, cf, sf)
+        return
+
+    if args.cmd == "archive":
+        results = asyncio.run(backend.archive(args.channels, cf, sf,
+                                              output_dir=args.output_dir,
+                                              chunk_size=args.chunk_size))
+        print(dumps(results[0] if len(results) == 1 else results, indent=2))
+        return
+
+    if args.cmd == "info":
+        try:
+            channels = args.channels + (
+                read_channels_file(args.channels_file) if args.channels_file else [])
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        if not channels:
+            print(json.dumps({"error": "info needs at least one channel or --channels-file"}))
+            sys.exit(1)
+        results = asyncio.run(backend.fetch_info(channels, cf, sf,
+                                                 concurrency=args.concurrency,
+                                                 delay=args.delay, refresh=args.refresh))
+        print(dumps(results[0] if len(results) == 1 else results, indent=2))
+        return
+
+    if args.cmd == "get":
+        try:
+            ids = parse_message_ids(args.channel, args.ids)
+        except ValueError as e:
+            print(json.dumps({"error": str(e), "action": "fix_command"}))
+            sys.exit(1)
+        print(dumps(asyncio.run(backend.get_posts(args.channel, ids, cf, sf)), indent=2))
+        return
+
+    if args.cmd == "refresh-stats":
+        try:
+            since_dt = parse_since(args.since)
+            channels = args.channels + (
+                read_channels_file(args.channels_file) if args.channels_file else [])
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        if not channels:
+            print(json.dumps({"error": "refresh-stats needs at least one channel or --channels-file"}))
+            sys.exit(1)
+        results = asyncio.run(backend.refresh_stats(channels, since_dt, cf, sf,
+                                                    concurrency=args.concurrency,
+                                                    delay=args.delay))
+        print(dumps(results[0] if len(results) == 1 else results, indent=2))
+        return
+
+    if args.cmd == "stats":
+        try:
+            ids = set(parse_message_ids(args.channel, args.ids)) if args.ids else None
+            since_ts = parse_since(args.since).timestamp() if args.since else None
+        except ValueError as e:
+            print(json.dumps({"error": str(e), "action": "fix_command"}))
+            sys.exit(1)
+        posts = tg_stats.for_config(cf).curves(args.channel, ids=ids, since_ts=since_ts)
+        print(dumps({"channel": args.channel, "count": len(posts), "posts": posts}, indent=2))
+        return
+
+    if args.cmd == "auth":
+        asyncio.run(backend.setup_auth(cf, sf))
+        return
+
+    if args.cmd == "fetch":
+        try:
+            since_dt = parse_since(args.since)
+            until_dt = parse_until(args.until) if args.until else None
+            filter_rules = tg_filter.load_rules(cf, args.filter_file, args.include, args.exclude)
+            download_media = None
+            if args.download_media:
+                download_media = {
+                    "dir": os.path.abspath(args.download_media), "workers": args.media_workers,
+                    "max_bytes": tg_media.parse_size(args.max_media_size),
+                    "types": tg_media.parse_types(args.media_types) if args.media_types else None,
+                }
+        except ValueError as e:
+            print(json.dumps({"error": str(e)}))
+            sys.exit(1)
+        ranked = args.top is not None or args.max_output_bytes is not None
+        if ranked and args.format not in ("json", "text"):
+            print(json.dumps({"error": "--top/--max-output-bytes rank the whole result: "
+                                       "use --format json or text", "action": "fix_command"}))
+            sys.exit(1)
+        if args.dedup and args.format not in ("json", "text"):
+            print(json.dumps({"error": "--dedup needs the whole result: use --format json or text",
+                              "action": "fix_command"}))
+            sys.exit(1)
+        if until_dt is not None and until_dt <= since_dt:
+            print(json.dumps({"error": "--until must be later than --since", "action": "fix_command"}))
+            sys.exit(1)
+
+        # Lower default limit when fetching comments (token economy)
+        limit = args.limit
+        if args.comments and limit == 100:
+            limit = 30
+
+        # Read tracking (read_unread mode)
+        from tg_state import (load_tracking_config, load_state, get_last_read_id, update_state,
+                              save_state, tracking_key)
+
+        read_unread, state_file_path = load_tracking_config(cf)
+        if args.state_file:
+            state_file_path = args.state_file
+
+        # A window ending in the past is a historical query: it neither uses nor moves read state
+        use_tracking = read_unread and not args.fetch_all and until_dt is None
+        state = None
+        min_id = 0
+        min_ids = {}
+
+        if use_tracking:
+            state = load_state(state_file_path)
+            if len(args.channels) == 1:
+                min_id = get_last_read_id(state, tracking_key(args.channels[0], args.query))
+            else:
+                min_ids = {ch: get_last_read_id(state, tracking_key(ch, args.query))
+                           for ch in args.channels}
+
+            # When tracking has state, --since is not needed — fetch all unread.
+            # On first run (no state, min_id=0), --since still applies (default 24h).
+            has_state = min_id > 0 or any(v > 0 for v in min_ids.values())
+            if has_state:
+                since_dt = EPOCH
+
+        tracking_meta = None
+        if read_unread:
+            tracking_meta = {"enabled": True}
+            if args.fetch_all or until_dt is not None:
+                tracking_meta["overridden"] = True
+
+        # --format ndjson: stream lines to stdout / --output while fetching;
+        # parquet/arrow/msgpack: write column batches to a file while fetching
+        sink = None
+        stream_file = None
+        sink_extra = {"read_unread": tracking_meta} if read_unread else None
+        if args.format == "ndjson":
+            if args.output:
+                stream_file = open(os.path.abspath(args.output), "w", encoding="utf-8")
+            sink = tg_output.NdjsonSink(tg_output.line_writer(stream_file), extra=sink_extra)
+        elif args.format in tg_export.FORMATS:
+            sink = tg_export.open_sink(args.format, tg_export.output_path(args.format, args.output),
+                                       extra=sink_extra)
+        elif ranked:
+            # Posts go through a bounded heap while fetching instead of into the result
+            sink = tg_rank.RankedSink(args.top, args.max_output_bytes, dedup=args.dedup,
+                                      extra=sink_extra)
+
+        try:
+            if len(args.channels) == 1:
+                result = asyncio.run(fetch_one(
+                    args.channels[0], since_dt, limit, args.text_only, cf, sf,
+                    comments=args.comments, comment_limit=args.comment_limit,
+                    comment_delay=args.comment_delay, min_id=min_id, use_cache=args.cache,
+                    sink=sink, comment_concurrency=args.comment_concurrency,
+                    until=until_dt, query=args.query,
+                    filter_rules=filter_rules, download_media=download_media))
+            else:
+                result = asyncio.run(backend.fetch_multiple(
+                    args.channels, since_dt, limit, args.text_only, cf, sf,
+                    delay=args.delay, min_ids=min_ids, concurrency=args.concurrency,
+                    use_cache=args.cache, sink=sink, comments=args.comments,
+                    comment_limit=args.comment_limit, comment_delay=args.comment_delay,
+                    comment_concurrency=args.comment_concurrency,
+                    until=until_dt, query=args.query,
+                    filter_rules=filter_rules, dedup=args.dedup,
+                    download_media=download_media))
+        except tg_daemon.DaemonError as e:
+            # Part of the output is already written, so it is not fetched again here
+            print(json.dumps({"error": str(e), "action": "retry_command"}))
+            sys.exit(1)
+        finally:
+            if stream_file is not None:
+                stream_file.close()
+            if isinstance(sink, tg_export.ColumnarSink):
+                sink.close()
+
+        if isinstance(sink, tg_rank.RankedSink):
+            result = sink.finish(result)
+            sink = None
+
+        # Update tracking state after successful fetch (ranked: up to the newest kept post)
+        if use_tracking and state is not None:
+            for ch_result in (result if isinstance(result, list) else [result]):
+                newest = newest_id(ch_result)
+                if newest:
+                    update_state(state, tracking_key(ch_result["channel"], args.query), newest)
+            save_state(state, state_file_path)
+
+        if sink is not None:
+            if isinstance(sink, tg_export.ColumnarSink):
+                status = {"status": "ok", "output_file": sink.path, "format": args.format,
+                          "count": sink.total}
+                errors = [r for r in (result if isinstance(result, list) else [result]) if "error" in r]
+                if errors:
+                    status["errors"] = errors
+                print(json.dumps(status, ensure_ascii=False))
+            elif stream_file is not None:
+                print(json.dumps({"status": "ok", "output_file": stream_file.name,
+                                  "count": sink.total}, ensure_ascii=False))
+            return
+
+        # Add tracking metadata to output
+        if read_unread:
+            if isinstance(result, list):
+                for ch_result in result:
+                    if "error" not in ch_result:
+                        ch_result["read_unread"] = tracking_meta.copy()
+            elif "error" not in result:
+                result["read_unread"] = tracking_meta
+
+        if args.output:
+            write_output(result, args.output, args.format, args.since)
+        elif args.format == "json":
+            print(dumps(result, indent=2))
+        else:
+            print_text(result, args.since)
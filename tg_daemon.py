@@ -0,0 +1,275 @@
+"""
+tg-reader daemon — keep one authorized MTProto client connected between CLI calls.
+
+`tg-reader serve` listens on a Unix socket next to the session file and
+answers fetch/info requests with the client it already holds. The normal
+`fetch`/`info` commands forward to it when it is running and open their own
+connection when it is not. No heavy dependencies (no Pyrogram/Telethon).
+
+Protocol: the client sends one JSON line (the request) and reads JSON lines
+until it gets one with a "result" key. A reply with "fallback": true means
+the daemon cannot serve this request and the caller should connect itself;
+it is only sent before any "event" line. A request that fails after events
+were sent ends with an "error" reply instead (`DaemonError` in the caller),
+so the output is not produced twice.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import signal
+import sys
+import tempfile
+
+import tg_core
+
+_SOCKET_MAX_LEN = 100  # sun_path is 104-108 bytes depending on the platform
+_MAX_LINE = 64 * 1024 * 1024  # a whole fetch result travels as one JSON line
+_CONNECT_TIMEOUT = 2  # seconds; a daemon that does not accept by then is treated as absent
+
+
+class DaemonError(RuntimeError):
+    """The daemon failed a request after part of its output was already relayed."""
+
+
+def socket_path(session_name: str) -> str:
+    """Return the Unix socket path for a session (``{session_name}.sock``).
+
+    Falls back to a hashed name in the temp dir when the session path is too
+    long for a Unix socket address.
+    """
+    path = f"{session_name}.sock"
+    if len(path) > _SOCKET_MAX_LEN:
+        digest = hashlib.sha1(path.encode()).hexdigest()[:16]
+        path = os.path.join(tempfile.gettempdir(), f"tg-reader-{digest}.sock")
+    return path
+
+
+def daemon_disabled() -> bool:
+    """True when TG_NO_DAEMON is set — always open a direct connection."""
+    return os.environ.get("TG_NO_DAEMON", "").strip().lower() in ("true", "1", "yes")
+
+
+async def _open(session_name: str):
+    """Connect to the daemon socket. Returns (reader, writer) or None if not running."""
+    if not hasattr(asyncio, "open_unix_connection"):
+        return None  # no Unix sockets on this platform
+    path = socket_path(session_name)
+    if not os.path.exists(path):
+        return None
+    try:
+        return await asyncio.wait_for(
+            asyncio.open_unix_connection(path, limit=_MAX_LINE), _CONNECT_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def call(session_name: str, backend: str, request: dict, on_event=None):
+    """Forward a request to a running daemon.
+
+    Args:
+        session_name: Session path (without .session) the daemon was started for
+        backend: "pyrogram" or "telethon" — a daemon for the other backend is ignored
+        request: JSON-serializable request dict (must contain "cmd")
+        on_event: Optional callable for intermediate {"event": ...} lines
+
+    Returns:
+        The daemon's result, or None when no daemon is available and the
+        caller should open its own connection.
+
+    Raises:
+        DaemonError: the request failed after events were passed to ``on_event``
+    """
+    if daemon_disabled():
+        return None
+    conn = await _open(session_name)
+    if conn is None:
+        return None
+    reader, writer = conn
+    try:
+        payload = dict(request, backend=backend)
+        writer.write(json.dumps(payload, ensure_ascii=False).encode() + b"\n")
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                return None  # daemon went away mid-request
+            reply = json.loads(line)
+            if reply.get("fallback"):
+                return None
+            if "error" in reply:
+                raise DaemonError(reply["error"])
+            if "event" in reply:
+                if on_event is not None:
+                    on_event(reply["event"])
+                continue
+            return reply.get("result")
+    except (OSError, ValueError):
+        return None
+    finally:
+        writer.close()
+
+
+def is_running(session_name: str) -> bool:
+    """Check whether a daemon is accepting connections for this session."""
+    async def _probe():
+        conn = await _open(session_name)
+        if conn is None:
+            return False
+        conn[1].close()
+        return True
+
+    return asyncio.run(_probe())
+
+
+async def stop(session_name: str) -> bool:
+    """Ask a running daemon to shut down. Returns False if none was running."""
+    conn = await _open(session_name)
+    if conn is None:
+        return False
+    reader, writer = conn
+    try:
+        writer.write(json.dumps({"cmd": "stop"}).encode() + b"\n")
+        await writer.drain()
+        await reader.readline()
+    except OSError:
+        pass
+    finally:
+        writer.close()
+    return True
+
+
+async def serve(session_name: str, backend: str, handler) -> None:
+    """Serve requests on the session's Unix socket until SIGINT/SIGTERM or a stop request.
+
+    Args:
+        session_name: Session path (without .session) — determines the socket path
+        backend: "pyrogram" or "telethon"; requests for the other backend get a fallback reply
+        handler: async callable(request, emit) -> result dict, run with the
+            already-connected client. ``emit(obj)`` sends an intermediate event
+            line; ``await emit.drain()`` waits until the client has read them
+            (see `paced_by_client`).
+    """
+    path = socket_path(session_name)
+    stop_event = asyncio.Event()
+
+    async def _on_connection(reader, writer):
+        try:
+            line = await reader.readline()
+            if not line:
+                return
+            try:
+                request = json.loads(line)
+            except ValueError:
+                await _reply(writer, {"fallback": True, "error": "Malformed request"})
+                return
+            if request.get("cmd") == "stop":
+                await _reply(writer, {"result": {"status": "stopping"}})
+                stop_event.set()
+                return
+            if request.get("backend") != backend:
+                await _reply(writer, {"fallback": True, "error": f"Daemon runs {backend}"})
+                return
+
+            emit = _EventStream(writer)
+            try:
+                result = await handler(request, emit)
+            except Exception as e:
+                if emit.sent:
+                    # The caller already relayed part of the output; running
+                    # the command again would repeat it
+                    await _reply(writer, {"error": f"Daemon request failed: {e}"})
+                    return
+                # Let the caller retry with its own connection rather than fail the command
+                await _reply(writer, {"fallback": True, "error": f"Daemon request failed: {e}"})
+                return
+            await _reply(writer, {"result": result})
+        except (ConnectionError, OSError):
+            pass  # client went away
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(_on_connection, path=path, limit=_MAX_LINE)
+    os.chmod(path, 0o600)  # the socket grants use of the session — owner only
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+    print(json.dumps({
+        "status": "serving",
+        "backend": backend,
+        "socket": path,
+        "pid": os.getpid(),
+    }), flush=True)
+
+    try:
+        async with server:
+            await stop_event.wait()
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    print(json.dumps({"status": "stopped", "socket": path}), file=sys.stderr, flush=True)
+
+
+class _EventStream:
+    """The ``emit`` handed to daemon handlers: one event line per call."""
+
+    def __init__(self, writer):
+        self._writer = writer
+        self.sent = False
+
+    def __call__(self, event) -> None:
+        self._writer.write(json.dumps({"event": event}, ensure_ascii=False).encode() + b"\n")
+        self.sent = True
+
+    async def drain(self) -> None:
+        """Wait while the client is behind on reading event lines."""
+        await self._writer.drain()
+
+
+class _ClientPacedLimiter:
+    def __init__(self, limiter, emit: _EventStream):
+        self._limiter = limiter
+        self._emit = emit
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        await self._emit.drain()
+        await self._limiter.acquire(cost)
+
+    def report_flood_wait(self, seconds: float) -> None:
+        self._limiter.report_flood_wait(seconds)
+
+
+def paced_by_client(limiter, emit):
+    """Wrap a request's rate limiter so each Telegram request first waits for the client.
+
+    Event lines are written without waiting; a streamed fetch awaits the
+    limiter before every history page, comment batch or download, so with
+    this wrapper a slow or stalled client holds the fetch back instead of
+    the daemon buffering its whole output.
+    """
+    return _ClientPacedLimiter(limiter, emit)
+
+
+async def _reply(writer, obj: dict) -> None:
+    # Results hold tg_core records; they become JSON dicts here, on the way out
+    writer.write(tg_core.dumps(obj).encode() + b"\n")
+    await writer.drain()
+
+
+def remove_stale_socket(session_name: str) -> None:
+    """Remove a socket file left behind by a daemon that died without cleanup."""
+    path = socket_path(session_name)
+    if os.path.exists(path) and not is_running(session_name):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,122 @@
+"""
+tg-reader dedup — fold near-duplicate posts across a multi-channel fetch into one entry.
+
+The same story usually reaches a set of news channels as forwards and
+lightly edited reposts. `fold` keeps the earliest post of each group and
+lists the others under its ``also_in`` links:
+
+    {"id": 812, "text": "...", "link": "https://t.me/a/812",
+     "also_in": ["https://t.me/b/5531", "https://t.me/c/90"]}
+
+Texts are normalized (case, links, punctuation dropped) and cut into word
+3-shingles; two posts are near-duplicates when the estimated Jaccard
+similarity of their shingle sets is at least `SIMILARITY`. The estimate
+comes from a 63-value MinHash signature, and signatures are bucketed by
+21 bands of 3 values (LSH), so each post is only compared with posts that
+share a band — the pass is roughly linear in the number of posts. Texts too
+short for stable shingles fold only when identical after normalization.
+No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import hashlib
+import re
+import struct
+
+SIMILARITY = 0.6  # estimated shingle Jaccard similarity that counts as the same text
+MIN_WORDS = 6  # shorter texts fold only on an exact normalized match
+_SHINGLE = 3
+_BANDS = 21
+_ROWS = 3
+_SIGNATURE = _BANDS * _ROWS
+# One 128-byte SHAKE digest per shingle gives 64 independent 16-bit hash values
+_VALUES = struct.Struct("<64H").unpack
+
+_URL = re.compile(r"https?://\S+|t\.me/\S+", re.IGNORECASE)
+_WORD = re.compile(r"\w+")
+
+
+def _words(text: str) -> list:
+    return _WORD.findall(_URL.sub(" ", text).casefold())
+
+
+def signature(words: list) -> tuple:
+    """MinHash signature of a word list's distinct 3-word shingles."""
+    shingles = {" ".join(words[i:i + _SHINGLE]) for i in range(len(words) - _SHINGLE + 1)}
+    rows = [_VALUES(hashlib.shake_128(s.encode()).digest(128)) for s in shingles]
+    return tuple(map(min, zip(*rows)))[:_SIGNATURE]
+
+
+def _similarity(a: tuple, b: tuple) -> float:
+    return sum(x == y for x, y in zip(a, b)) / _SIGNATURE
+
+
+def _bands(sig: tuple):
+    return [(band, sig[band * _ROWS:(band + 1) * _ROWS]) for band in range(_BANDS)]
+
+
+def fold(results: list) -> None:
+    """Fold near-duplicate posts in a list of channel results, in place.
+
+    Each group keeps its earliest post (ties: first channel in the list);
+    the other posts are removed from their channel's ``messages`` and their
+    links appended to the kept post's ``also_in``. Each channel result gets
+    ``duplicates``: how many of its posts were folded away, and
+    ``newest_id``: its newest fetched post, folded or not, so read tracking
+    does not fetch a folded post again. Channel error dicts are left alone.
+    """
+    posts = []
+    for order, result in enumerate(results):
+        if "error" in result:
+            continue
+        result["duplicates"] = 0
+        result["newest_id"] = max((m.id for m in result["messages"]), default=None)
+        for record in result["messages"]:
+            if record.text:
+                posts.append((record.date, order, record, result))
+    posts.sort(key=lambda p: (p[0], p[1]))
+
+    exact = {}
+    buckets = {}
+    folded = set()
+    for _, _, record, result in posts:
+        words = _words(record.text)
+        if not words:
+            continue
+        if len(words) < MIN_WORDS:
+            key = " ".join(words)
+            kept = exact.get(key)
+            if kept is None:
+                exact[key] = record
+                continue
+        else:
+            sig = signature(words)
+            bands = _bands(sig)
+            kept = None
+            seen = set()
+            for band in bands:
+                for other_sig, other in buckets.get(band, ()):
+                    if id(other) in seen:
+                        continue
+                    seen.add(id(other))
+                    if _similarity(sig, other_sig) >= SIMILARITY:
+                        kept = other
+                        break
+                if kept is not None:
+                    break
+            if kept is None:
+                for band in bands:
+                    buckets.setdefault(band, []).append((sig, record))
+                continue
+        if kept.also_in is None:
+            kept.also_in = []
+        kept.also_in.append(record.link)
+        folded.add(id(record))
+        result["duplicates"] += 1
+
+    if not folded:
+        return
+    for result in results:
+        if "error" in result:
+            continue
+        result["messages"] = [m for m in result["messages"] if id(m) not in folded]
+        result["count"] = len(result["messages"])
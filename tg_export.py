@@ -0,0 +1,171 @@
+"""
+tg-reader columnar export — write `fetch --format parquet|arrow|msgpack` files while messages arrive.
+
+Posts are appended to column buffers and flushed every `BATCH_SIZE` rows,
+so a large fetch is never held in memory as a whole and the file is written
+as the fetch goes (one Parquet row group / Arrow record batch / msgpack
+chunk per flush). Every format carries the same typed columns:
+
+    channel      string
+    id           int64
+    date         timestamp (UTC, microseconds) — msgpack Timestamp
+    text         string
+    views        int64, nullable
+    forwards     int64, nullable
+    has_media    bool
+    media_type   string, nullable
+    media_path   string, nullable (set by --download-media)
+    cached       bool (served from the message cache: views/forwards as first fetched)
+
+msgpack files are a stream of one map per post (read with
+``msgpack.Unpacker(f, timestamp=3)``). Comments are not exported in these
+formats; use json or ndjson for them. pyarrow (parquet, arrow) and msgpack
+are optional: ``pip install "sergei-mikhailov-tg-channel-reader[export]"``.
+Neither is imported until an export starts.
+"""
+
+import json
+import os
+import sys
+
+import tg_core
+import tg_output
+
+FORMATS = ("parquet", "arrow", "msgpack")
+BATCH_SIZE = 1000  # rows per Parquet row group / Arrow record batch / msgpack write
+
+_COLUMNS = ("channel", "id", "date", "text", "views", "forwards", "has_media", "media_type",
+            "media_path", "cached")
+_INSTALL = {
+    "parquet": "pip install pyarrow",
+    "arrow": "pip install pyarrow",
+    "msgpack": "pip install msgpack",
+}
+
+
+def output_path(fmt: str, output=None) -> str:
+    """Absolute path for an export: ``--output`` if given, else ``tg-output.<ext>``."""
+    # A bare --output means its json default; pick the matching extension instead
+    if not output or output == "tg-output.json":
+        output = f"tg-output.{fmt}"
+    return os.path.abspath(output)
+
+
+class _ArrowWriter:
+    """Parquet or Arrow IPC file writer fed with column dicts."""
+
+    def __init__(self, path: str, fmt: str):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = pa.schema([
+            ("channel", pa.string()),
+            ("id", pa.int64()),
+            ("date", pa.timestamp("us", tz="UTC")),
+            ("text", pa.string()),
+            ("views", pa.int64()),
+            ("forwards", pa.int64()),
+            ("has_media", pa.bool_()),
+            ("media_type", pa.string()),
+            ("media_path", pa.string()),
+            ("cached", pa.bool_()),
+        ])
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._writer = pa.ipc.new_file(path, self.schema)
+
+    def write(self, columns: dict) -> None:
+        self._writer.write_batch(self._pa.record_batch(
+            [columns[name] for name in _COLUMNS], schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+class _MsgpackWriter:
+    """msgpack stream writer: one map per row, dates as msgpack Timestamps."""
+
+    def __init__(self, path: str):
+        import msgpack
+
+        self._packer = msgpack.Packer(datetime=True, autoreset=True)
+        self._file = open(path, "wb")
+
+    def write(self, columns: dict) -> None:
+        rows = zip(*(columns[name] for name in _COLUMNS))
+        self._file.write(b"".join(self._packer.pack(dict(zip(_COLUMNS, row))) for row in rows))
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def open_sink(fmt: str, path: str, extra: dict = None) -> "ColumnarSink":
+    """Create the export file and return its sink; exit with a JSON error if the library is missing."""
+    try:
+        writer = _MsgpackWriter(path) if fmt == "msgpack" else _ArrowWriter(path, fmt)
+    except ImportError:
+        print(json.dumps({"error": f"--format {fmt} needs an optional dependency. Run: {_INSTALL[fmt]}"}))
+        sys.exit(1)
+    return ColumnarSink(writer, path, extra=extra)
+
+
+class ColumnarSink(tg_output.NdjsonSink):
+    """NdjsonSink drop-in that buffers posts into typed column batches for an export file.
+
+    Header lines are dropped and trailers are only returned (they become the
+    per-channel result), so the backends, the scheduler and daemon relaying
+    treat it exactly like a streamed NDJSON fetch. Call `close` when done.
+    """
+
+    def __init__(self, writer, path: str, extra: dict = None, batch_size: int = BATCH_SIZE):
+        super().__init__(lambda line: None, extra=extra)
+        self.path = path
+        self.batch_size = batch_size
+        self._writer = writer
+        self._columns = {name: [] for name in _COLUMNS}
+        self._rows = 0
+
+    def _add(self, record: tg_core.MessageRecord) -> None:
+        columns = self._columns
+        columns["channel"].append(record.channel)
+        columns["id"].append(record.id)
+        columns["date"].append(record.date)
+        columns["text"].append(record.text)
+        columns["views"].append(record.views)
+        columns["forwards"].append(record.forwards)
+        columns["has_media"].append(record.media_type is not None)
+        columns["media_type"].append(record.media_type)
+        columns["media_path"].append(record.media_path)
+        columns["cached"].append(bool(record.cached))
+        self._rows += 1
+        if self._rows >= self.batch_size:
+            self.flush()
+
+    def message(self, channel: str, record) -> bool:
+        if not self._claim(channel, record.id):
+            return False
+        self._add(record)
+        return True
+
+    def relay(self, line: dict) -> None:
+        if line.get("type") == "message":
+            if self._claim(line["channel"], line["id"]):
+                self._add(tg_core.MessageRecord.from_dict(line["channel"], line))
+            return
+        super().relay(line)
+
+    def flush(self) -> None:
+        """Write buffered rows as one batch."""
+        if not self._rows:
+            return
+        self._writer.write(self._columns)
+        self._columns = {name: [] for name in _COLUMNS}
+        self._rows = 0
+
+    def close(self) -> None:
+        """Flush the last batch and finish the file (Parquet footer, Arrow IPC footer)."""
+        self.flush()
+        self._writer.close()
@@ -0,0 +1,208 @@
+"""
+tg-reader filters — drop posts that do not match include/exclude keyword rules while fetching.
+
+Rules come from ``"filters"`` in ~/.tg-reader.json, a ``--filter-file`` with
+the same JSON shape, and ``--include``/``--exclude`` flags:
+
+    {
+        "include": ["openai", "anthropic", "re:\\bgpt-?\\d"],
+        "exclude": ["giveaway", "#ad"],
+        "channels": {"@somechannel": {"include": ["llm"]}}
+    }
+
+A post is kept if it matches no exclude rule and — when there are include
+rules — at least one include rule. Plain entries are case-insensitive
+substrings; entries starting with ``re:`` are regular expressions. Rules
+under "channels" are added to the global ones for that channel.
+
+All keywords of a set are compiled into one Aho-Corasick automaton and all
+regexes into one alternation, so a post is scanned once per set however
+many rules there are. Filtering happens in the fetch loop, before comments
+are requested or anything is serialized. No heavy dependencies (no
+Pyrogram/Telethon).
+"""
+
+import json
+import re
+from pathlib import Path
+
+from tg_state import _normalize_channel
+
+_REGEX_PREFIX = "re:"
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton answering "does the text contain any keyword?" (case-insensitive)."""
+
+    def __init__(self, keywords):
+        self._goto = [{}]
+        self._fail = [0]
+        self._final = [False]
+        for word in keywords:
+            self._add(word.casefold())
+        self._link()
+
+    def _add(self, word: str) -> None:
+        if not word:
+            return
+        state = 0
+        for char in word:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._final.append(False)
+                self._goto[state][char] = nxt
+            state = nxt
+        self._final[state] = True
+
+    def _link(self) -> None:
+        # Breadth-first: a state's fail link points at its longest proper suffix in the trie
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._final[nxt] = self._final[nxt] or self._final[self._fail[nxt]]
+                queue.append(nxt)
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def search(self, text: str) -> bool:
+        goto, fail, final = self._goto, self._fail, self._final
+        state = 0
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if final[state]:
+                return True
+        return False
+
+
+class RuleSet:
+    """One include or exclude list: keywords in an automaton, regexes in one pattern."""
+
+    def __init__(self, rules):
+        keywords, patterns = [], []
+        for rule in rules:
+            if rule.startswith(_REGEX_PREFIX):
+                patterns.append(f"(?:{rule[len(_REGEX_PREFIX):]})")
+            else:
+                keywords.append(rule)
+        self.keywords = KeywordAutomaton(keywords)
+        self.regex = re.compile("|".join(patterns), re.IGNORECASE) if patterns else None
+
+    def __bool__(self) -> bool:
+        return bool(self.keywords) or self.regex is not None
+
+    def search(self, text: str) -> bool:
+        if self.keywords and self.keywords.search(text):
+            return True
+        return self.regex is not None and self.regex.search(text) is not None
+
+
+class PostFilter:
+    """Compiled include/exclude rules for one channel; call with a post's text."""
+
+    def __init__(self, include, exclude):
+        self.include = RuleSet(include)
+        self.exclude = RuleSet(exclude)
+
+    def __call__(self, text: str) -> bool:
+        text = text or ""
+        if self.exclude and self.exclude.search(text):
+            return False
+        return not self.include or self.include.search(text)
+
+
+class FilterSet:
+    """Filters compiled from a rules dict (see module docstring), per channel."""
+
+    def __init__(self, rules: dict):
+        self.rules = rules
+        self._default = PostFilter(rules.get("include", []), rules.get("exclude", []))
+        self._channels = {}
+        for channel, extra in rules.get("channels", {}).items():
+            self._channels[_normalize_channel(channel)] = PostFilter(
+                rules.get("include", []) + extra.get("include", []),
+                rules.get("exclude", []) + extra.get("exclude", []))
+
+    def for_channel(self, channel: str) -> PostFilter:
+        return self._channels.get(_normalize_channel(channel), self._default)
+
+
+def _rule_list(value, where: str) -> list:
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError(f"Filter {where} must be a list of strings")
+    for rule in value:
+        if rule.startswith(_REGEX_PREFIX):
+            try:
+                re.compile(rule[len(_REGEX_PREFIX):])
+            except re.error as e:
+                raise ValueError(f"Invalid filter regex {rule!r} in {where}: {e}")
+    return value
+
+
+def _merge(rules: dict, extra: dict, where: str) -> None:
+    if not isinstance(extra, dict):
+        raise ValueError(f"Filter rules in {where} must be a JSON object")
+    for key in ("include", "exclude"):
+        if key in extra:
+            rules[key] = rules.get(key, []) + _rule_list(extra[key], f"{where} {key!r}")
+    for channel, channel_rules in extra.get("channels", {}).items():
+        target = rules.setdefault("channels", {}).setdefault(channel, {})
+        _merge(target, channel_rules, f"{where} channel {channel!r}")
+
+
+def load_rules(config_file=None, filter_file=None, include=(), exclude=()):
+    """Collect filter rules from config, ``--filter-file`` and flags.
+
+    Config: ``"filters": {...}`` in ~/.tg-reader.json, or ``"filters":
+    "path/to/filters.json"``.
+
+    Returns:
+        rules dict (JSON-serializable, so it can be sent to a daemon), or
+        None when there are no rules
+
+    Raises:
+        ValueError: unreadable filter file or malformed rules
+    """
+    rules: dict = {}
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("filters")
+        except (json.JSONDecodeError, OSError, AttributeError):
+            cfg = None
+        if isinstance(cfg, str):
+            filter_files = [Path(cfg).expanduser()]
+        else:
+            filter_files = []
+            if cfg:
+                _merge(rules, cfg, "config")
+    else:
+        filter_files = []
+    if filter_file:
+        filter_files.append(Path(filter_file).expanduser())
+    for path in filter_files:
+        try:
+            with open(path) as f:
+                _merge(rules, json.load(f), str(path))
+        except (json.JSONDecodeError, OSError) as e:
+            raise ValueError(f"Cannot read filter file {path}: {e}")
+    if include or exclude:
+        _merge(rules, {"include": list(include), "exclude": list(exclude)}, "flags")
+    return rules or None
+
+
+def compile_rules(rules):
+    """FilterSet for a rules dict from `load_rules`, or None for no rules."""
+    return FilterSet(rules) if rules else None
@@ -0,0 +1,226 @@
+"""
+tg-reader media download — `fetch --download-media DIR`: save post attachments while the fetch runs.
+
+Downloads run in the background on a bounded pool (``workers`` at a time)
+while the history walk goes on. Each post whose attachment is downloaded
+gets its local file in the entry:
+
+    {"id": 812, ..., "has_media": true, "media_type": "...",
+     "media_path": "/data/media/3f1c...e9.jpg"}
+
+Files are named by the SHA-256 of their content, so a photo forwarded to ten
+channels is stored once, and a file Telegram identifies as the same one is
+downloaded once per run. Attachments over ``max_bytes`` are not downloaded
+and marked ``"media_skipped": "too_large"``; a failed download is marked
+``"media_skipped": "download_failed: ..."`` and does not fail the channel.
+``types`` limits downloads to some kinds of attachment (`MEDIA_TYPES`).
+
+A channel's posts still come out in history order: a post is held back
+until the downloads of the posts before it are done, so a streamed fetch
+keeps writing lines while later downloads are in flight. No heavy
+dependencies (no Pyrogram/Telethon).
+"""
+
+import asyncio
+import hashlib
+import mimetypes
+import os
+import re
+import uuid
+from collections import deque, namedtuple
+from pathlib import Path
+
+MEDIA_TYPES = ("photo", "video", "animation", "document", "audio", "voice", "video_note",
+               "sticker")
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+
+# What the backends report about an attachment before it is downloaded.
+# ``size`` may be None (unknown until downloaded); ``unique_id`` is Telegram's
+# id for the file itself, the same in every channel it is forwarded to.
+MediaFile = namedtuple("MediaFile", "kind size unique_id ext")
+
+_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$", re.IGNORECASE)
+_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(text: str) -> int:
+    """Parse a size such as 500k, 20MB or 1.5G into bytes; 0 means no cap.
+
+    Raises:
+        ValueError: not a size
+    """
+    m = _SIZE.match(str(text))
+    if not m:
+        raise ValueError(f"Invalid size: {text!r}. Use e.g. 500k, 20MB or 1G")
+    return int(float(m.group(1)) * _UNITS[m.group(2).lower()])
+
+
+def parse_types(text: str) -> list:
+    """Parse a comma-separated list of `MEDIA_TYPES`.
+
+    Raises:
+        ValueError: unknown media type
+    """
+    types = [t.strip().lower() for t in text.split(",") if t.strip()]
+    unknown = [t for t in types if t not in MEDIA_TYPES]
+    if unknown or not types:
+        raise ValueError(f"Unknown media type(s): {', '.join(unknown) or repr(text)}. "
+                         f"Choose from: {', '.join(MEDIA_TYPES)}")
+    return types
+
+
+def extension(mime_type=None, file_name=None) -> str:
+    """File extension for an attachment: from its file name, else its MIME type."""
+    suffix = Path(file_name).suffix if file_name else ""
+    if suffix:
+        return suffix.lower()
+    return (mimetypes.guess_extension(mime_type) or "") if mime_type else ""
+
+
+def for_options(options: dict = None):
+    """Build a MediaDownloader from ``fetch`` options, or None when downloads are off.
+
+    Args:
+        options: ``{"dir": ..., "workers": ..., "max_bytes": ..., "types": [...]}``
+            (JSON-safe, so it can be sent to the daemon); None or no "dir" = off
+    """
+    if not options or not options.get("dir"):
+        return None
+    return MediaDownloader(options["dir"], workers=options.get("workers", DEFAULT_WORKERS),
+                           max_bytes=options.get("max_bytes", DEFAULT_MAX_BYTES),
+                           types=options.get("types"))
+
+
+class _TooLarge(Exception):
+    pass
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaDownloader:
+    """Bounded background downloads with in-order release of each channel's posts.
+
+    Args:
+        directory: Where files are stored (created if missing)
+        workers: Max downloads in flight at once, across all channels
+        max_bytes: Skip attachments larger than this (None or 0 = no cap)
+        types: Only download these `MEDIA_TYPES` (None = all)
+    """
+
+    def __init__(self, directory: str, workers: int = DEFAULT_WORKERS,
+                 max_bytes: int = DEFAULT_MAX_BYTES, types=None):
+        self.directory = Path(directory).expanduser().resolve()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.workers = max(1, int(workers))
+        self.max_bytes = max_bytes or None
+        self.types = set(types) if types else None
+        self._slots = None  # asyncio.Semaphore(workers), created on first use
+        self._queues: dict = {}  # channel -> deque of [record, task or None, emit]
+        self._files: dict = {}  # MediaFile.unique_id -> future of its stored path
+
+    def keep(self, record, file, download, emit) -> None:
+        """Pass a kept post on to ``emit`` once its attachment is stored.
+
+        Args:
+            record: The post's tg_core.MessageRecord
+            file: Its MediaFile, or None when it has nothing to download
+            download: ``await download(path)`` saves the attachment to ``path``
+                and returns the path written
+            emit: Called with ``record`` when it may be output — after its own
+                download and those of the channel's earlier posts
+        """
+        task = None
+        if file is not None and (self.types is None or file.kind in self.types):
+            if self.max_bytes is not None and (file.size or 0) > self.max_bytes:
+                record.media_skipped = "too_large"
+            else:
+                task = asyncio.ensure_future(self._run(record, file, download))
+        queue = self._queues.setdefault(record.channel, deque())
+        queue.append([record, task, emit])
+        if task is None:
+            self._release(record.channel)
+        else:
+            task.add_done_callback(lambda _: self._release(record.channel))
+
+    def _release(self, channel: str) -> None:
+        queue = self._queues.get(channel)
+        while queue and (queue[0][1] is None or queue[0][1].done()):
+            record, task, emit = queue.popleft()
+            if task is None or not task.cancelled():
+                emit(record)
+
+    async def wait(self, channel: str) -> None:
+        """Wait for a channel's downloads; every kept post has been emitted on return."""
+        queue = self._queues.get(channel, ())
+        tasks = [task for _, task, _ in queue if task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._release(channel)
+        self._queues.pop(channel, None)
+
+    def discard(self, channel: str) -> None:
+        """Cancel a failed channel's downloads and drop its held-back posts."""
+        for _, task, _ in self._queues.pop(channel, ()):
+            if task is not None:
+                task.cancel()
+
+    async def _run(self, record, file, download) -> None:
+        try:
+            record.media_path = await self._fetch(file, download)
+        except _TooLarge:
+            record.media_skipped = "too_large"
+        except Exception as e:
+            record.media_skipped = f"download_failed: {str(e) or type(e).__name__}"
+
+    async def _fetch(self, file, download) -> str:
+        key = file.unique_id
+        known = self._files.get(key) if key is not None else None
+        if known is not None:
+            try:
+                return await asyncio.shield(known)
+            except Exception:
+                pass  # that download failed; try it again here
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._files[key] = future
+        try:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.workers)
+            async with self._slots:
+                path = await self._store(file, download)
+        except BaseException as e:
+            if key is not None and self._files.get(key) is future:
+                del self._files[key]
+            future.set_exception(e if isinstance(e, Exception) else RuntimeError("cancelled"))
+            future.exception()  # retrieved: waiters retry, nobody else needs it
+            raise
+        future.set_result(path)
+        return path
+
+    async def _store(self, file, download) -> str:
+        partial = str(self.directory / f".{uuid.uuid4().hex}{file.ext}.part")
+        written = None
+        try:
+            written = await download(partial)
+            if not written:
+                raise RuntimeError("nothing was downloaded")
+            if self.max_bytes is not None and os.path.getsize(written) > self.max_bytes:
+                raise _TooLarge()
+            digest = await asyncio.to_thread(_sha256, written)
+            target = self.directory / f"{digest}{file.ext}"
+            if target.exists():
+                os.remove(written)  # same content already stored
+            else:
+                os.replace(written, target)
+            return str(target)
+        finally:
+            for leftover in {partial, written or partial}:
+                if os.path.exists(leftover):
+                    os.remove(leftover)
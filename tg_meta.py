@@ -0,0 +1,126 @@
+"""
+tg-reader channel metadata cache — `info` results kept on disk for a TTL and shared by both backends.
+
+A full-chat request (Pyrogram ``get_chat``, Telethon
+``GetFullChannelRequest``) returns a channel's title, description,
+subscriber count and linked discussion group. They change slowly, so the
+result is kept in ``~/.tg-reader-meta.db`` for ``ttl_hours`` (default 24)
+and reused by `info` — one channel or hundreds — and by the ``--comments``
+check for a discussion group, instead of asking Telegram on every run.
+Entries are dropped when Telegram says the channel is gone. No heavy
+dependencies (no Pyrogram/Telethon).
+"""
+
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from tg_state import _normalize_channel
+
+_DEFAULT_META_FILE = str(Path.home() / ".tg-reader-meta.db")
+_DEFAULT_TTL_HOURS = 24
+
+
+def load_meta_config(config_file=None) -> dict:
+    """Load metadata cache settings from config file and env vars.
+
+    Config: ``"meta_cache": false`` to disable, or ``"meta_cache": {"path": ...,
+    "ttl_hours": 24}`` in ~/.tg-reader.json. Enabled by default.
+    Env vars: TG_META_CACHE ("true"/"1"/"false"/"0"), TG_META_FILE.
+
+    Returns:
+        dict with keys enabled, path, ttl_hours
+    """
+    settings = {"enabled": True, "path": _DEFAULT_META_FILE, "ttl_hours": _DEFAULT_TTL_HOURS}
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("meta_cache", True)
+            if isinstance(cfg, dict):
+                settings["enabled"] = cfg.get("enabled", True)
+                for key in ("path", "ttl_hours"):
+                    if key in cfg:
+                        settings[key] = cfg[key]
+            else:
+                settings["enabled"] = bool(cfg)
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+
+    env_enabled = os.environ.get("TG_META_CACHE", "").strip().lower()
+    if env_enabled in ("true", "1"):
+        settings["enabled"] = True
+    elif env_enabled in ("false", "0"):
+        settings["enabled"] = False
+
+    env_path = os.environ.get("TG_META_FILE", "").strip()
+    if env_path:
+        settings["path"] = env_path
+    return settings
+
+
+_open_caches: dict = {}
+
+
+def for_config(config_file=None):
+    """Return the MetaCache for this config, or None when disabled."""
+    settings = load_meta_config(config_file)
+    if not settings["enabled"]:
+        return None
+    path = str(settings["path"])
+    if path not in _open_caches:
+        try:
+            _open_caches[path] = MetaCache(path, float(settings["ttl_hours"]) * 3600)
+        except (sqlite3.Error, OSError):
+            return None  # unusable location — ask Telegram as before
+    return _open_caches[path]
+
+
+class MetaCache:
+    """SQLite-backed username → `info` dict map with a TTL.
+
+    The stored dict is the `info` result plus ``linked_chat_id`` (None when
+    the channel has no discussion group).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = _DEFAULT_TTL_HOURS * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS chats (
+                username TEXT PRIMARY KEY,
+                info TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        try:
+            os.chmod(path, 0o600)  # metadata of private channels the account reads
+        except OSError:
+            pass
+
+    def get(self, channel: str):
+        """Return the cached info dict if fresh, else None."""
+        row = self._db.execute(
+            "SELECT info, fetched_at FROM chats WHERE username = ?",
+            (_normalize_channel(channel),),
+        ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_seconds:
+            return None
+        return json.loads(row[0])
+
+    def put(self, channel: str, info: dict) -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO chats (username, info, fetched_at) VALUES (?, ?, ?)",
+                (_normalize_channel(channel), json.dumps(info, ensure_ascii=False), time.time()),
+            )
+
+    def invalidate(self, channel: str) -> None:
+        """Forget a channel (after it turned out private, banned or gone)."""
+        with self._db:
+            self._db.execute("DELETE FROM chats WHERE username = ?", (_normalize_channel(channel),))
@@ -0,0 +1,119 @@
+"""
+tg-reader streaming output — write `fetch --format ndjson` lines while messages arrive.
+
+Each channel produces one header line, one line per message and one trailer
+line, so consumers can start work before the last channel finishes and the
+reader never holds a whole channel in memory:
+
+    {"type": "channel", "channel": "@x", "since": ..., "fetched_at": ...}
+    {"type": "message", "channel": "@x", "id": ..., "date": ..., "text": ..., ...}
+    {"type": "end", "channel": "@x", "count": 42, "newest_id": 1234, ...}
+
+A channel that fails ends with ``{"type": "error", ...}`` (the usual channel
+error dict) instead of "end". Lines of concurrently fetched channels may
+interleave; every line carries its channel. No heavy dependencies (no
+Pyrogram/Telethon).
+"""
+
+import json
+import sys
+from datetime import datetime, timezone
+
+
+def line_writer(stream=None):
+    """Return ``write(obj)`` that puts one JSON object per line on ``stream`` and flushes."""
+    stream = stream or sys.stdout
+
+    def write(obj: dict) -> None:
+        stream.write(json.dumps(obj, ensure_ascii=False) + "\n")
+        stream.flush()
+
+    return write
+
+
+class NdjsonSink:
+    """Per-channel header/message/trailer writer for streamed fetches.
+
+    Args:
+        write: Callable taking one JSON-serializable dict per line
+            (``line_writer(...)`` locally, the daemon's ``emit`` in `serve`)
+        extra: Optional keys added to every "end" trailer (e.g. read_unread)
+
+    A channel retried after a FloodWait starts again from its newest post;
+    messages already written for it are skipped so no line is duplicated.
+    """
+
+    def __init__(self, write, extra: dict = None):
+        self._write = write
+        self.extra = extra or {}
+        self._started: set = set()
+        self._counts: dict = {}
+        self._written: dict = {}  # channel -> (newest id, oldest id) written so far
+        self.total = 0
+
+    def begin(self, channel: str, since: datetime, until: datetime = None) -> None:
+        """Write the channel header (once, even if the channel is retried)."""
+        if channel in self._started:
+            return
+        self._started.add(channel)
+        header = {"type": "channel", "channel": channel, "since": since.isoformat()}
+        if until is not None:
+            header["until"] = until.isoformat()
+        header["fetched_at"] = datetime.now(timezone.utc).isoformat()
+        self._write(header)
+
+    def _claim(self, channel: str, msg_id: int) -> bool:
+        """Record a message id as written; False if it already was."""
+        written = self._written.get(channel)
+        if written and written[1] <= msg_id <= written[0]:
+            return False
+        self._written[channel] = (
+            max(written[0], msg_id) if written else msg_id,
+            min(written[1], msg_id) if written else msg_id,
+        )
+        self._counts[channel] = self._counts.get(channel, 0) + 1
+        self.total += 1
+        return True
+
+    def message(self, channel: str, record) -> bool:
+        """Write one message line for a tg_core.MessageRecord. Returns False if it was already written."""
+        if not self._claim(channel, record.id):
+            return False
+        self._write({"type": "message", "channel": channel, **record.to_dict()})
+        return True
+
+    def end(self, result: dict) -> dict:
+        """Write the channel trailer for a finished fetch result and return it.
+
+        The trailer is the result dict without "messages", with the count of
+        lines actually written and the newest message id (for read tracking).
+        """
+        if "error" in result:
+            trailer = {"type": "error", **result}
+        else:
+            channel = result["channel"]
+            written = self._written.get(channel)
+            trailer = {"type": "end", **{k: v for k, v in result.items() if k != "messages"}}
+            trailer["count"] = self._counts.get(channel, 0)
+            trailer["newest_id"] = written[0] if written else None
+            trailer.update(self.extra)
+        self._write(trailer)
+        return trailer
+
+    def relay(self, line: dict) -> None:
+        """Pass through a line produced by a daemon-side sink.
+
+        Relayed lines count as written, so a fetch that falls back to a direct
+        connection half-way does not repeat them.
+        """
+        kind = line.get("type")
+        if kind == "channel":
+            if line["channel"] in self._started:
+                return
+            self._started.add(line["channel"])
+        elif kind == "message":
+            if not self._claim(line["channel"], line["id"]):
+                return
+        elif kind == "end":
+            line = {**line, **self.extra}
+        self._write(line)
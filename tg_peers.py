@@ -0,0 +1,136 @@
+"""
+tg-reader peer cache — persistent username → (peer id, access_hash) map shared by both backends.
+
+Resolving an @username (ResolveUsername) has the strictest flood limits of
+any call tg-reader makes. Once a channel has been resolved, its id and
+access_hash are enough to address it, so they are kept in
+``~/.tg-reader-peers-<account hash>.db`` (one file per session, as an
+access_hash is only valid for the account that resolved it) for a TTL and
+reused by reader.py and reader_telethon.py alike. Entries are dropped as soon as Telegram says the
+username or peer is invalid. No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+from tg_state import _normalize_channel
+
+_DEFAULT_PEERS_FILE = str(Path.home() / ".tg-reader-peers.db")
+_DEFAULT_TTL_HOURS = 7 * 24
+
+
+def load_peer_config(config_file=None) -> dict:
+    """Load peer cache settings from config file and env vars.
+
+    Config: ``"peer_cache": false`` to disable, or ``"peer_cache": {"path": ...,
+    "ttl_hours": 168}`` in ~/.tg-reader.json. Enabled by default.
+    Env vars: TG_PEER_CACHE ("true"/"1"/"false"/"0"), TG_PEERS_FILE.
+
+    Returns:
+        dict with keys enabled, path, ttl_hours
+    """
+    settings = {"enabled": True, "path": _DEFAULT_PEERS_FILE, "ttl_hours": _DEFAULT_TTL_HOURS}
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("peer_cache", True)
+            if isinstance(cfg, dict):
+                settings["enabled"] = cfg.get("enabled", True)
+                for key in ("path", "ttl_hours"):
+                    if key in cfg:
+                        settings[key] = cfg[key]
+            else:
+                settings["enabled"] = bool(cfg)
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+
+    env_enabled = os.environ.get("TG_PEER_CACHE", "").strip().lower()
+    if env_enabled in ("true", "1"):
+        settings["enabled"] = True
+    elif env_enabled in ("false", "0"):
+        settings["enabled"] = False
+
+    env_path = os.environ.get("TG_PEERS_FILE", "").strip()
+    if env_path:
+        settings["path"] = env_path
+    return settings
+
+
+_open_caches: dict = {}
+
+
+def for_config(config_file, account: str):
+    """Return the PeerCache of one account for this config, or None when disabled.
+
+    Access hashes are only valid for the account that resolved them, so
+    every caller passes the session name it connects with as ``account``
+    (each pool member its own) and gets a cache file of its own next to the
+    configured path: ``~/.tg-reader-peers-<hash>.db``.
+    """
+    settings = load_peer_config(config_file)
+    if not settings["enabled"]:
+        return None
+    base = Path(str(settings["path"]))
+    digest = hashlib.sha1(account.encode()).hexdigest()[:12]
+    path = str(base.with_name(f"{base.stem}-{digest}{base.suffix}"))
+    if path not in _open_caches:
+        try:
+            _open_caches[path] = PeerCache(path, float(settings["ttl_hours"]) * 3600)
+        except (sqlite3.Error, OSError):
+            return None  # unusable location — resolve usernames as before
+    return _open_caches[path]
+
+
+class PeerCache:
+    """SQLite-backed username → peer map with a TTL."""
+
+    def __init__(self, path: str, ttl_seconds: float = _DEFAULT_TTL_HOURS * 3600):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS peers (
+                username TEXT PRIMARY KEY,
+                peer_id INTEGER NOT NULL,
+                access_hash INTEGER NOT NULL,
+                peer_type TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )
+        """)
+        try:
+            os.chmod(path, 0o600)  # access hashes let this account address the peers
+        except OSError:
+            pass
+
+    def get(self, channel: str):
+        """Return (peer_id, access_hash, peer_type) if cached and fresh, else None.
+
+        ``peer_id`` is the bare channel id (not the -100… "marked" form).
+        """
+        row = self._db.execute(
+            "SELECT peer_id, access_hash, peer_type, resolved_at FROM peers WHERE username = ?",
+            (_normalize_channel(channel),),
+        ).fetchone()
+        if row is None or time.time() - row[3] > self.ttl_seconds:
+            return None
+        return row[0], row[1], row[2]
+
+    def put(self, channel: str, peer_id: int, access_hash: int, peer_type: str = "channel") -> None:
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO peers (username, peer_id, access_hash, peer_type, resolved_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (_normalize_channel(channel), peer_id, access_hash, peer_type, time.time()),
+            )
+
+    def invalidate(self, channel: str) -> None:
+        """Forget a username (after UsernameNotOccupied / PeerIdInvalid and friends)."""
+        with self._db:
+            self._db.execute("DELETE FROM peers WHERE username = ?", (_normalize_channel(channel),))
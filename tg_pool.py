@@ -0,0 +1,195 @@
+"""
+tg-reader session pool — shard a multi-channel fetch across several authorized accounts.
+
+Flood limits are per account, so a long channel list can be spread over
+several sessions listed in ~/.tg-reader.json:
+
+    {
+        "api_id": 12345, "api_hash": "...",
+        "sessions": [
+            "/home/me/.tg-reader-session",
+            {"session": "/home/me/.tg-reader-work", "api_id": 67890, "api_hash": "..."}
+        ]
+    }
+
+Entries without their own credentials use the top-level ones. Channels are
+assigned to sessions on a consistent-hash ring (``_REPLICAS`` virtual nodes
+per session), so a channel goes to the same account run after run — its
+peer cache entry stays valid — and adding or removing a session only moves
+the channels that hashed to it.
+
+A session that is flood-waited past the scheduler's retry, has been revoked
+(401) or cannot connect at all is taken out of the pool for the rest of the
+run, and its channels are fetched again by the next session on the ring.
+Results and streamed output look exactly like a single-session fetch. No
+heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import sys
+from pathlib import Path
+
+import tg_core
+from tg_state import _normalize_channel
+
+_REPLICAS = 64  # virtual nodes per session on the ring
+# Channel errors that say "this account, not this channel" — retry elsewhere
+FAILOVER_ERRORS = ("flood_wait", "session_revoked", "session_failed")
+
+
+def _fail(message: str) -> None:
+    print(json.dumps({"error": message}))
+    sys.exit(1)
+
+
+def load_sessions(config_file=None, api_id=None, api_hash=None) -> list:
+    """Pool members from ``"sessions"`` in the config file.
+
+    Args:
+        config_file: Explicit path to config JSON (overrides ~/.tg-reader.json)
+        api_id: Credentials for entries that do not set their own (the
+        api_hash: top-level ones, as returned by tg_core.get_config)
+
+    Returns:
+        list of ``(api_id, api_hash, session_name)`` like tg_core.get_config;
+        empty when fewer than two sessions are configured (no pool)
+    """
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if not config_path.exists():
+        return []
+    try:
+        with open(config_path) as f:
+            entries = json.load(f).get("sessions")
+    except (json.JSONDecodeError, OSError, AttributeError):
+        return []
+    if not entries:
+        return []
+    if not isinstance(entries, list):
+        _fail('"sessions" in config must be a list of session paths or {"session": ...} objects')
+
+    sessions: dict = {}
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"session": entry}
+        if not isinstance(entry, dict) or not entry.get("session"):
+            _fail(f'Invalid "sessions" entry in config: {entry!r} (needs a "session" path)')
+        name = str(Path(entry["session"]).expanduser()).removesuffix(".session")
+        try:
+            entry_id = int(entry.get("api_id") or api_id)
+        except (TypeError, ValueError):
+            _fail(f'Invalid api_id for session {name} in config')
+        sessions.setdefault(name, (entry_id, entry.get("api_hash") or api_hash, name))
+    return list(sessions.values()) if len(sessions) > 1 else []
+
+
+def session_exists(session_name: str) -> bool:
+    return Path(f"{session_name}.session").exists()
+
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """Consistent-hash ring over session names."""
+
+    def __init__(self, names, replicas: int = _REPLICAS):
+        points = sorted((_point(f"{name}#{i}"), name) for name in names for i in range(replicas))
+        self._points = [p for p, _ in points]
+        self._names = [name for _, name in points]
+        self._size = len(set(names))
+
+    def owners(self, key: str) -> list:
+        """Every session name, in ring order from ``key``'s point: primary owner first."""
+        start = bisect.bisect(self._points, _point(key))
+        owners: list = []
+        for i in range(len(self._names)):
+            name = self._names[(start + i) % len(self._names)]
+            if name not in owners:
+                owners.append(name)
+                if len(owners) == self._size:
+                    break
+        return owners
+
+
+class SessionPool:
+    """Spread channels over sessions and fail over between them.
+
+    Args:
+        sessions: ``(api_id, api_hash, session_name)`` tuples from `load_sessions`
+    """
+
+    def __init__(self, sessions: list):
+        self.sessions = {s[2]: s for s in sessions}
+        self.ring = HashRing(list(self.sessions))
+        self.down: dict = {}  # session name -> error_type that took it out of the pool
+
+    def assign(self, channel: str, tried=()) -> str:
+        """The session that should fetch ``channel`` now, or None if none is left."""
+        for name in self.ring.owners(_normalize_channel(channel)):
+            if name not in self.down and name not in tried:
+                return name
+        return None
+
+    async def run(self, channels: list, fetch_batch, on_result=None) -> list:
+        """Fetch every channel on its session; return results in input order.
+
+        Args:
+            channels: Channel usernames
+            fetch_batch: async ``fetch_batch(session, channels, settle)`` that
+                fetches ``channels`` over one session tuple and passes each
+                channel's result to ``settle`` as soon as it is known (the
+                scheduler's ``on_result``). It may raise for the session as a
+                whole (cannot connect, missing session file).
+            on_result: Called with each channel's final result (after any
+                failover); its return value is stored instead (``sink.end``)
+        """
+        tried: dict = {channel: set() for channel in channels}
+        last: dict = {}
+        final: dict = {}
+
+        def finish(channel: str) -> dict:
+            result = last[channel]
+            final[channel] = on_result(result) if on_result is not None else result
+            return final[channel]
+
+        def settle(name: str, result: dict) -> dict:
+            channel = result["channel"]
+            tried[channel].add(name)
+            last[channel] = result
+            if result.get("error_type") in FAILOVER_ERRORS:
+                self.down.setdefault(name, result["error_type"])
+                if self.assign(channel, tried[channel]) is not None:
+                    return result  # fetched again by the next session on the ring
+            return finish(channel)
+
+        async def run_batch(name: str, batch: list) -> None:
+            error = "fetch returned without a result"
+            try:
+                await fetch_batch(self.sessions[name], batch,
+                                  lambda result: settle(name, result))
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            for channel in batch:
+                if name not in tried[channel]:
+                    settle(name, tg_core.channel_error(
+                        channel, "session_failed",
+                        f"Session {name} failed: {error}",
+                        "check_session_or_remove_from_pool",
+                    ))
+
+        pending = list(dict.fromkeys(channels))
+        while pending:
+            batches: dict = {}
+            for channel in pending:
+                name = self.assign(channel, tried[channel])
+                if name is None:
+                    finish(channel)  # every session tried or down: report the last error
+                else:
+                    batches.setdefault(name, []).append(channel)
+            await asyncio.gather(*(run_batch(name, batch) for name, batch in batches.items()))
+            pending = [channel for channel in pending if channel not in final]
+        return [final[channel] for channel in channels]
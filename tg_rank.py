@@ -0,0 +1,152 @@
+"""
+tg-reader ranking — `fetch --top N` / `--max-output-bytes`: keep the highest-scoring posts across channels.
+
+Posts are scored by engagement relative to their own channel, so a post
+that does well for a small channel can outrank an average post of a big one:
+
+    engagement = views + FORWARD_WEIGHT * forwards
+    score      = engagement / median engagement of the channel's posts in this fetch
+
+`RankedSink` receives posts while they are fetched (it is an NdjsonSink, so
+both backends, the scheduler and daemon relaying feed it unchanged). A
+channel's posts are scored when the channel finishes and pushed through a
+min-heap that never holds more than the candidates still in the running,
+so memory is bounded by the heap plus the channels in flight. `finish`
+applies the output byte budget in score order (cutting at the first post
+that does not fit) and builds the usual channel results, with each kept post's ``rank`` and ``score`` and per-channel
+``fetched``/``dropped`` counts. No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import heapq
+import statistics
+
+import tg_core
+import tg_dedup
+import tg_output
+
+FORWARD_WEIGHT = 10  # a forward counts like this many views
+_DEDUP_POOL = 3  # with --dedup, keep this many times --top candidates so folding can refill
+
+
+def engagement(record: tg_core.MessageRecord) -> int:
+    return (record.views or 0) + FORWARD_WEIGHT * (record.forwards or 0)
+
+
+class RankedSink(tg_output.NdjsonSink):
+    """NdjsonSink drop-in that ranks posts instead of writing them.
+
+    Args:
+        top: Keep at most this many posts across all channels (None = all)
+        max_bytes: Budget for the kept posts' JSON entries (None = no budget)
+        dedup: Fold near-duplicates (tg_dedup) among the candidates first
+        extra: As for NdjsonSink
+    """
+
+    def __init__(self, top: int = None, max_bytes: int = None, dedup: bool = False,
+                 extra: dict = None):
+        super().__init__(lambda line: None, extra=extra)
+        self.top = top
+        self.max_bytes = max_bytes
+        self.dedup = dedup
+        self._pool = top * _DEDUP_POOL if top and dedup else top
+        self._pending: dict = {}  # channel -> records not scored yet
+        self._heap: list = []  # (score, -seq, record), lowest score first
+        self._seq = 0
+        self._fetched: dict = {}
+
+    def _rank_channel(self, channel: str) -> None:
+        records = self._pending.pop(channel, [])
+        if not records:
+            return
+        self._fetched[channel] = self._fetched.get(channel, 0) + len(records)
+        median = statistics.median(engagement(r) for r in records) or 1
+        for record in records:
+            self._seq += 1
+            item = (engagement(record) / median, -self._seq, record)
+            if self._pool is None or len(self._heap) < self._pool:
+                heapq.heappush(self._heap, item)
+            else:
+                heapq.heappushpop(self._heap, item)
+
+    def message(self, channel: str, record) -> bool:
+        if not self._claim(channel, record.id):
+            return False
+        self._pending.setdefault(channel, []).append(record)
+        return True
+
+    def end(self, result: dict) -> dict:
+        if "error" not in result:
+            self._rank_channel(result["channel"])
+        return super().end(result)
+
+    def relay(self, line: dict) -> None:
+        kind = line.get("type")
+        if kind == "message":
+            if self._claim(line["channel"], line["id"]):
+                self._pending.setdefault(line["channel"], []).append(
+                    tg_core.MessageRecord.from_dict(line["channel"], line))
+            return
+        if kind == "end":
+            self._rank_channel(line["channel"])
+        super().relay(line)
+
+    def _candidates(self) -> list:
+        candidates = sorted(self._heap, reverse=True)
+        if not self.dedup:
+            return candidates
+        groups = {}
+        for _, _, record in candidates:
+            groups.setdefault(record.channel, []).append(record)
+        results = [{"channel": channel, "messages": records} for channel, records in groups.items()]
+        tg_dedup.fold(results)
+        kept = {id(record) for result in results for record in result["messages"]}
+        return [c for c in candidates if id(c[2]) in kept]
+
+    def finish(self, result):
+        """Select the posts to output and return channel results in the usual shape.
+
+        Args:
+            result: What the fetch returned with this sink: the channel
+                trailer, or the list of trailers/error dicts
+        """
+        for channel in list(self._pending):
+            self._rank_channel(channel)
+        candidates = self._candidates()
+        if self.top:
+            candidates = candidates[:self.top]
+
+        kept: dict = {}
+        over_budget: dict = {}
+        used = 0
+        for rank, (score, _, record) in enumerate(candidates, 1):
+            entry = record.to_dict()
+            size = len(tg_core.dumps(entry).encode()) + 1
+            if self.max_bytes is not None and used + size > self.max_bytes:
+                # Stop at the first post that does not fit: packing smaller,
+                # lower-ranked posts behind it would break the score order
+                for _, _, cut in candidates[rank - 1:]:
+                    over_budget[cut.channel] = over_budget.get(cut.channel, 0) + 1
+                break
+            used += size
+            entry["rank"] = rank
+            entry["score"] = round(score, 3)
+            kept.setdefault(record.channel, []).append(entry)
+
+        def build(trailer: dict) -> dict:
+            if "error" in trailer:
+                return trailer
+            channel = trailer["channel"]
+            out = {k: v for k, v in trailer.items() if k not in ("type", "newest_id", *self.extra)}
+            messages = kept.get(channel, [])
+            fetched = self._fetched.get(channel, 0)
+            out["count"] = len(messages)
+            out["fetched"] = fetched
+            out["dropped"] = fetched - len(messages)
+            if channel in over_budget:
+                out["dropped_for_size"] = over_budget[channel]
+            out["messages"] = messages
+            return out
+
+        if isinstance(result, list):
+            return [build(r) for r in result]
+        return build(result)
@@ -0,0 +1,183 @@
+"""
+tg-reader rate limiter — one token bucket per session, shared by every process on the host.
+
+The bucket lives in ``{session_name}.ratelimit`` (a small JSON file) and is
+updated under an exclusive ``fcntl`` lock, so concurrent reader.py and
+reader_telethon.py runs against the same session draw from one budget.
+
+Callers *borrow*: ``acquire()`` always takes its tokens immediately and the
+bucket may go negative; the caller then sleeps until the debt is paid back.
+Every FloodWait Telegram returns halves the refill rate and blocks the bucket
+for the requested time; the rate recovers gradually once waits stop.
+No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, bucket is per process
+    fcntl = None
+
+_DEFAULT_RATE = 1.0    # tokens (API requests) per second
+_DEFAULT_BURST = 5.0   # bucket capacity
+_MIN_RATE_FACTOR = 0.05  # never drop below 5% of the configured rate
+_RECOVERY_AFTER = 60   # seconds without FloodWait before the rate starts recovering
+_RECOVERY_STEP = 10    # seconds between recovery steps
+_RECOVERY_FACTOR = 1.1  # rate multiplier per recovery step (capped at the configured rate)
+
+
+def limiter_disabled() -> bool:
+    """True when TG_RATE_LIMIT is set to 0/false — no shared limiting at all."""
+    return os.environ.get("TG_RATE_LIMIT", "").strip().lower() in ("false", "0", "no")
+
+
+def load_rate_config(config_file=None) -> tuple:
+    """Read ``rate_limit`` settings from the config file.
+
+    Config: ``{"rate_limit": {"rate": 1.0, "burst": 5}}`` in ~/.tg-reader.json.
+
+    Returns:
+        (rate: float, burst: float)
+    """
+    rate, burst = _DEFAULT_RATE, _DEFAULT_BURST
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("rate_limit") or {}
+            rate = float(cfg.get("rate", rate))
+            burst = float(cfg.get("burst", burst))
+        except (json.JSONDecodeError, OSError, AttributeError, TypeError, ValueError):
+            pass
+    return rate, burst
+
+
+class _Unlimited:
+    """Limiter stand-in used when limiting is disabled or no session is known."""
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        return None
+
+    def report_flood_wait(self, seconds: float) -> None:
+        return None
+
+
+UNLIMITED = _Unlimited()
+
+
+class SharedRateLimiter:
+    """Token bucket persisted in a lock-protected file next to the session.
+
+    Args:
+        session_name: Session path (without .session); one bucket per session
+        rate: Configured refill rate in tokens per second
+        burst: Bucket capacity
+    """
+
+    def __init__(self, session_name: str, rate: float = _DEFAULT_RATE,
+                 burst: float = _DEFAULT_BURST):
+        self.path = f"{session_name}.ratelimit"
+        self.rate = max(rate, 0.001)
+        self.burst = max(burst, 1.0)
+
+    def _update(self, mutate):
+        """Run ``mutate(state, now)`` on the shared state under an exclusive lock."""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            raw = b""
+            while True:
+                chunk = os.read(fd, 4096)
+                if not chunk:
+                    break
+                raw += chunk
+            try:
+                state = json.loads(raw) if raw else {}
+            except ValueError:
+                state = {}
+            now = time.time()
+            state.setdefault("tokens", self.burst)
+            state.setdefault("updated", now)
+            state.setdefault("rate", self.rate)
+            state.setdefault("blocked_until", 0.0)
+            state.setdefault("last_flood", 0.0)
+            state.setdefault("last_recovery", 0.0)
+            # Refill since the last update (never while blocked by a FloodWait)
+            refill_from = max(state["updated"], min(state["blocked_until"], now))
+            if now > refill_from:
+                state["tokens"] = min(self.burst, state["tokens"] + (now - refill_from) * state["rate"])
+            state["updated"] = now
+            # Recover the learned rate once FloodWaits have stopped for a while
+            if (state["rate"] < self.rate and now - state["last_flood"] > _RECOVERY_AFTER
+                    and now - state["last_recovery"] > _RECOVERY_STEP):
+                state["rate"] = min(self.rate, state["rate"] * _RECOVERY_FACTOR)
+                state["last_recovery"] = now
+            result = mutate(state, now)
+            data = json.dumps(state).encode()
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+            return result
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens now (borrowing if needed); return seconds to wait."""
+        def _take(state, now):
+            state["tokens"] -= cost
+            wait = max(0.0, state["blocked_until"] - now)
+            if state["tokens"] < 0:
+                wait += -state["tokens"] / state["rate"]
+            return wait
+
+        try:
+            return self._update(_take)
+        except OSError:
+            return 0.0  # unwritable location — do not block fetching on the limiter
+
+    async def acquire(self, cost: float = 1.0) -> None:
+        """Reserve tokens for one API request and sleep until they are paid for."""
+        wait = self.reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def report_flood_wait(self, seconds: float) -> None:
+        """Learn from a FloodWait: block the bucket for ``seconds`` and halve the rate."""
+        def _learn(state, now):
+            state["blocked_until"] = max(state["blocked_until"], now + seconds)
+            state["rate"] = max(self.rate * _MIN_RATE_FACTOR, state["rate"] / 2)
+            state["tokens"] = min(state["tokens"], 0.0)
+            state["last_flood"] = now
+            state["last_flood_seconds"] = seconds
+
+        try:
+            self._update(_learn)
+        except OSError:
+            pass
+
+
+async def paced(limiter, messages, page_size: int = 100):
+    """Wrap a paginated history iterator, taking one token per page request."""
+    seen = 0
+    await limiter.acquire()
+    async for msg in messages:
+        if seen and seen % page_size == 0:
+            await limiter.acquire()
+        seen += 1
+        yield msg
+
+
+def for_session(session_name: str, config_file=None):
+    """Return the shared limiter for a session, or UNLIMITED when disabled."""
+    if limiter_disabled():
+        return UNLIMITED
+    rate, burst = load_rate_config(config_file)
+    return SharedRateLimiter(session_name, rate=rate, burst=burst)
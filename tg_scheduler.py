@@ -0,0 +1,114 @@
+"""
+tg-reader scheduler — fetch several channels concurrently with an adaptive request rate.
+
+Runs up to `concurrency` channel fetches at once and spaces their start times
+by an interval that shrinks while Telegram answers normally and grows (plus a
+global pause) when a FloodWait comes back. Results keep the input order.
+No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import asyncio
+import time
+
+_SPEEDUP = 0.75   # interval multiplier after a successful fetch
+_SLOWDOWN = 2.0   # interval multiplier after a FloodWait
+_MIN_INTERVAL = 0.5
+_MAX_INTERVAL = 60.0
+
+
+def flood_wait_seconds(result) -> int:
+    """Return the FloodWait length from a `flood_wait` channel error dict, else 0."""
+    if not isinstance(result, dict) or result.get("error_type") != "flood_wait":
+        return 0
+    wait_action = result.get("action", "")
+    try:
+        return int(wait_action.replace("wait_", "").replace("s", ""))
+    except (ValueError, AttributeError):
+        return 0
+
+
+class AdaptiveScheduler:
+    """Bounded-concurrency runner whose start interval adapts to FloodWait responses.
+
+    Args:
+        concurrency: Max fetches in flight at once
+        interval: Initial seconds between fetch starts (the old --delay)
+        flood_wait_max: Retry a channel once if its FloodWait is <= this many seconds
+    """
+
+    def __init__(self, concurrency: int = 3, interval: float = 10,
+                 flood_wait_max: int = 60,
+                 min_interval: float = _MIN_INTERVAL, max_interval: float = _MAX_INTERVAL):
+        self.concurrency = max(1, concurrency)
+        self.interval = max(0.0, interval)
+        self.flood_wait_max = flood_wait_max
+        self.min_interval = min(min_interval, self.interval)
+        self.max_interval = max(max_interval, self.interval)
+        self.flood_waits = 0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._pace_lock = asyncio.Lock()
+
+    async def _pace(self) -> None:
+        """Wait for this worker's turn: respect the start interval and any FloodWait pause."""
+        async with self._pace_lock:
+            now = time.monotonic()
+            start = max(now, self._next_start, self._paused_until)
+            if start > now:
+                await asyncio.sleep(start - now)
+            self._next_start = time.monotonic() + self.interval
+
+    def _on_success(self) -> None:
+        self.interval = max(self.min_interval, self.interval * _SPEEDUP)
+
+    def _on_flood_wait(self, seconds: int) -> None:
+        self.flood_waits += 1
+        self.interval = min(self.max_interval, max(self.interval, self.min_interval, 1.0) * _SLOWDOWN)
+        # Longer waits are reported to the caller instead of stalling every channel
+        if seconds <= self.flood_wait_max:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def _run_one(self, item, fetch_one):
+        await self._pace()
+        result = await fetch_one(item)
+        wait_seconds = flood_wait_seconds(result)
+        if not wait_seconds:
+            self._on_success()
+            return result
+
+        # Slow everyone down; retry this channel once if the wait is reasonable
+        self._on_flood_wait(wait_seconds)
+        if wait_seconds > self.flood_wait_max:
+            return result
+        await self._pace()
+        result = await fetch_one(item)
+        retry_wait = flood_wait_seconds(result)
+        if retry_wait:
+            self._on_flood_wait(retry_wait)
+        else:
+            self._on_success()
+        return result
+
+    async def run(self, items: list, fetch_one, on_result=None) -> list:
+        """Run ``await fetch_one(item)`` for every item; return results in input order.
+
+        ``on_result(result)``, if given, is called as soon as each item is
+        final (after any retry) and its return value is stored instead.
+        """
+        results: list = [None] * len(items)
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, item in enumerate(items):
+            queue.put_nowait((index, item))
+
+        async def worker():
+            while True:
+                try:
+                    index, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                result = await self._run_one(item, fetch_one)
+                results[index] = on_result(result) if on_result is not None else result
+
+        workers = min(self.concurrency, len(items))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return results
@@ -0,0 +1,153 @@
+"""
+tg-reader in-memory sessions — read the session file once and run on a copy in memory.
+
+Pyrogram and Telethon keep the session in SQLite (``{name}.session``) and
+write to it while connected (peers, update state), so two processes using
+one session collide with "database is locked". With
+``"in_memory_session": true`` in ~/.tg-reader.json or
+``TG_SESSION_IN_MEMORY=1``, the auth key is read from the session file once,
+read-only, and the client runs on a session string (Pyrogram
+``session_string``, Telethon ``StringSession``); nothing else touches the
+file while it runs. When the client stops, only a changed auth key or data
+center is written back, under an exclusive ``fcntl`` lock on
+``{name}.session.lock``, so any number of processes can share one account.
+
+The session file must still exist (``tg-reader auth`` creates it). No heavy
+dependencies (no Pyrogram/Telethon).
+"""
+
+import base64
+import ipaddress
+import json
+import os
+import sqlite3
+import struct
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking for the write-back
+    fcntl = None
+
+_PYROGRAM_STRING = ">BI?256sQ?"  # pyrogram.storage.Storage.SESSION_STRING_FORMAT
+_TELETHON_VERSION = "1"  # telethon.sessions.string.CURRENT_VERSION
+
+
+def in_memory_enabled(config_file=None) -> bool:
+    """True when sessions should be loaded into memory for this run.
+
+    Config: ``"in_memory_session": true`` in ~/.tg-reader.json.
+    Env var: TG_SESSION_IN_MEMORY ("true"/"1"/"false"/"0") takes priority.
+    """
+    env = os.environ.get("TG_SESSION_IN_MEMORY", "").strip().lower()
+    if env in ("true", "1"):
+        return True
+    if env in ("false", "0"):
+        return False
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                return bool(json.load(f).get("in_memory_session", False))
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+    return False
+
+
+@contextmanager
+def _locked(session_name: str):
+    fd = os.open(f"{session_name}.session.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def _read_row(session_name: str, query: str) -> tuple:
+    try:
+        db = sqlite3.connect(f"file:{session_name}.session?mode=ro", uri=True, timeout=30)
+        try:
+            row = db.execute(query).fetchone()
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        raise ValueError(f"Cannot read session {session_name}.session: {e}")
+    if row is None or not row[-1]:
+        raise ValueError(f"Session {session_name}.session holds no auth key; run auth first")
+    return row
+
+
+def _write(session_name: str, statement: str, params: tuple) -> None:
+    with _locked(session_name):
+        db = sqlite3.connect(f"{session_name}.session", timeout=30)
+        try:
+            with db:
+                db.execute(statement, params)
+        finally:
+            db.close()
+
+
+# ── Pyrogram ─────────────────────────────────────────────────────────────────
+
+def load_pyrogram(session_name: str, api_id: int) -> tuple:
+    """Read a Pyrogram session file into a ``session_string``.
+
+    Returns:
+        (session_string, (dc_id, auth_key)) — the second item is what
+        `save_pyrogram` compares against when the client stops
+
+    Raises:
+        ValueError: unreadable session file or no auth key in it
+    """
+    dc_id, stored_api_id, test_mode, user_id, is_bot, auth_key = _read_row(
+        session_name,
+        "SELECT dc_id, api_id, test_mode, user_id, is_bot, auth_key FROM sessions LIMIT 1")
+    packed = struct.pack(_PYROGRAM_STRING, dc_id, stored_api_id or api_id, bool(test_mode),
+                         auth_key, user_id or 0, bool(is_bot))
+    return base64.urlsafe_b64encode(packed).decode().rstrip("="), (dc_id, auth_key)
+
+
+def save_pyrogram(session_name: str, loaded: tuple, dc_id: int, auth_key: bytes) -> bool:
+    """Write a changed auth key / DC back to the session file. Returns True if written."""
+    if (dc_id, auth_key) == loaded or not auth_key:
+        return False
+    _write(session_name, "UPDATE sessions SET dc_id = ?, auth_key = ?, date = ?",
+           (dc_id, auth_key, int(time.time())))
+    return True
+
+
+# ── Telethon ─────────────────────────────────────────────────────────────────
+
+def load_telethon(session_name: str) -> tuple:
+    """Read a Telethon session file into a ``StringSession`` string.
+
+    Returns:
+        (session_string, (dc_id, server_address, port, auth_key)) — the
+        second item is what `save_telethon` compares against
+
+    Raises:
+        ValueError: unreadable session file or no auth key in it
+    """
+    dc_id, server_address, port, auth_key = _read_row(
+        session_name, "SELECT dc_id, server_address, port, auth_key FROM sessions LIMIT 1")
+    ip = ipaddress.ip_address(server_address).packed
+    packed = struct.pack(f">B{len(ip)}sH256s", dc_id, ip, port, auth_key)
+    string = _TELETHON_VERSION + base64.urlsafe_b64encode(packed).decode()
+    return string, (dc_id, server_address, port, auth_key)
+
+
+def save_telethon(session_name: str, loaded: tuple, dc_id: int, server_address: str,
+                  port: int, auth_key: bytes) -> bool:
+    """Write a changed auth key / DC back to the session file. Returns True if written."""
+    if (dc_id, server_address, port, auth_key) == loaded or not auth_key:
+        return False
+    _write(session_name,
+           "UPDATE sessions SET dc_id = ?, server_address = ?, port = ?, auth_key = ?",
+           (dc_id, server_address, port, auth_key))
+    return True
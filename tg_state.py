@@ -3,10 +3,19 @@ tg-reader state tracking — load/save per-channel last_read_id.
 
 Tracks which posts have already been fetched so subsequent runs
 return only new (unread) posts. No heavy dependencies (no Pyrogram/Telethon).
+
+State lives in a SQLite database (WAL mode) next to the configured state
+file: ``~/.tg-reader-state.json`` → ``~/.tg-reader-state.db``. Each channel
+is one row, read only when asked for and written only when it changed, and
+``last_read_id`` only ever moves forward (``MAX`` on upsert), so processes
+fetching at the same time no longer overwrite each other's progress. An
+existing JSON state file is imported once, the first time the database is
+created; it is left in place but no longer read or written.
 """
 
 import json
 import os
+import sqlite3
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -54,26 +63,153 @@ def _normalize_channel(channel: str) -> str:
     return channel.lstrip("@").lower()
 
 
-def load_state(state_file: str) -> dict:
-    """Load state from file. Returns empty state if file doesn't exist or is invalid."""
-    path = Path(state_file)
-    if not path.exists():
+def state_db_path(state_file: str) -> str:
+    """SQLite file for a state_file setting: ``x.json`` → ``x.db``; ``x.db`` as is; else ``x.db`` appended."""
+    path = str(state_file)
+    if path.endswith(".db"):
+        return path
+    if path.endswith(".json"):
+        return path[:-len(".json")] + ".db"
+    return path + ".db"
+
+
+def _legacy_json_path(state_file: str) -> str:
+    path = str(state_file)
+    return path[:-len(".db")] + ".json" if path.endswith(".db") else path
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    """Open (creating if needed) the state database and import the JSON state once."""
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    db = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.executescript("""
+        CREATE TABLE IF NOT EXISTS channels (
+            channel TEXT PRIMARY KEY,
+            last_read_id INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+    """)
+    return db
+
+
+def _upsert(db: sqlite3.Connection, rows) -> None:
+    """Write (channel, last_read_id, updated_at) rows; a stored higher id wins."""
+    db.executemany("""
+        INSERT INTO channels (channel, last_read_id, updated_at) VALUES (?, ?, ?)
+        ON CONFLICT (channel) DO UPDATE SET
+            last_read_id = MAX(last_read_id, excluded.last_read_id),
+            updated_at = excluded.updated_at
+        WHERE excluded.last_read_id > last_read_id
+    """, rows)
+
+
+def _migrate(db: sqlite3.Connection, json_path: str) -> None:
+    """Import channels from the pre-SQLite JSON state file, once per database."""
+    db.execute("BEGIN IMMEDIATE")
+    try:
+        if db.execute("SELECT 1 FROM meta WHERE key = 'migrated_from'").fetchone() is None:
+            channels = _read_json_state(json_path)["channels"]
+            _upsert(db, [
+                (key, data.get("last_read_id", 0),
+                 data.get("updated_at") or datetime.now(timezone.utc).isoformat())
+                for key, data in channels.items() if isinstance(data, dict)
+            ])
+            db.execute("INSERT INTO meta (key, value) VALUES ('migrated_from', ?)", (json_path,))
+        db.execute("COMMIT")
+    except BaseException:
+        db.execute("ROLLBACK")
+        raise
+
+
+def _read_json_state(path: str) -> dict:
+    if not Path(path).exists():
         return {"version": 1, "channels": {}}
     try:
         with open(path) as f:
             data = json.load(f)
-        if not isinstance(data, dict) or "channels" not in data:
+        if not isinstance(data, dict) or not isinstance(data.get("channels"), dict):
             return {"version": 1, "channels": {}}
         return data
     except (json.JSONDecodeError, OSError):
         return {"version": 1, "channels": {}}
 
 
+class State(dict):
+    """Read-tracking state as returned by `load_state`.
+
+    Still the ``{"version": ..., "channels": {key: {"last_read_id": ...}}}``
+    dict callers know, but ``channels`` only holds the rows looked up or
+    updated in this process; the rest stay in the database.
+    """
+
+    def __init__(self, state_file: str):
+        super().__init__(version=2, channels={})
+        self.state_file = str(state_file)
+        self.db_path = state_db_path(state_file)
+        self._db = None
+        self._dirty = set()
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            self._db = _connect(self.db_path)
+            _migrate(self._db, _legacy_json_path(self.state_file))
+        return self._db
+
+    def _load(self, key: str) -> None:
+        row = self._conn().execute(
+            "SELECT last_read_id, updated_at FROM channels WHERE channel = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            self["channels"][key] = {"last_read_id": row[0], "updated_at": row[1]}
+
+    def all_channels(self) -> dict:
+        """Every tracked channel: key -> {"last_read_id", "updated_at"}."""
+        rows = self._conn().execute("SELECT channel, last_read_id, updated_at FROM channels")
+        return {key: {"last_read_id": last_id, "updated_at": at} for key, last_id, at in rows}
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        channels = self["channels"]
+        _upsert(self._conn(), [
+            (key, channels[key]["last_read_id"], channels[key]["updated_at"])
+            for key in self._dirty if key in channels
+        ])
+        self._dirty.clear()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def tracking_key(channel: str, query: str = None) -> str:
+    """State key for a fetch: the channel, or channel plus ``--query`` text.
+
+    A search keeps its own read position, so `fetch --query` returns only
+    matches it has not returned before without skipping the channel's
+    non-matching posts for a plain `fetch`.
+    """
+    return f"{channel}?q={query}" if query else channel
+
+
+def load_state(state_file: str) -> dict:
+    """Open the state for a state file. Channels are read lazily, one row per lookup."""
+    return State(state_file)
+
+
 def get_last_read_id(state: dict, channel: str) -> int:
     """Get last_read_id for a channel. Returns 0 if not tracked yet."""
     key = _normalize_channel(channel)
-    ch_data = state.get("channels", {}).get(key, {})
-    return ch_data.get("last_read_id", 0)
+    channels = state.get("channels", {})
+    if isinstance(state, State) and key not in channels and key not in state._dirty:
+        state._load(key)
+    return channels.get(key, {}).get("last_read_id", 0)
 
 
 def update_state(state: dict, channel: str, last_read_id: int) -> dict:
@@ -85,15 +221,28 @@ def update_state(state: dict, channel: str, last_read_id: int) -> dict:
         "last_read_id": last_read_id,
         "updated_at": datetime.now(timezone.utc).isoformat(),
     }
+    if isinstance(state, State):
+        state._dirty.add(key)
     return state
 
 
 def save_state(state: dict, state_file: str) -> None:
-    """Save state atomically using write-to-temp + os.replace."""
-    path = Path(state_file)
-    tmp_path = Path(state_file + ".tmp")
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(state, f, indent=2, ensure_ascii=False)
-        f.write("\n")
-    os.replace(str(tmp_path), str(path))
+    """Write changed channels to the state database (one upsert per changed channel).
+
+    ``last_read_id`` never moves backwards: if another process stored a
+    higher id for a channel in the meantime, that id is kept. A plain dict
+    (not from `load_state`) has all its channels written.
+    """
+    if isinstance(state, State) and state.db_path == state_db_path(state_file):
+        state.save()
+        return
+    db = _connect(state_db_path(state_file))
+    try:
+        _migrate(db, _legacy_json_path(state_file))
+        now = datetime.now(timezone.utc).isoformat()
+        _upsert(db, [
+            (key, data.get("last_read_id", 0), data.get("updated_at") or now)
+            for key, data in state.get("channels", {}).items()
+        ])
+    finally:
+        db.close()
@@ -0,0 +1,222 @@
+"""
+tg-reader engagement stats — `refresh-stats` snapshots of views/forwards kept as fixed-width columns.
+
+Each channel has a directory under ``~/.tg-reader-stats/`` holding
+append-only columns of little-endian int64 values, one file per column:
+
+    posts.id  posts.date                          tracked posts (registry)
+    snap.id   snap.ts   snap.views  snap.forwards  one row per post per refresh
+
+A refresh walks the history only for posts newer than the newest tracked
+one (registering them, with their counters as the first snapshot) and
+re-reads the counters of the other tracked posts inside the window with
+``messages.GetMessagesViews``, `VIEWS_BATCH` ids per request — no text is
+downloaded again. Rows are appended under an ``fcntl`` lock; a reader only
+trusts the rows every column of a table holds, so an interrupted append is
+ignored. `StatsStore.curves` reads a channel's columns in one pass and
+returns per-post growth curves. A missing forwards counter is stored as -1.
+No heavy dependencies (no Pyrogram/Telethon).
+"""
+
+import json
+import os
+import sys
+import time
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from tg_state import _normalize_channel
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends are not locked across processes
+    fcntl = None
+
+VIEWS_BATCH = 200  # message ids per GetMessagesViews request
+_DEFAULT_STATS_DIR = str(Path.home() / ".tg-reader-stats")
+_POSTS = ("posts.id", "posts.date")
+_SNAPSHOTS = ("snap.id", "snap.ts", "snap.views", "snap.forwards")
+
+
+def load_stats_dir(config_file=None) -> str:
+    """Directory of the stats store.
+
+    Config: ``"stats_store": {"path": ...}`` in ~/.tg-reader.json.
+    Env var: TG_STATS_DIR takes priority.
+    """
+    env_path = os.environ.get("TG_STATS_DIR", "").strip()
+    if env_path:
+        return env_path
+    config_path = Path(config_file) if config_file else Path.home() / ".tg-reader.json"
+    if config_path.exists():
+        try:
+            with open(config_path) as f:
+                cfg = json.load(f).get("stats_store") or {}
+            if cfg.get("path"):
+                return str(Path(cfg["path"]).expanduser())
+        except (json.JSONDecodeError, OSError, AttributeError):
+            pass
+    return _DEFAULT_STATS_DIR
+
+
+def for_config(config_file=None) -> "StatsStore":
+    return StatsStore(load_stats_dir(config_file))
+
+
+def _column(values) -> array:
+    col = array("q", values)
+    if sys.byteorder == "big":
+        col.byteswap()
+    return col
+
+
+class StatsStore:
+    """Per-channel append-only int64 columns of tracked posts and counter snapshots."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def _dir(self, channel: str) -> Path:
+        return self.path / _normalize_channel(channel)
+
+    @contextmanager
+    def _locked(self, channel: str):
+        directory = self._dir(channel)
+        directory.mkdir(parents=True, exist_ok=True)
+        fd = os.open(directory / ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield directory
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self, channel: str, names: tuple) -> list:
+        """Load a table's columns, cut to the rows all of them hold."""
+        columns = []
+        for name in names:
+            col = array("q")
+            try:
+                data = (self._dir(channel) / name).read_bytes()
+            except FileNotFoundError:
+                data = b""
+            col.frombytes(data[:len(data) - len(data) % col.itemsize])
+            if sys.byteorder == "big":
+                col.byteswap()
+            columns.append(col)
+        rows = min(len(col) for col in columns)
+        return [col[:rows] if len(col) > rows else col for col in columns]
+
+    def _append(self, directory: Path, names: tuple, columns: list) -> None:
+        # Cut every column back to the table's complete rows first, so a torn
+        # earlier append cannot shift this one out of line
+        lengths = [(directory / name).stat().st_size if (directory / name).exists() else 0
+                   for name in names]
+        rows = min(lengths) // 8
+        for name, length, values in zip(names, lengths, columns):
+            with open(directory / name, "ab") as f:
+                if length != rows * 8:
+                    f.truncate(rows * 8)
+                _column(values).tofile(f)
+
+    def posts(self, channel: str) -> dict:
+        """Tracked posts: message id -> post date (epoch seconds)."""
+        ids, dates = self._read(channel, _POSTS)
+        return dict(zip(ids, dates))
+
+    def record(self, channel: str, new_posts: dict, counters: dict, at: float = None) -> None:
+        """Register new posts and append one snapshot row per post.
+
+        Args:
+            new_posts: message id -> post date (epoch seconds) of posts not tracked yet
+            counters: message id -> (views, forwards) read now
+            at: Snapshot time (epoch seconds; default now)
+        """
+        at = int(at if at is not None else time.time())
+        with self._locked(channel) as directory:
+            known = self.posts(channel)
+            fresh = {i: d for i, d in new_posts.items() if i not in known}
+            if fresh:
+                self._append(directory, _POSTS, [list(fresh), list(fresh.values())])
+            if counters:
+                ids = list(counters)
+                self._append(directory, _SNAPSHOTS, [
+                    ids, [at] * len(ids),
+                    [counters[i][0] or 0 for i in ids],
+                    [-1 if counters[i][1] is None else counters[i][1] for i in ids],
+                ])
+
+    def curves(self, channel: str, ids=None, since_ts: float = None) -> list:
+        """Growth curves of tracked posts, newest post first.
+
+        Args:
+            ids: Only these message ids (None = all tracked posts)
+            since_ts: Only posts published at or after this time
+
+        Returns:
+            list of ``{"id", "date", "link", "at", "views", "forwards"}``,
+            the last three being parallel lists in snapshot order
+        """
+        posts = self.posts(channel)
+        wanted = {i: d for i, d in posts.items()
+                  if (ids is None or i in ids) and (since_ts is None or d >= since_ts)}
+        points: dict = {i: ([], [], []) for i in wanted}
+        for msg_id, ts, views, forwards in zip(*self._read(channel, _SNAPSHOTS)):
+            series = points.get(msg_id)
+            if series is not None:
+                series[0].append(ts)
+                series[1].append(views)
+                series[2].append(None if forwards < 0 else forwards)
+        username = channel.lstrip("@")
+        # A refresh stamps all its rows with one time: format each once
+        stamps = {ts: datetime.fromtimestamp(ts, timezone.utc).isoformat()
+                  for ts in {ts for series in points.values() for ts in series[0]}}
+        return [{
+            "id": i,
+            "date": datetime.fromtimestamp(wanted[i], timezone.utc).isoformat(),
+            "link": f"https://t.me/{username}/{i}",
+            "at": [stamps[ts] for ts in points[i][0]],
+            "views": points[i][1],
+            "forwards": points[i][2],
+        } for i in sorted(wanted, reverse=True)]
+
+
+async def refresh(store: StatsStore, channel: str, since: datetime, read_new, read_views) -> dict:
+    """Take one counter snapshot of a channel's posts published since ``since``.
+
+    Args:
+        read_new: ``await read_new(min_id)`` -> all MessageRecords newer than
+            ``min_id`` (0 = none tracked yet) back to ``since``; the walk must
+            not stop earlier, or the posts below the cut are never tracked
+        read_views: ``await read_views(ids)`` -> one ``(views, forwards)`` per
+            id, or None for an id with no post; called with at most
+            `VIEWS_BATCH` ids
+
+    Returns:
+        the channel's summary: posts registered, refreshed and snapshot rows
+    """
+    tracked = store.posts(channel)
+    records = await read_new(max(tracked) if tracked else 0)
+    new_posts = {r.id: int(r.ts) for r in records}
+    counters = {r.id: (r.views, r.forwards) for r in records}
+
+    known = sorted((i for i, d in tracked.items() if d >= since.timestamp()), reverse=True)
+    for start in range(0, len(known), VIEWS_BATCH):
+        batch = known[start:start + VIEWS_BATCH]
+        for msg_id, views in zip(batch, await read_views(batch)):
+            if views is not None:
+                counters[msg_id] = views
+    store.record(channel, new_posts, counters)
+    return {
+        "channel": channel,
+        "refreshed_at": datetime.now(timezone.utc).isoformat(),
+        "since": since.isoformat(),
+        "new_posts": len(new_posts),
+        "refreshed": len(known),
+        "snapshots": len(counters),
+        "missing": len(known) - (len(counters) - len(new_posts)),
+    }
@@ -0,0 +1,157 @@
+"""
+tg-reader watch — follow channels live and write each new post as an NDJSON line.
+
+The backends register an update handler for new channel messages and pass
+every post to `Watcher.on_message`. Updates alone can be lost (the client
+reconnects, the process was down), so the watcher also *catches up*: at
+start, after a reconnect and every `catch_up_interval` seconds it asks the
+backend for history newer than the last id it knows to be complete and
+writes whatever the updates missed. Every written post advances the
+channel's ``last_read_id`` in the tg_state file, so `fetch` in read_unread
+mode and the next `watch` continue from there. No heavy dependencies (no
+Pyrogram/Telethon).
+
+Lines:
+
+    {"type": "watch", "channels": [...], "started_at": ...}
+    {"type": "message", "channel": "@x", "id": ..., "date": ..., "text": ..., ...}
+    {"type": "gap", "channel": "@x", "after_id": 100, "before_id": 651}
+    {"type": "error", "channel": "@x", "error": ..., "error_type": ..., "action": ...}
+
+Posts are written oldest first within a catch-up; live posts as they arrive.
+"""
+
+import asyncio
+import signal
+import time
+from datetime import datetime, timezone
+
+from tg_state import load_state, get_last_read_id, update_state, save_state
+
+_TICK = 5  # seconds between reconnect checks
+# Channel errors that will not go away by retrying — stop watching that channel
+_PERMANENT_ERRORS = ("access_denied", "banned", "not_found", "invite_expired")
+
+
+class Watcher:
+    """Dedupe, ordering and read-state bookkeeping shared by both backends' `watch`.
+
+    Args:
+        channels: Channel usernames as given on the command line
+        write: Callable taking one JSON-serializable dict per output line
+        state_file: tg_state file whose ``last_read_id`` is advanced per post
+        text_only: Skip posts without text
+        limit: Max posts fetched per channel in one catch-up
+        catch_up_interval: Seconds between periodic catch-ups
+    """
+
+    def __init__(self, channels: list, write, state_file: str, text_only: bool = False,
+                 limit: int = 500, catch_up_interval: float = 60):
+        self.channels = list(channels)
+        self.write = write
+        self.state_file = state_file
+        self.text_only = text_only
+        self.limit = max(1, limit)
+        self.catch_up_interval = catch_up_interval
+        self.state = load_state(state_file)
+        # Highest id below which every post has been seen (0 = not known yet)
+        self.caught_up = {ch: get_last_read_id(self.state, ch) for ch in self.channels}
+        # Ids above the watermark that were already written from live updates
+        self._recent = {ch: set() for ch in self.channels}
+        self._lock = asyncio.Lock()
+
+    def _emit(self, channel: str, record) -> None:
+        msg_id = record.id
+        if msg_id <= self.caught_up[channel] or msg_id in self._recent[channel]:
+            return
+        self._recent[channel].add(msg_id)
+        if self.text_only and not record.text:
+            return
+        self.write({"type": "message", "channel": channel, **record.to_dict()})
+        if msg_id > get_last_read_id(self.state, channel):
+            update_state(self.state, channel, msg_id)
+            save_state(self.state, self.state_file)
+
+    async def on_message(self, channel: str, record) -> None:
+        """Handle a live post (a tg_core.MessageRecord) from the backend's update handler."""
+        async with self._lock:
+            if channel in self.caught_up:
+                self._emit(channel, record)
+
+    async def catch_up(self, fetch) -> None:
+        """Fetch and write posts the live updates may have missed.
+
+        Args:
+            fetch: async ``fetch(channel, min_id, limit)`` -> the backend's
+                channel result dict (MessageRecords newest first) or error dict
+        """
+        for channel in list(self.channels):
+            async with self._lock:
+                start = self.caught_up[channel]
+                # First run for this channel: only learn where "now" is
+                result = await fetch(channel, start, self.limit if start else 1)
+                if "error" in result:
+                    self.write({"type": "error", **result})
+                    if result.get("error_type") in _PERMANENT_ERRORS:
+                        self._drop(channel)
+                    continue
+                messages = result["messages"]
+                if not messages:
+                    continue
+                if start:
+                    if len(messages) >= self.limit:
+                        # More was missed than one catch-up fetches; say so instead of hiding it
+                        self.write({"type": "gap", "channel": channel, "after_id": start,
+                                    "before_id": messages[-1].id})
+                    for record in reversed(messages):
+                        self._emit(channel, record)
+                self.caught_up[channel] = max(start, messages[0].id)
+                self._recent[channel] = {i for i in self._recent[channel]
+                                         if i > self.caught_up[channel]}
+
+    def _drop(self, channel: str) -> None:
+        self.channels.remove(channel)
+        del self.caught_up[channel]
+        del self._recent[channel]
+
+    async def start(self, fetch) -> None:
+        """Write the start line and run the initial catch-up."""
+        self.write({
+            "type": "watch",
+            "channels": self.channels,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+        })
+        await self.catch_up(fetch)
+
+    async def run(self, fetch, is_connected=None) -> None:
+        """Catch up periodically and after reconnects until SIGINT/SIGTERM.
+
+        Args:
+            fetch: See catch_up
+            is_connected: Optional callable reporting the client's connection state
+        """
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        last_catch_up = time.monotonic()
+        was_connected = True
+        while not stop_event.is_set() and self.channels:
+            try:
+                await asyncio.wait_for(stop_event.wait(), _TICK)
+            except asyncio.TimeoutError:
+                pass
+            if stop_event.is_set():
+                break
+            connected = is_connected() if is_connected is not None else True
+            reconnected = connected and not was_connected
+            was_connected = connected
+            if not connected:
+                continue
+            if reconnected or time.monotonic() - last_catch_up >= self.catch_up_interval:
+                await self.catch_up(fetch)
+                last_catch_up = time.monotonic()